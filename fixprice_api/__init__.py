@@ -1,5 +1,97 @@
-from .abstraction import CatalogSort
-from .manager import FixPriceAPI
+"""Клиент FixPrice.
 
-__all__ = ["FixPriceAPI", "CatalogSort"]
+Тяжелые зависимости (Camoufox, Playwright, aiohttp) подгружаются лениво - при
+первом обращении к `FixPriceAPI` и другим классам, которым они нужны. Поэтому
+`import fixprice_api` и `from fixprice_api import CatalogSort` остаются дешевыми.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from .abstraction import BatchRequest, CatalogSort
+from .recycling import RecyclePolicy
+
+if TYPE_CHECKING:
+    from .crawler import CrawlUnit, ProcessCrawler
+    from .history import PriceHistory
+    from .imaging import ImageProcessor
+    from .inventory import AvailabilityMatrix, Store, StoreInventoryCrawler
+    from .manager import FixPriceAPI
+    from .polling import StockChange, StockPoller
+    from .proxy_pool import ProxyPool
+    from .recrawl import Recrawler
+    from .scheduler import Priority, RequestScheduler, priority
+    from .shared_browser import SharedBrowser
+    from .sync import FixPriceAPISync
+    from .validation import ResponseValidator
+    from .work_queue import (CrawlCoordinator, MemoryQueue, QueueWorker,
+                             RedisQueue, SQLiteQueue)
+
+_LAZY_ATTRS = {
+    "FixPriceAPI": ".manager",
+    "FixPriceAPISync": ".sync",
+    "ProcessCrawler": ".crawler",
+    "CrawlUnit": ".crawler",
+    "Recrawler": ".recrawl",
+    "CrawlCoordinator": ".work_queue",
+    "QueueWorker": ".work_queue",
+    "MemoryQueue": ".work_queue",
+    "SQLiteQueue": ".work_queue",
+    "RedisQueue": ".work_queue",
+    "ProxyPool": ".proxy_pool",
+    "SharedBrowser": ".shared_browser",
+    "PriceHistory": ".history",
+    "ImageProcessor": ".imaging",
+    "StoreInventoryCrawler": ".inventory",
+    "AvailabilityMatrix": ".inventory",
+    "Store": ".inventory",
+    "StockPoller": ".polling",
+    "StockChange": ".polling",
+    "ResponseValidator": ".validation",
+    "Priority": ".scheduler",
+    "RequestScheduler": ".scheduler",
+    "priority": ".scheduler",
+}
+
+__all__ = [
+    "FixPriceAPI",
+    "FixPriceAPISync",
+    "CatalogSort",
+    "BatchRequest",
+    "ProcessCrawler",
+    "CrawlUnit",
+    "Recrawler",
+    "CrawlCoordinator",
+    "QueueWorker",
+    "MemoryQueue",
+    "SQLiteQueue",
+    "RedisQueue",
+    "ProxyPool",
+    "SharedBrowser",
+    "RecyclePolicy",
+    "PriceHistory",
+    "Priority",
+    "RequestScheduler",
+    "priority",
+    "ImageProcessor",
+    "StoreInventoryCrawler",
+    "AvailabilityMatrix",
+    "Store",
+    "StockPoller",
+    "StockChange",
+    "ResponseValidator",
+]
 __version__ = "0.2.4.1"
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value  # последующие обращения без __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
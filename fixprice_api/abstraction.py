@@ -1,3 +1,12 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from human_requests.abstraction import HttpMethod
+
+
 class CatalogSort:
     POPULARITY = "sold"
     """Сначало самые популярные"""
@@ -12,3 +21,14 @@ class CatalogSort:
 
         DESC = "max"
         """Сначало самые дорогие"""
+
+
+@dataclass(frozen=True)
+class BatchRequest:
+    """Описание одного запроса для `FixPriceAPI.batch`."""
+
+    method: HttpMethod
+    url: str
+    json_body: Any | None = None
+    add_unstandard_headers: bool = True
+    credentials: bool = True
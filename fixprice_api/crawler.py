@@ -0,0 +1,252 @@
+"""Многопроцессный обход каталога"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Iterable, Optional
+
+_PAGE = "page"
+_DONE = "done"
+_ERROR = "error"
+_FATAL = "fatal"
+_EXIT = "exit"
+
+
+@dataclass(frozen=True)
+class CrawlUnit:
+    """Единица работы обхода: категория (и подкатегория) в конкретном городе."""
+
+    category_alias: str
+    subcategory_alias: Optional[str] = None
+    city_id: Optional[int] = None
+
+    @property
+    def routing(self) -> dict[str, Any]:
+        """Аргументы `FixPriceAPI.routing` для запросов единицы.
+
+        Без `city_id` запросы идут в городе, заданном в клиенте."""
+        return {} if self.city_id is None else {"city_id": self.city_id}
+
+
+@dataclass
+class CrawlPage:
+    """Страница товаров, полученная одним из воркеров."""
+
+    unit: CrawlUnit
+    page: int
+    products: list[Any]
+    worker_id: int
+
+
+@dataclass
+class CrawlStats:
+    """Агрегированная статистика обхода по всем воркерам."""
+
+    units_done: int = 0
+    units_failed: int = 0
+    pages: int = 0
+    products: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    errors: dict[CrawlUnit, str] = field(default_factory=dict)
+    """Ошибки по единицам работы (`repr` исключения из воркера)."""
+    worker_errors: dict[int, str] = field(default_factory=dict)
+    """Воркеры, завершившиеся с ошибкой (например, не прогрелся браузер)."""
+
+    @property
+    def elapsed(self) -> float:
+        """Время с начала обхода в секундах."""
+        return time.monotonic() - self.started_at
+
+
+def units_from_tree(
+    tree: dict[str, Any],
+    city_ids: Iterable[Optional[int]] = (None,),
+    *,
+    split_subcategories: bool = False,
+) -> list[CrawlUnit]:
+    """Разворачивает ответ `Catalog.tree()` в список единиц работы.
+
+    `split_subcategories` - дробить категории на подкатегории (мельче шарды,
+    ровнее нагрузка на воркеры)."""
+    cities = list(city_ids)
+    units: list[CrawlUnit] = []
+    for node in tree.values():
+        if not node.get("productCount", 1):
+            continue
+        items = node.get("items") or {}
+        if isinstance(items, dict):
+            items = list(items.values())
+        children = [c for c in items if c.get("alias")]
+        for city_id in cities:
+            if split_subcategories and children:
+                units.extend(
+                    CrawlUnit(node["alias"], child["alias"], city_id)
+                    for child in children
+                )
+            else:
+                units.append(CrawlUnit(node["alias"], None, city_id))
+    return units
+
+
+async def _worker_loop(
+    worker_id: int,
+    api_opts: dict[str, Any],
+    tasks: Any,
+    results: Any,
+    limit: int,
+    transform: Optional[Callable[[list[Any]], list[Any]]],
+) -> None:
+    from .manager import FixPriceAPI
+
+    loop = asyncio.get_running_loop()
+    async with FixPriceAPI(**api_opts) as api:
+        while True:
+            unit: CrawlUnit | None = await loop.run_in_executor(None, tasks.get)
+            if unit is None:
+                break
+
+            try:
+                page = 1
+                while True:
+                    with api.routing(**unit.routing):
+                        resp = await api.Catalog.products_list(
+                            category_alias=unit.category_alias,
+                            subcategory_alias=unit.subcategory_alias,
+                            page=page,
+                            limit=limit,
+                        )
+                    if not 200 <= resp.status_code < 300:
+                        raise RuntimeError(f"HTTP {resp.status_code}")
+                    raw = resp.json()
+                    products = transform(raw) if transform is not None else raw
+                    if products:
+                        await loop.run_in_executor(
+                            None, results.put, (_PAGE, unit, page, products, worker_id)
+                        )
+                    if len(raw) < limit:
+                        break
+                    page += 1
+            except Exception as exc:
+                results.put((_ERROR, unit, repr(exc), worker_id))
+            else:
+                results.put((_DONE, unit, page, worker_id))
+
+
+def _worker_main(
+    worker_id: int,
+    api_opts: dict[str, Any],
+    tasks: Any,
+    results: Any,
+    limit: int,
+    transform: Optional[Callable[[list[Any]], list[Any]]],
+) -> None:
+    try:
+        asyncio.run(_worker_loop(worker_id, api_opts, tasks, results, limit, transform))
+    except Exception as exc:
+        # взятые единицы уже отмечены; оставшиеся в очереди учтет родитель
+        results.put((_FATAL, repr(exc), worker_id))
+    finally:
+        results.put((_EXIT, worker_id))
+
+
+@dataclass
+class ProcessCrawler:
+    """Обход каталога пулом процессов.
+
+    Каждый воркер - отдельный процесс со своим прогретым `FixPriceAPI` (и своим
+    браузером). Единицы работы раздаются через общую очередь, поэтому быстрые
+    воркеры забирают больше работы. Разбор JSON и `transform` выполняются в
+    воркерах, родителю возвращаются уже готовые страницы.
+
+    Если воркер упал (например, не смог прогреть браузер), ошибка попадает в
+    `stats.worker_errors`, а единицы, которые так никто и не обработал, - в
+    `stats.errors` и `stats.units_failed`."""
+
+    units: Iterable[CrawlUnit]
+    """Единицы работы (см. `units_from_tree`)."""
+    workers: int = field(default_factory=lambda: os.cpu_count() or 1)
+    """Количество процессов-воркеров."""
+    api_opts: dict[str, Any] = field(default_factory=dict)
+    """Аргументы `FixPriceAPI` для каждого воркера (должны быть picklable)."""
+    limit: int = 24
+    """Размер страницы `products_list`."""
+    transform: Optional[Callable[[list[Any]], list[Any]]] = None
+    """Пост-обработка страницы в воркере. Должна быть функцией верхнего уровня модуля."""
+    max_pending_pages: int = 256
+    """Размер очереди результатов. Если потребитель не успевает - воркеры ждут."""
+
+    stats: CrawlStats = field(init=False, default_factory=CrawlStats)
+    """Статистика текущего (последнего) обхода."""
+
+    async def run(self) -> AsyncIterator[CrawlPage]:
+        """Запустить обход и отдавать страницы по мере готовности."""
+        if self.workers < 1:
+            raise ValueError("`workers` must be greater than 0")
+
+        units = list(self.units)
+        ctx = mp.get_context("spawn")
+        tasks = ctx.Queue()
+        results = ctx.Queue(maxsize=self.max_pending_pages)
+        for unit in units:
+            tasks.put(unit)
+        for _ in range(self.workers):
+            tasks.put(None)
+
+        self.stats = CrawlStats()
+        procs = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, self.api_opts, tasks, results, self.limit, self.transform),
+            )
+            for i in range(self.workers)
+        ]
+        for p in procs:
+            p.start()
+
+        loop = asyncio.get_running_loop()
+        alive = len(procs)
+        finished: set[CrawlUnit] = set()
+        try:
+            while alive:
+                try:
+                    msg = await loop.run_in_executor(None, results.get, True, 1.0)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in procs):
+                        break
+                    continue
+
+                kind = msg[0]
+                if kind == _PAGE:
+                    _, unit, page, products, worker_id = msg
+                    self.stats.pages += 1
+                    self.stats.products += len(products)
+                    yield CrawlPage(unit, page, products, worker_id)
+                elif kind == _DONE:
+                    finished.add(msg[1])
+                    self.stats.units_done += 1
+                elif kind == _ERROR:
+                    _, unit, error, _worker_id = msg
+                    finished.add(unit)
+                    self.stats.units_failed += 1
+                    self.stats.errors[unit] = error
+                elif kind == _FATAL:
+                    _, error, worker_id = msg
+                    self.stats.worker_errors[worker_id] = error
+                elif kind == _EXIT:
+                    alive -= 1
+
+            for unit in units:
+                if unit not in finished:
+                    self.stats.units_failed += 1
+                    self.stats.errors[unit] = "not processed: all workers exited"
+        finally:
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+            for p in procs:
+                await loop.run_in_executor(None, p.join)
@@ -5,13 +5,14 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from types import MethodType
-from typing import TYPE_CHECKING, Optional, overload
+from typing import TYPE_CHECKING, Any, Optional, overload
 
 from human_requests import ApiChild, ApiParent, api_child_field, autotest
 from human_requests.abstraction import FetchResponse, HttpMethod
 from playwright.async_api import Response as PWResponse
 
 from .. import abstraction
+from ..abstraction import BatchRequest
 
 if TYPE_CHECKING:
     from fixprice_api.manager import FixPriceAPI
@@ -49,8 +50,21 @@ class ClassCatalog(ApiChild["FixPriceAPI"], ApiParent):
         page: int = 1,
         limit: int = 24,
         sort: abstraction.CatalogSort | str = abstraction.CatalogSort.POPULARITY,
+        *,
+        brands: Optional[list[int]] = None,
+        is_new: bool = False,
+        is_hit: bool = False,
+        is_special_price: bool = False,
+        is_divided_price: bool = False,
     ) -> FetchResponse:
-        """Возвращает количество и список товаров в категории/подкатегории."""
+        """Возвращает количество и список товаров в категории/подкатегории.
+
+        Фильтры применяются на стороне сервера:
+
+        `brands` - id брендов (`product["brand"]["id"]`).
+        `is_new`, `is_hit`, `is_special_price` - только новинки, хиты, товары по спец. цене.
+        `is_divided_price` - флаг `isDividedPrice` фильтра сайта.
+        """
         if page < 1:
             raise ValueError("`page` must be greater than 0")
         elif limit > 27 or limit < 1:
@@ -65,12 +79,12 @@ class ClassCatalog(ApiChild["FixPriceAPI"], ApiParent):
 
         json_body = {
             "category": category_alias,
-            "brand": [],
+            "brand": list(brands or []),
             "price": [],
-            "isDividedPrice": False,
-            "isNew": False,
-            "isHit": False,
-            "isSpecialPrice": False,
+            "isDividedPrice": is_divided_price,
+            "isNew": is_new,
+            "isHit": is_hit,
+            "isSpecialPrice": is_special_price,
         }
         if subcategory_alias:
             json_body["category"] += f"/{subcategory_alias}"
@@ -79,6 +93,43 @@ class ClassCatalog(ApiChild["FixPriceAPI"], ApiParent):
             HttpMethod.POST, url=url, real_route=real_route, json_body=json_body
         )
 
+    async def brands(
+        self,
+        category_alias: str,
+        subcategory_alias: Optional[str] = None,
+        *,
+        limit: int = 24,
+    ) -> dict[int, dict[str, Any]]:
+        """Бренды категории для фильтра `brands` у `products_list`:
+        `{id: {"title": ..., "count": количество товаров}}`.
+
+        Отдельного метода фасетов у API нет, поэтому бренды собираются из поля
+        `brand` товаров, то есть проходятся все страницы категории."""
+        found: dict[int, dict[str, Any]] = {}
+        page = 1
+        while True:
+            resp = await self.products_list(
+                category_alias,
+                subcategory_alias,
+                page=page,
+                limit=limit,
+                sort=abstraction.CatalogSort.ALPHABET,
+            )
+            if not 200 <= resp.status_code < 300:
+                raise RuntimeError(f"HTTP {resp.status_code}")
+            products = resp.json()
+            for product in products:
+                brand = product.get("brand") or {}
+                if brand.get("id") is None:
+                    continue
+                entry = found.setdefault(
+                    brand["id"], {"title": brand.get("title"), "count": 0}
+                )
+                entry["count"] += 1
+            if len(products) < limit:
+                return found
+            page += 1
+
 
 class ProductService(ApiChild["FixPriceAPI"]):
     """Сервис для работы с товарами в каталоге."""
@@ -98,13 +149,41 @@ class ProductService(ApiChild["FixPriceAPI"]):
         if self._parent.city_id == None:
             raise ValueError("City ID is not set")
 
+        return await self._parent._request(
+            HttpMethod.GET, self._balance_url(product_id, in_stock, search)
+        )
+
+    async def balance_many(
+        self,
+        product_ids: list[int],
+        in_stock: bool = True,
+        search: Optional[str] = None,
+    ) -> list[FetchResponse | Exception]:
+        """
+        То же, что `balance`, но для списка товаров за одно обращение к браузеру
+        (см. `FixPriceAPI.batch`). Порядок ответов совпадает с `product_ids`.
+        """
+        if self._parent.city_id == None:
+            raise ValueError("City ID is not set")
+
+        return await self._parent.batch(
+            [
+                BatchRequest(
+                    HttpMethod.GET, self._balance_url(product_id, in_stock, search)
+                )
+                for product_id in product_ids
+            ]
+        )
+
+    def _balance_url(
+        self, product_id: int, in_stock: bool, search: Optional[str]
+    ) -> str:
         url = f"{self._parent.CATALOG_URL}/v1/store/balance/{product_id}?canPickup=all"
         if search:
             url += f"&addressPart={search}"
         if in_stock:
             url += "&inStock=true"
-
-        return await self._parent._request(HttpMethod.GET, url)
+        return url
 
     @overload
     async def info(self, *, url: str): ...
@@ -142,49 +221,50 @@ class ProductService(ApiChild["FixPriceAPI"]):
         else:
             real_url += url
 
-        page = await self._parent.ctx.new_page()
-        try:
-            resp = await page.goto(real_url, wait_until="domcontentloaded")
-            if resp is None:
-                raise RuntimeError("page.goto() returned None")
+        async with self._parent._lease(), self._parent._route() as warm:
+            page = await warm.ctx.new_page()
+            try:
+                resp = await page.goto(real_url, wait_until="domcontentloaded")
+                if resp is None:
+                    raise RuntimeError("page.goto() returned None")
 
-            raw_json = await page.evaluate("""
-            () => {
-                const marker = "window.__NUXT__=";
+                raw_json = await page.evaluate("""
+                () => {
+                    const marker = "window.__NUXT__=";
 
-                for (const s of document.scripts) {
-                    const txt = s.textContent || "";
-                    const idx = txt.indexOf(marker);
+                    for (const s of document.scripts) {
+                        const txt = s.textContent || "";
+                        const idx = txt.indexOf(marker);
 
-                    if (idx !== -1) {
-                        let expr = txt.slice(idx + marker.length).trim();
+                        if (idx !== -1) {
+                            let expr = txt.slice(idx + marker.length).trim();
 
-                        if (expr.endsWith(";")) {
-                            expr = expr.slice(0, -1);
-                        }
+                            if (expr.endsWith(";")) {
+                                expr = expr.slice(0, -1);
+                            }
 
-                        const obj = Function('"use strict"; return (' + expr + ')')();
-                        return JSON.stringify(obj);
+                            const obj = Function('"use strict"; return (' + expr + ')')();
+                            return JSON.stringify(obj);
+                        }
                     }
-                }
 
-                return null;
-            }
-            """)
-
-            nuxt_data = (
-                json.loads(raw_json)["useState"]["uniquePseudoAsyncDataStateKey"][
-                    "product"
-                ]
-                if raw_json
-                else None
-            )
+                    return null;
+                }
+                """)
+
+                nuxt_data = (
+                    json.loads(raw_json)["useState"]["uniquePseudoAsyncDataStateKey"][
+                        "product"
+                    ]
+                    if raw_json
+                    else None
+                )
 
-            def _json(self):
-                return nuxt_data
+                def _json(self):
+                    return nuxt_data
 
-            resp.json = MethodType(_json, resp)
+                resp.json = MethodType(_json, resp)
 
-            return resp
-        finally:
-            await page.close()
+                return resp
+            finally:
+                await page.close()
@@ -1,13 +1,18 @@
 """Общий (не класифицируемый) функционал"""
 
+from __future__ import annotations
+
 from io import BytesIO
 from typing import TYPE_CHECKING
 
-from aiohttp_retry import ExponentialRetry, RetryClient
 from human_requests import ApiChild
 from human_requests.abstraction import Proxy
 
+from ..proxy_pool import ProxyPool
+
 if TYPE_CHECKING:
+    from aiohttp_retry import ExponentialRetry
+
     from fixprice_api.manager import FixPriceAPI
 
 
@@ -21,16 +26,33 @@ class ClassGeneral(ApiChild["FixPriceAPI"]):
     async def download_image(
         self, url: str, retry_attempts: int = 3, timeout: float = 10
     ) -> BytesIO:
-        """Скачать изображение по URL."""
+        """Скачать изображение по URL.
+
+        Используется `image_proxy` клиента (или `proxy`, если он не задан).
+        Если это `ProxyPool`, прокси выбирается из пула на каждое скачивание."""
+        from aiohttp_retry import ExponentialRetry
+
         retry_options = ExponentialRetry(
             attempts=retry_attempts, start_timeout=3.0, max_timeout=timeout
         )
 
-        px = (
-            self._parent.proxy
-            if isinstance(self._parent.proxy, Proxy)
-            else Proxy(self._parent.proxy)
+        source = (
+            self._parent.image_proxy
+            if self._parent.image_proxy is not None
+            else self._parent.proxy
         )
+        if isinstance(source, ProxyPool):
+            async with source.use() as px:
+                return await self._download(url, retry_options, px)
+
+        px = source if isinstance(source, Proxy) else Proxy(source)
+        return await self._download(url, retry_options, px)
+
+    async def _download(
+        self, url: str, retry_options: ExponentialRetry, px: Proxy
+    ) -> BytesIO:
+        from aiohttp_retry import RetryClient
+
         async with RetryClient(retry_options=retry_options) as retry_client:
             async with retry_client.get(
                 url, raise_for_status=True, proxy=px.as_str()
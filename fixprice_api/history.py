@@ -0,0 +1,238 @@
+"""Локальное хранилище истории цен"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observation (
+    id            INTEGER PRIMARY KEY,
+    product_id    INTEGER NOT NULL,
+    city_id       INTEGER NOT NULL,
+    price         REAL,
+    special_price REAL,
+    first_seen    REAL NOT NULL,
+    last_seen     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS observation_product_city
+    ON observation (product_id, city_id, first_seen);
+
+CREATE TABLE IF NOT EXISTS latest (
+    product_id     INTEGER NOT NULL,
+    city_id        INTEGER NOT NULL,
+    observation_id INTEGER NOT NULL REFERENCES observation (id),
+    PRIMARY KEY (product_id, city_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS latest_city ON latest (city_id);
+"""
+
+
+@dataclass(frozen=True)
+class PricePoint:
+    """Интервал, в течение которого цена товара в городе не менялась."""
+
+    product_id: int
+    city_id: int
+    price: Optional[float]
+    special_price: Optional[float]
+    first_seen: float
+    """Время первого наблюдения (Unix time)."""
+    last_seen: float
+    """Время последнего наблюдения с той же ценой (Unix time)."""
+
+
+def _money(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+class PriceHistory:
+    """История цен на SQLite с дедупликацией неизменных наблюдений.
+
+    Новая строка появляется только при изменении `price` или `specialPrice`;
+    повторное наблюдение той же цены лишь сдвигает `last_seen`. Поэтому размер
+    базы растет с количеством изменений цен, а не с количеством обходов.
+
+    Запоздавшие наблюдения (`observed_at` раньше последнего) встраиваются в
+    историю по времени и не меняют последнюю цену. Наблюдение внутри известного
+    интервала с другой ценой противоречит ему и отбрасывается (см. `conflicts`).
+
+    Пример::
+
+        history = PriceHistory("prices.sqlite")
+        history.record((await api.Catalog.products_list(alias)).json(), api.city_id)
+        history.history(product_id=5024806, city_id=3)
+    """
+
+    def __init__(self, path: str | Path = ":memory:") -> None:
+        self.path = path
+        self._db = sqlite3.connect(str(path))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.conflicts = 0
+        """Отброшенные запоздавшие наблюдения, противоречащие известным интервалам."""
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "PriceHistory":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def record(
+        self,
+        products: Iterable[dict[str, Any]],
+        city_id: int,
+        observed_at: Optional[float] = None,
+    ) -> int:
+        """Записать цены товаров (элементы ответа `products_list`) для города.
+
+        Возвращает количество новых интервалов (т.е. изменившихся цен)."""
+        if city_id is None:
+            raise ValueError("`city_id` must be set")
+        ts = time.time() if observed_at is None else observed_at
+
+        changed = 0
+        with self._db:
+            cur = self._db.cursor()
+            for product in products:
+                product_id = int(product["id"])
+                price = _money(product.get("price"))
+                special = _money(product.get("specialPrice"))
+
+                row = cur.execute(
+                    "SELECT o.id, o.price, o.special_price, o.first_seen, o.last_seen "
+                    "FROM latest l JOIN observation o ON o.id = l.observation_id "
+                    "WHERE l.product_id = ? AND l.city_id = ?",
+                    (product_id, city_id),
+                ).fetchone()
+                same = row is not None and row[1] == price and row[2] == special
+
+                # запоздавшее наблюдение не должно становиться последней ценой
+                if row is not None and ts < row[4] and not (same and ts >= row[3]):
+                    changed += self._record_late(
+                        cur, product_id, city_id, price, special, ts
+                    )
+                    continue
+
+                if same:
+                    if ts > row[4]:
+                        cur.execute(
+                            "UPDATE observation SET last_seen = ? WHERE id = ?",
+                            (ts, row[0]),
+                        )
+                    continue
+
+                cur.execute(
+                    "INSERT INTO observation "
+                    "(product_id, city_id, price, special_price, first_seen, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (product_id, city_id, price, special, ts, ts),
+                )
+                cur.execute(
+                    "INSERT OR REPLACE INTO latest (product_id, city_id, observation_id) "
+                    "VALUES (?, ?, ?)",
+                    (product_id, city_id, cur.lastrowid),
+                )
+                changed += 1
+        return changed
+
+    def _record_late(
+        self,
+        cur: sqlite3.Cursor,
+        product_id: int,
+        city_id: int,
+        price: Optional[float],
+        special: Optional[float],
+        ts: float,
+    ) -> int:
+        """Встроить наблюдение старше последнего интервала. Возвращает 1, если
+        появился новый интервал."""
+        before = cur.execute(
+            "SELECT id, price, special_price, last_seen FROM observation "
+            "WHERE product_id = ? AND city_id = ? AND first_seen <= ? "
+            "ORDER BY first_seen DESC LIMIT 1",
+            (product_id, city_id, ts),
+        ).fetchone()
+        same_before = before is not None and before[1:3] == (price, special)
+        if before is not None and ts <= before[3]:
+            # внутри известного интервала
+            if not same_before:
+                self.conflicts += 1
+            return 0
+        if same_before:
+            cur.execute(
+                "UPDATE observation SET last_seen = ? WHERE id = ?", (ts, before[0])
+            )
+            return 0
+
+        after = cur.execute(
+            "SELECT id, price, special_price FROM observation "
+            "WHERE product_id = ? AND city_id = ? AND first_seen > ? "
+            "ORDER BY first_seen LIMIT 1",
+            (product_id, city_id, ts),
+        ).fetchone()
+        if after is not None and after[1:3] == (price, special):
+            cur.execute(
+                "UPDATE observation SET first_seen = ? WHERE id = ?", (ts, after[0])
+            )
+            return 0
+
+        cur.execute(
+            "INSERT INTO observation "
+            "(product_id, city_id, price, special_price, first_seen, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (product_id, city_id, price, special, ts, ts),
+        )
+        return 1
+
+    def history(
+        self,
+        product_id: int,
+        city_id: int,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> list[PricePoint]:
+        """Интервалы цен товара в городе в хронологическом порядке.
+
+        `since`/`until` - отбор интервалов, пересекающихся с периодом (Unix time)."""
+        query = (
+            "SELECT product_id, city_id, price, special_price, first_seen, last_seen "
+            "FROM observation WHERE product_id = ? AND city_id = ?"
+        )
+        params: list[Any] = [product_id, city_id]
+        if since is not None:
+            query += " AND last_seen >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND first_seen <= ?"
+            params.append(until)
+        query += " ORDER BY first_seen"
+        return [PricePoint(*row) for row in self._db.execute(query, params)]
+
+    def latest(
+        self, city_id: int, product_ids: Optional[Iterable[int]] = None
+    ) -> dict[int, PricePoint]:
+        """Последние известные цены в городе: `{product_id: PricePoint}`."""
+        query = (
+            "SELECT o.product_id, o.city_id, o.price, o.special_price, "
+            "o.first_seen, o.last_seen "
+            "FROM latest l JOIN observation o ON o.id = l.observation_id "
+            "WHERE l.city_id = ?"
+        )
+        params: list[Any] = [city_id]
+        if product_ids is not None:
+            ids = list(product_ids)
+            if not ids:
+                return {}
+            query += f" AND l.product_id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        return {row[0]: PricePoint(*row) for row in self._db.execute(query, params)}
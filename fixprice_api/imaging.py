@@ -0,0 +1,238 @@
+"""Обработка изображений товаров вне event loop"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import io
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import (TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Iterable,
+                    Optional)
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+    from .manager import FixPriceAPI
+
+_END = object()
+
+
+@dataclass(frozen=True)
+class ImageResult:
+    """Результат обработки одного изображения."""
+
+    url: str
+    hash: int = 0
+    """64-битный dHash (см. `dhash`). Похожие изображения - малое расстояние Хэмминга."""
+    width: int = 0
+    height: int = 0
+    format: Optional[str] = None
+    thumbnail: Optional[bytes] = None
+    """Превью в `thumbnail_format` (если включено)."""
+    error: Optional[str] = None
+    """Ошибка скачивания или декодирования (остальные поля тогда пустые)."""
+
+
+def dhash(img: "Image", size: int = 8) -> int:
+    """Difference hash: знак разности соседних пикселей уменьшенного серого
+    изображения. Устойчив к масштабу и сжатию, меняется при смене упаковки."""
+    from PIL import Image
+
+    small = img.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    px = small.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (px[offset + col] > px[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    """Расстояние Хэмминга между двумя хешами."""
+    return (a ^ b).bit_count()
+
+
+def hashes_array(results: Iterable[ImageResult]) -> array:
+    """Хеши успешных результатов в компактном массиве `array("Q")` (8 байт на хеш)."""
+    return array("Q", (r.hash for r in results if r.error is None))
+
+
+def _process(
+    url: str,
+    data: bytes,
+    thumbnail_size: Optional[tuple[int, int]],
+    thumbnail_format: str,
+) -> ImageResult:
+    # Выполняется в процессе пула
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            fmt = img.format
+            width, height = img.size
+            image_hash = dhash(img)
+
+            thumb = None
+            if thumbnail_size is not None:
+                copy = img.convert("RGB")
+                copy.thumbnail(thumbnail_size)
+                buf = io.BytesIO()
+                copy.save(buf, format=thumbnail_format)
+                thumb = buf.getvalue()
+    except Exception as exc:
+        return ImageResult(url=url, error=repr(exc))
+
+    return ImageResult(
+        url=url,
+        hash=image_hash,
+        width=width,
+        height=height,
+        format=fmt,
+        thumbnail=thumb,
+    )
+
+
+class ImageProcessor:
+    """Конвейер: `General.download_image` -> декодирование, превью и хеш в пуле процессов.
+
+    Скачивание идет в event loop с ограничением `download_concurrency`, а вся работа
+    PIL - в `ProcessPoolExecutor`, поэтому сеть не блокируется. Между стадиями стоят
+    ограниченные очереди: если пул не успевает, скачивание приостанавливается.
+
+    Пример::
+
+        async with ImageProcessor(api) as images:
+            async for result in images.process(urls):
+                ...
+    """
+
+    def __init__(
+        self,
+        api: "FixPriceAPI",
+        *,
+        workers: Optional[int] = None,
+        download_concurrency: int = 8,
+        queue_size: int = 32,
+        thumbnail_size: Optional[tuple[int, int]] = (128, 128),
+        thumbnail_format: str = "WEBP",
+    ) -> None:
+        if importlib.util.find_spec("PIL") is None:
+            raise ImportError(
+                "ImageProcessor requires Pillow (pip install fixprice_api[images])"
+            )
+        if download_concurrency < 1 or queue_size < 1:
+            raise ValueError(
+                "`download_concurrency` and `queue_size` must be greater than 0"
+            )
+
+        self.api = api
+        self.workers = workers or os.cpu_count() or 1
+        self.download_concurrency = download_concurrency
+        self.queue_size = queue_size
+        self.thumbnail_size = thumbnail_size
+        self.thumbnail_format = thumbnail_format
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    async def __aenter__(self) -> "ImageProcessor":
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.to_thread(pool.shutdown)
+
+    async def process(
+        self, urls: Iterable[str] | AsyncIterable[str]
+    ) -> AsyncIterator[ImageResult]:
+        """Обработать изображения по url. Результаты отдаются по мере готовности
+        (порядок не гарантируется)."""
+        if self._pool is None:
+            raise RuntimeError("ImageProcessor is not started, use `async with`")
+        pool = self._pool
+        loop = asyncio.get_running_loop()
+
+        todo: asyncio.Queue[Any] = asyncio.Queue(maxsize=self.queue_size)
+        downloaded: asyncio.Queue[Any] = asyncio.Queue(maxsize=self.queue_size)
+        results: asyncio.Queue[Any] = asyncio.Queue(maxsize=self.queue_size)
+
+        async def feed() -> None:
+            if isinstance(urls, AsyncIterable):
+                async for url in urls:
+                    await todo.put(url)
+            else:
+                for url in urls:
+                    await todo.put(url)
+            for _ in range(self.download_concurrency):
+                await todo.put(_END)
+
+        async def download() -> None:
+            while (url := await todo.get()) is not _END:
+                try:
+                    file = await self.api.General.download_image(url)
+                except Exception as exc:
+                    await results.put(ImageResult(url=url, error=repr(exc)))
+                    continue
+                await downloaded.put((url, file.getvalue()))
+
+        async def decode() -> None:
+            # не больше `workers` заданий в пуле одновременно
+            running: set[asyncio.Future] = set()
+            while (item := await downloaded.get()) is not _END:
+                if len(running) >= self.workers:
+                    done, running = await asyncio.wait(
+                        running, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for fut in done:
+                        await results.put(fut.result())
+                url, data = item
+                running.add(
+                    loop.run_in_executor(
+                        pool,
+                        _process,
+                        url,
+                        data,
+                        self.thumbnail_size,
+                        self.thumbnail_format,
+                    )
+                )
+            for fut in asyncio.as_completed(running):
+                await results.put(await fut)
+
+        downloaders = [
+            asyncio.ensure_future(download()) for _ in range(self.download_concurrency)
+        ]
+        decoder = asyncio.ensure_future(decode())
+
+        async def finish_downloads() -> None:
+            await asyncio.gather(*downloaders)
+            await downloaded.put(_END)
+
+        runner = asyncio.gather(feed(), finish_downloads(), decoder)
+        try:
+            while True:
+                getter = asyncio.ensure_future(results.get())
+                done, _ = await asyncio.wait(
+                    {getter, runner}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter in done:
+                    yield getter.result()
+                    continue
+
+                getter.cancel()
+                runner.result()  # пробрасываем ошибку стадии, если была
+                while not results.empty():
+                    yield results.get_nowait()
+                return
+        finally:
+            runner.cancel()
+            for task in (*downloaders, decoder):
+                task.cancel()
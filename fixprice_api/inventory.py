@@ -0,0 +1,221 @@
+"""Обход ассортимента по магазинам"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Literal,
+    Optional,
+)
+
+from .crawler import CrawlUnit, units_from_tree
+
+if TYPE_CHECKING:
+    from .manager import FixPriceAPI
+
+_MAGIC = b"FPAV1\n"
+
+
+@dataclass(frozen=True)
+class Store:
+    """Магазин для обхода (элемент ответа `Geolocation.Shop.search`)."""
+
+    id: int
+    pfm: str
+    """Значение заголовка `x-pfm` (`FixPriceAPI.store_id`)."""
+    city_id: Optional[int] = None
+
+    @classmethod
+    def from_search(cls, data: Iterable[dict[str, Any]]) -> list["Store"]:
+        """Магазины из ответа `Shop.search` (закрытые и неактивные пропускаются)."""
+        return [
+            cls(int(s["id"]), str(s["pfm"]), s.get("cityId"))
+            for s in data
+            if s.get("pfm")
+            and s.get("isActive", True)
+            and not s.get("temporarilyClosed", False)
+        ]
+
+
+def in_stock(product: dict[str, Any]) -> bool:
+    """Товар доступен, если `inStock` больше нуля (или поле не пришло)."""
+    value = product.get("inStock", 1)
+    return value is not None and value > 0
+
+
+class AvailabilityMatrix:
+    """Компактная матрица наличия: магазин x товар, 1 бит на пару.
+
+    Строка магазина - `bytearray` длиной `ceil(товаров / 8)`, поэтому 1000
+    магазинов x 20000 товаров занимают ~2.5 МБ."""
+
+    def __init__(self, stores: Iterable[int], products: Iterable[int]) -> None:
+        self.stores = list(stores)
+        self.products = list(products)
+        self._store_index = {s: i for i, s in enumerate(self.stores)}
+        self._product_index = {p: i for i, p in enumerate(self.products)}
+        width = (len(self.products) + 7) // 8
+        self._rows = [bytearray(width) for _ in self.stores]
+
+    @classmethod
+    def from_sets(cls, available: dict[int, set[int]]) -> "AvailabilityMatrix":
+        """Построить матрицу из `{store_id: {product_id, ...}}`."""
+        products = sorted(set().union(*available.values())) if available else []
+        matrix = cls(sorted(available), products)
+        for store_id, ids in available.items():
+            row = matrix._rows[matrix._store_index[store_id]]
+            for product_id in ids:
+                i = matrix._product_index[product_id]
+                row[i >> 3] |= 1 << (i & 7)
+        return matrix
+
+    def has(self, store_id: int, product_id: int) -> bool:
+        s = self._store_index.get(store_id)
+        p = self._product_index.get(product_id)
+        if s is None or p is None:
+            return False
+        return bool(self._rows[s][p >> 3] >> (p & 7) & 1)
+
+    def products_in(self, store_id: int) -> list[int]:
+        """Товары, доступные в магазине."""
+        row = self._rows[self._store_index[store_id]]
+        return [p for i, p in enumerate(self.products) if row[i >> 3] >> (i & 7) & 1]
+
+    def stores_with(self, product_id: int) -> list[int]:
+        """Магазины, в которых доступен товар."""
+        i = self._product_index.get(product_id)
+        if i is None:
+            return []
+        byte, bit = i >> 3, 1 << (i & 7)
+        return [s for s, row in zip(self.stores, self._rows) if row[byte] & bit]
+
+    def counts(self) -> dict[int, int]:
+        """Количество доступных товаров по магазинам."""
+        return {
+            s: sum(b.bit_count() for b in row)
+            for s, row in zip(self.stores, self._rows)
+        }
+
+    def save(self, path: str | Path) -> None:
+        """Записать в файл: заголовок с id магазинов и товаров и строки битов."""
+        header = json.dumps({"stores": self.stores, "products": self.products}).encode()
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for row in self._rows:
+                f.write(row)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "AvailabilityMatrix":
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not an availability matrix")
+            (size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(size))
+            matrix = cls(header["stores"], header["products"])
+            width = (len(matrix.products) + 7) // 8
+            for row in matrix._rows:
+                row[:] = f.read(width)
+        return matrix
+
+
+@dataclass
+class StoreInventoryCrawler:
+    """Ассортимент магазинов через каталог с заголовками конкретного магазина.
+
+    Запросы каждого магазина (`Store`) идут с его `store_id` (`x-pfm`), `city_id`
+    и `delivery_type`, и все категории дерева проходятся постранично. Магазины
+    обходятся параллельно (не больше `concurrency`) одним клиентом: заголовки
+    задаются через `FixPriceAPI.routing`, поэтому запросы разных магазинов не
+    смешиваются, а настройки клиента и другие его вызовы во время обхода не
+    затрагиваются. Магазин без `city_id` обходится в городе клиента, как и
+    `CrawlUnit` без города.
+
+    Пример::
+
+        stores = Store.from_search((await api.Geolocation.Shop.search(city_id=3)).json())
+        tree = (await api.Catalog.tree()).json()
+        matrix = await StoreInventoryCrawler(api, tree).run(stores)
+        matrix.save("inventory.bin")
+    """
+
+    api: "FixPriceAPI"
+    tree: dict[str, Any]
+    """Ответ `Catalog.tree()`."""
+    delivery_type: Literal["store", "pickup", "courier"] = "store"
+    concurrency: int = 4
+    """Сколько магазинов обходить одновременно."""
+    limit: int = 24
+    """Размер страницы `products_list`."""
+    split_subcategories: bool = False
+    is_available: Callable[[dict[str, Any]], bool] = in_stock
+    """Считать ли товар из выдачи доступным в магазине."""
+
+    errors: dict[int, str] = field(init=False, default_factory=dict)
+    """Магазины, обход которых не удался (в матрицу не попадают)."""
+    requests: int = field(init=False, default=0)
+
+    async def _products(self, store: Store, unit: CrawlUnit) -> AsyncIterator[Any]:
+        page = 1
+        while True:
+            resp = await self.api.Catalog.products_list(
+                category_alias=unit.category_alias,
+                subcategory_alias=unit.subcategory_alias,
+                page=page,
+                limit=self.limit,
+            )
+            self.requests += 1
+            if not 200 <= resp.status_code < 300:
+                raise RuntimeError(f"HTTP {resp.status_code} for {unit} page {page}")
+            products = resp.json()
+            if not isinstance(products, list):
+                raise ValueError(
+                    f"unexpected body for {unit} page {page}: {type(products).__name__}"
+                )
+            for product in products:
+                yield product
+            if len(products) < self.limit:
+                return
+            page += 1
+
+    async def _crawl_store(self, store: Store) -> set[int]:
+        available: set[int] = set()
+        units = units_from_tree(self.tree, split_subcategories=self.split_subcategories)
+        routing: dict[str, Any] = {"store_id": store.pfm}
+        if store.city_id is not None:
+            routing["city_id"] = store.city_id
+        with self.api.routing(**routing, delivery_type=self.delivery_type):
+            for unit in units:
+                async for product in self._products(store, unit):
+                    if self.is_available(product):
+                        available.add(int(product["id"]))
+        return available
+
+    async def run(self, stores: Iterable[Store]) -> AvailabilityMatrix:
+        """Обойти магазины и вернуть матрицу наличия."""
+        if self.concurrency < 1:
+            raise ValueError("`concurrency` must be greater than 0")
+
+        self.errors = {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        available: dict[int, set[int]] = {}
+
+        async def one(store: Store) -> None:
+            async with semaphore:
+                try:
+                    available[store.id] = await self._crawl_store(store)
+                except Exception as exc:
+                    self.errors[store.id] = repr(exc)
+
+        await asyncio.gather(*(one(s) for s in stores))
+        return AvailabilityMatrix.from_sets(available)
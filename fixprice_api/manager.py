@@ -1,18 +1,121 @@
+import asyncio
+import base64
+import json
+import time
 from collections import defaultdict
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from contextvars import ContextVar
 from dataclasses import dataclass, field
-from typing import Any, Literal
+from typing import Any, AsyncIterator, Iterator, Literal
 
-from camoufox import AsyncCamoufox, DefaultAddons
 from human_requests import (ApiParent, HumanBrowser, HumanContext, HumanPage,
                             api_child_field)
-from human_requests.abstraction import FetchResponse, HttpMethod, Proxy
-from human_requests.network_analyzer.anomaly_sniffer import (
-    HeaderAnomalySniffer, WaitHeader, WaitSource)
+from human_requests.abstraction import (URL, FetchRequest, FetchResponse,
+                                        HttpMethod, Proxy)
 
+from .abstraction import BatchRequest
 from .endpoints.advertising import ClassAdvertising
 from .endpoints.catalog import ClassCatalog
 from .endpoints.general import ClassGeneral
 from .endpoints.geolocation import ClassGeolocation
+from .proxy_pool import ProxyEntry, ProxyPool
+from .recycling import RecyclePolicy
+from .scheduler import Priority, RequestScheduler, current_priority
+from .shared_browser import LaunchedBrowser, SharedBrowser, launch_camoufox
+from .validation import ResponseValidator
+
+_BATCH_FETCH_JS = """
+async ({ items, ref, timeoutMs }) => {
+    const readBody = async (r) => {
+        try {
+            const blob = await r.blob();
+            return await new Promise((resolve) => {
+                const fr = new FileReader();
+                fr.onload = () => {
+                    const s = String(fr.result || "");
+                    const i = s.indexOf(",");
+                    resolve(i >= 0 ? s.slice(i + 1) : "");
+                };
+                fr.onerror = () => resolve("");
+                fr.readAsDataURL(blob);
+            });
+        } catch {
+            return null;
+        }
+    };
+
+    const one = async ({ url, method, headers, body, credentials }) => {
+        const ctrl = new AbortController();
+        const id = setTimeout(() => ctrl.abort("timeout"), timeoutMs);
+        try {
+            const init = {
+                method, headers, credentials, mode: "cors", signal: ctrl.signal,
+            };
+            if (ref) init.referrer = ref;
+            if (body !== undefined && body !== null) init.body = body;
+
+            const r = await fetch(url, init);
+            const headersObj = {};
+            try { r.headers.forEach((v, k) => headersObj[k.toLowerCase()] = v); } catch {}
+            return {
+                finalUrl: r.url,
+                status: r.status,
+                statusText: r.statusText,
+                type: r.type,
+                redirected: r.redirected,
+                headers: headersObj,
+                bodyB64: await readBody(r),
+            };
+        } finally {
+            clearTimeout(id);
+        }
+    };
+
+    const settled = await Promise.allSettled(items.map(one));
+    return settled.map((s) =>
+        s.status === "fulfilled"
+            ? { ok: true, ...s.value }
+            : { ok: false, error: String(s.reason) }
+    );
+}
+"""
+
+
+_ROUTING_FIELDS = {
+    "city_id": "x-city",
+    "store_id": "x-pfm",
+    "language": "x-language",
+    "delivery_type": "x-delivery-type",
+}
+"""Аргументы `FixPriceAPI.routing` и соответствующие им заголовки"""
+
+_routing: ContextVar[dict[int, dict[str, Any]]] = ContextVar(
+    "fixprice_api_routing", default={}
+)
+"""Заголовки маршрутизации, переопределенные `FixPriceAPI.routing`: `{id(клиента): {...}}`"""
+
+
+def _set_event() -> asyncio.Event:
+    event = asyncio.Event()
+    event.set()
+    return event
+
+
+@dataclass
+class _WarmContext:
+    """Прогретый контекст браузера со своими cookies и заголовками."""
+
+    ctx: HumanContext
+    page: HumanPage
+    headers: dict[str, str]
+    """Нестандартные заголовки, пойманные при прогреве"""
+    urls: dict[str, list[str]] = field(default_factory=dict)
+    entry: ProxyEntry | None = None
+    """Прокси из пула, через который работает контекст"""
+    active: int = 0
+    """Количество запросов, выполняющихся в контексте"""
+    closing: bool = False
+    """Прокси ушел в карантин: контекст закроется после своих запросов"""
 
 
 @dataclass
@@ -25,11 +128,39 @@ class FixPriceAPI(ApiParent):
     """Запускать браузер в headless режиме?"""
     test_mode: bool = False
     """Режим тестирования предполагает более глубокий _warmup который не требуется для обычного использования"""
-    proxy: str | dict | Proxy | None = field(default_factory=Proxy.from_env)
+    proxy: str | dict | Proxy | ProxyPool | None = field(default_factory=Proxy.from_env)
     """Прокси-сервер для всех запросов (если нужен). По умолчанию берет из окружения (если есть).
-    Принимает как формат Playwright, так и строчный формат."""
+    Принимает как формат Playwright, так и строчный формат.
+    При передаче `ProxyPool` у каждого прокси пула свой прогретый контекст (создается
+    при первом выборе прокси), и каждый запрос идет через выбранный из пула прокси.
+    Задержки и ошибки запросов учитываются в оценке пула, а контекст прокси,
+    ушедшего в карантин, закрывается."""
+    image_proxy: str | dict | Proxy | ProxyPool | None = None
+    """Прокси для `General.download_image`. Если не указан, используется `proxy`.
+    Позволяет скачивать изображения через другие выходные узлы, чем JSON-запросы."""
     browser_opts: dict[str, Any] = field(default_factory=dict)
     """Дополнительные опции для браузера (см. https://camoufox.com/python/installation/)"""
+    browser: HumanBrowser | SharedBrowser | None = None
+    """Готовый браузер, в котором клиент создаст свой контекст, вместо запуска
+    собственного. `SharedBrowser` закрывается, когда его отпустит последний клиент,
+    переданный `HumanBrowser` клиент не закрывает никогда. `proxy` в этом случае
+    применяется к контексту, а `headless`/`browser_opts` игнорируются.
+    `RecyclePolicy(scope="browser")` пересоздает только контекст, а
+    `RecyclePolicy.max_rss_bytes` не поддерживается."""
+    coalesce_requests: bool = True
+    """Объединять одинаковые одновременные запросы в один (single-flight).
+    Повторные вызовы получают результат уже выполняющегося запроса. С `scheduler`
+    вызов присоединяется только к запросу того же или более высокого приоритета."""
+    recycle: RecyclePolicy | None = None
+    """Политика периодического пересоздания контекста/браузера (для долгоживущих клиентов).
+    Ограничивает рост памяти браузера. По умолчанию выключено."""
+    scheduler: RequestScheduler | None = None
+    """Планировщик с приоритетными полосами (см. `fixprice_api.scheduler.priority`).
+    Ограничивает параллелизм операций браузера и пропускает интерактивные запросы
+    вперед фоновых. По умолчанию выключено."""
+    validator: ResponseValidator | None = None
+    """Выборочная проверка ответов на соответствие снапшот-схемам (дрейф API).
+    Несовпадения учитываются в счетчиках валидатора и не прерывают запрос."""
 
     MAIN_SITE_URL: str = "https://fix-price.com/catalog"
     MAIN_SITE_ORIGIN: str = "https://fix-price.com/"
@@ -49,6 +180,37 @@ class FixPriceAPI(ApiParent):
     unstandard_urls: dict[str, list[str]] = field(init=False, repr=False)
     """Список нестандартных заголовков пойманных при инициализации"""
 
+    _inflight: dict[tuple, asyncio.Task] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    """Выполняющиеся запросы для `coalesce_requests`"""
+    _contexts: dict[int, _WarmContext] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    """Прогретые контексты прокси из `ProxyPool` (по `id(ProxyEntry)`)"""
+    _warming: dict[int, asyncio.Task] = field(
+        init=False, repr=False, default_factory=dict
+    )
+    """Прогревающиеся контексты прокси (один прогрев на прокси)"""
+    _holds_browser: bool = field(init=False, repr=False, default=False)
+    """Клиент держит ссылку на `SharedBrowser`"""
+    _launched: LaunchedBrowser | None = field(init=False, repr=False, default=None)
+    """Браузер, запущенный самим клиентом (вместе с драйвером Playwright)"""
+    _browser_pids: set[int] = field(init=False, repr=False, default_factory=set)
+    """Процессы запущенного клиентом браузера (для `RecyclePolicy.max_rss_bytes`)"""
+    _requests_since_warmup: int = field(init=False, repr=False, default=0)
+    _warmed_at: float = field(init=False, repr=False, default=0.0)
+    _active: int = field(init=False, repr=False, default=0)
+    """Количество операций, использующих браузер прямо сейчас"""
+    _idle: asyncio.Event = field(init=False, repr=False, default_factory=_set_event)
+    _gate: asyncio.Event = field(init=False, repr=False, default_factory=_set_event)
+    """Сброшен на время пересоздания - новые операции ждут"""
+    _recycle_lock: asyncio.Lock = field(
+        init=False, repr=False, default_factory=asyncio.Lock
+    )
+    recycles: int = field(init=False, default=0)
+    """Сколько раз сессия была пересоздана по `recycle`."""
+
     Geolocation: ClassGeolocation = api_child_field(ClassGeolocation)
     """API для работы с геолокацией."""
     Catalog: ClassCatalog = api_child_field(ClassCatalog)
@@ -66,29 +228,125 @@ class FixPriceAPI(ApiParent):
     # Прогрев сессии (headless ➜ cookie `session` ➜ accessToken)
     async def _warmup(self) -> None:
         """Прогрев сессии через браузер для получения человекоподобности."""
-        px = self.proxy if isinstance(self.proxy, Proxy) else Proxy(self.proxy)
-        br = await AsyncCamoufox(
-            headless=self.headless,
-            proxy=px.as_dict(),
-            humanize=True,
-            **self.browser_opts,
-            block_images=True,
-            i_know_what_im_doing=True,
-            exclude_addons=[DefaultAddons.UBO],
-        ).start()
-
-        self.session = HumanBrowser.replace(br)
-        self.ctx = await self.session.new_context()
-        self.page = await self.ctx.new_page()
-        self.page.on_error_screenshot_path = "screenshot.png"
+        if (
+            self.recycle is not None
+            and self.recycle.max_rss_bytes is not None
+            and self.browser is not None
+        ):
+            # память чужого браузера - это и другие клиенты, пересоздание ее не вернет
+            raise ValueError(
+                "`RecyclePolicy.max_rss_bytes` requires a browser launched by "
+                "the client (`browser=None`)"
+            )
+        if isinstance(self.browser, SharedBrowser):
+            self.session = await self.browser.acquire()
+            self._holds_browser = True
+        elif self.browser is not None:
+            self.session = self.browser
+        else:
+            self.session = await self._launch_browser()
+
+        try:
+            await self._warmup_context()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _launch_browser(self) -> HumanBrowser:
+        self._launched = await launch_camoufox(
+            self.headless, self._fixed_proxy(), self.browser_opts
+        )
+        # дерево процессов своего драйвера, а не все новые процессы: рядом могут
+        # одновременно запускаться браузеры других клиентов
+        self._browser_pids = self._launched.pids
+        return self._launched.browser
+
+    async def _close_browser(self) -> None:
+        """Закрыть запущенный клиентом браузер и его драйвер Playwright."""
+        launched, self._launched = self._launched, None
+        self._browser_pids = set()
+        if launched is not None:
+            await launched.close()
+        else:
+            await self.session.close()
+
+    async def _warmup_context(self) -> None:
+        """Прогреть основной контекст (`ctx`/`page`) и заголовки клиента."""
+        if isinstance(self.proxy, ProxyPool):
+            warm = await self._warmup_first_proxy()
+        else:
+            warm = await self._open_context(None)
+
+        self.ctx, self.page = warm.ctx, warm.page
+        self.unstandard_headers = dict(warm.headers)
+        self.unstandard_urls = warm.urls
+
+        self._requests_since_warmup = 0
+        self._warmed_at = time.monotonic()
+
+    async def _warmup_first_proxy(self) -> _WarmContext:
+        # остальные прокси пула прогреваются по мере выбора (см. `_route`)
+        assert isinstance(self.proxy, ProxyPool)
+        self._contexts = {}
+        failed: list[ProxyEntry] = []
+        while True:
+            entry = self.proxy.choose(exclude=failed)
+            try:
+                return await self._open_pool_context(entry)
+            except Exception:
+                failed.append(entry)
+                if len(failed) >= len(self.proxy):
+                    raise
+
+    async def _open_pool_context(self, entry: ProxyEntry) -> _WarmContext:
+        assert isinstance(self.proxy, ProxyPool)
+        try:
+            warm = await self._open_context(entry)
+        except Exception:
+            self.proxy.report(entry, error=True)
+            raise
+
+        # основной контекст закрыт вместе с прокси - его место занимает новый
+        if not any(
+            w.ctx is getattr(self, "ctx", None) for w in self._contexts.values()
+        ):
+            self.ctx, self.page = warm.ctx, warm.page
+        self._contexts[id(entry)] = warm
+        return warm
+
+    async def _open_context(self, entry: ProxyEntry | None) -> _WarmContext:
+        """Создать и прогреть контекст (для `entry` - через его прокси)."""
+        if entry is not None:
+            ctx = await self.session.new_context(proxy=entry.proxy.as_dict())
+        elif self.browser is None:
+            ctx = await self.session.new_context()
+        else:
+            # общий браузер: прокси клиента задается на уровне контекста
+            ctx = await self.session.new_context(proxy=self._fixed_proxy().as_dict())
+
+        try:
+            page = await ctx.new_page()
+            headers, urls = await self._sniff_headers(ctx, page)
+        except BaseException:
+            await ctx.close()
+            raise
+        return _WarmContext(ctx, page, headers, urls, entry)
+
+    async def _sniff_headers(
+        self, ctx: HumanContext, page: HumanPage
+    ) -> tuple[dict[str, str], dict[str, list[str]]]:
+        from human_requests.network_analyzer.anomaly_sniffer import (
+            HeaderAnomalySniffer, WaitHeader, WaitSource)
+
+        page.on_error_screenshot_path = "screenshot.png"
 
         sniffer = HeaderAnomalySniffer(
             include_subresources=True,  # или False, если интересны только документы
             url_filter=lambda u: u.startswith(self.CATALOG_URL),
         )
-        await sniffer.start(self.ctx)
+        await sniffer.start(ctx)
 
-        await self.page.goto(self.MAIN_SITE_URL, wait_until="networkidle")
+        await page.goto(self.MAIN_SITE_URL, wait_until="networkidle")
 
         await sniffer.wait(
             tasks=[
@@ -101,22 +359,22 @@ class FixPriceAPI(ApiParent):
         )
 
         if self.test_mode:
-            btn = self.page.locator(
+            btn = page.locator(
                 "div.selected-city > div.buttons > button.button.normal"
             ).first
             await btn.wait_for(state="visible", timeout=self.timeout_ms)
             await btn.click(timeout=self.timeout_ms)
 
-            await self.page.locator("a.link.product-category").first.click()
-            await self.page.wait_for_selector(
+            await page.locator("a.link.product-category").first.click()
+            await page.wait_for_selector(
                 selector="div.page-content", timeout=self.timeout_ms, state="visible"
             )
-            await self.page.wait_for_load_state("load")
+            await page.wait_for_load_state("load")
 
-        await self.page.goto(
+        await page.goto(
             self.CATALOG_URL, wait_until="networkidle"
         )  # ускорение сети, таким образом пропускаем OPTION pre-fetch
-        await self.page.wait_for_selector(
+        await page.wait_for_selector(
             selector="body > pre", timeout=self.timeout_ms, state="visible"
         )
 
@@ -131,21 +389,168 @@ class FixPriceAPI(ApiParent):
                 result[header].update(values)  # добавляем значения, set уберёт дубли
 
         # Преобразуем set обратно в list
-        self.unstandard_headers = {k: list(v)[0] for k, v in result.items()}
-        self.unstandard_urls = result_sniffer["request"]
+        return {k: list(v)[0] for k, v in result.items()}, result_sniffer["request"]
+
+    async def _recycle(self) -> None:
+        """Пересоздать контекст или браузер, сохранив выбранные пользователем
+        город, магазин, язык и способ получения."""
+        assert self.recycle is not None
+        routing = {
+            h: self.unstandard_headers[h]
+            for h in self.ROUTING_HEADERS
+            if h in self.unstandard_headers
+        }
+
+        if self.recycle.scope == "browser" and self.browser is None:
+            await self._close_browser()
+            self._contexts = {}
+            self.session = await self._launch_browser()
+        else:
+            await self._close_contexts()
+        await self._warmup_context()
+
+        self.unstandard_headers.update(routing)
+        self.recycles += 1
+
+    async def _maybe_recycle(self) -> None:
+        if self.recycle is None:
+            return
+
+        # Проверка под блокировкой: пересоздание выполняет только один запрос
+        async with self._recycle_lock:
+            if not self.recycle.reason(
+                self._requests_since_warmup, self._warmed_at, self._browser_pids
+            ):
+                return
+
+            self._gate.clear()
+            try:
+                await self._idle.wait()  # начатые операции завершаются
+                await self._recycle()
+            finally:
+                self._gate.set()
+
+    @asynccontextmanager
+    async def _lease(self) -> AsyncIterator[None]:
+        """Учет операции, использующей браузер (для `scheduler` и безопасного `recycle`)."""
+        slot = self.scheduler.slot() if self.scheduler is not None else nullcontext()
+        async with slot:
+            await self._maybe_recycle()
+            await self._gate.wait()
+
+            self._active += 1
+            self._idle.clear()
+            self._requests_since_warmup += 1
+            try:
+                yield
+            finally:
+                self._active -= 1
+                if self._active == 0:
+                    self._idle.set()
+
+    @asynccontextmanager
+    async def _route(self) -> AsyncIterator[_WarmContext]:
+        """Контекст для очередного запроса: с `ProxyPool` - контекст выбранного из пула
+        прокси (прогревается при первом выборе), иначе основной."""
+        if not isinstance(self.proxy, ProxyPool):
+            yield _WarmContext(self.ctx, self.page, self.unstandard_headers)
+            return
+
+        warm = await self._pool_context()
+        warm.active += 1
+        try:
+            yield warm
+        finally:
+            warm.active -= 1
+            if warm.closing and warm.active == 0:
+                await warm.ctx.close()
+
+    async def _pool_context(self) -> _WarmContext:
+        assert isinstance(self.proxy, ProxyPool)
+        failed: list[ProxyEntry] = []
+        while True:
+            entry = self.proxy.choose(exclude=failed)
+            warm = self._contexts.get(id(entry))
+            if warm is not None:
+                return warm
+
+            task = self._warming.get(id(entry))
+            if task is None:
+                task = asyncio.ensure_future(self._open_pool_context(entry))
+                self._warming[id(entry)] = task
+
+                def _forget(t: asyncio.Task, key: int = id(entry)) -> None:
+                    if self._warming.get(key) is t:
+                        del self._warming[key]
+                    if not t.cancelled():
+                        t.exception()  # помечаем исключение полученным
+
+                task.add_done_callback(_forget)
+
+            try:
+                return await asyncio.shield(task)
+            except Exception:
+                # прокси не прогрелся (и уже учтен как ошибка) - пробуем другой
+                failed.append(entry)
+                if len(failed) >= len(self.proxy):
+                    raise
+
+    def _report(
+        self, warm: _WarmContext, *, latency: float | None = None, error: bool = False
+    ) -> None:
+        """Учесть результат запроса в `ProxyPool`. Контекст прокси, ушедшего в
+        карантин, снимается с маршрута и закрывается после своих запросов."""
+        if warm.entry is None or not isinstance(self.proxy, ProxyPool):
+            return
+        self.proxy.report(warm.entry, latency=latency, error=error)
+        if not warm.entry.quarantined or self._contexts.get(id(warm.entry)) is not warm:
+            return
+
+        del self._contexts[id(warm.entry)]
+        warm.closing = True
+        if warm.ctx is self.ctx and self._contexts:
+            other = next(iter(self._contexts.values()))
+            self.ctx, self.page = other.ctx, other.page
+
+    async def _close_contexts(self) -> None:
+        contexts = {id(w.ctx): w.ctx for w in self._contexts.values()}
+        if getattr(self, "ctx", None) is not None:
+            contexts.setdefault(id(self.ctx), self.ctx)
+        self._contexts = {}
+        for ctx in contexts.values():
+            await ctx.close()
 
     async def __aexit__(self, *exc):
         """Выход из контекстного менеджера с закрытием сессии."""
         await self.close()
 
     async def close(self):
-        """Закрыть HTTP-сессию и освободить ресурсы."""
-        await self.session.close()
+        """Закрыть HTTP-сессию и освободить ресурсы.
+
+        При общем браузере закрывается только контекст клиента, а сам браузер -
+        когда его отпустит последний клиент (см. `SharedBrowser`)."""
+        if self.browser is None:
+            await self._close_browser()
+            return
+
+        try:
+            await self._close_contexts()
+        finally:
+            if self._holds_browser:
+                self._holds_browser = False
+                await self.browser.release()
+
+    def _fixed_proxy(self) -> Proxy:
+        """Прокси браузера/основного контекста. У `ProxyPool` прокси задается
+        каждому контексту отдельно, поэтому браузер запускается без него."""
+        if isinstance(self.proxy, ProxyPool):
+            return Proxy(None)
+        return self.proxy if isinstance(self.proxy, Proxy) else Proxy(self.proxy)
 
     @property
     def city_id(self) -> int | None:
         """ID города используемый как фильтр каталога. Если не указан, автоматически назначается в первом ответе сервера. Обычно это `3` (Москва)."""
-        x = self.unstandard_headers.get("x-city", None)
+        x = self._routing_header("x-city")
         if x:
             x = int(x)
         return x
@@ -166,7 +571,7 @@ class FixPriceAPI(ApiParent):
     @property
     def language(self) -> str | None:
         """Язык используемый как фильтр каталога. ISO-2. Если не указан, автоматически назначается в первом ответе сервера. Обычно это `ru` (Русский)."""
-        return self.unstandard_headers.get("x-language", None)
+        return self._routing_header("x-language")
 
     @language.setter
     def language(self, value: str | None) -> None:
@@ -195,7 +600,7 @@ class FixPriceAPI(ApiParent):
         store - самовывоз из магазина
         pickup - получить из ПВЗ
         courier - курьерская доставка"""
-        return self.unstandard_headers.get("x-delivery-type", None)
+        return self._routing_header("x-delivery-type")
 
     @delivery_type.setter
     def delivery_type(self, value: Literal["store", "pickup", "courier"]) -> None:
@@ -205,7 +610,7 @@ class FixPriceAPI(ApiParent):
     def store_id(self) -> str | None:
         """Индификатор магазина или ПВЗ. Обычно состоит из 1 латинской буквы и 3 цифр.
         В терминологии сайта называется PFM"""
-        return self.unstandard_headers.get("x-pfm", None)
+        return self._routing_header("x-pfm")
 
     @store_id.setter
     def store_id(self, value: str) -> None:
@@ -220,6 +625,127 @@ class FixPriceAPI(ApiParent):
     def client_route(self, value: str) -> None:
         self.unstandard_headers.update({"x-client-route": value})
 
+    ROUTING_HEADERS = ("x-city", "x-pfm", "x-language", "x-delivery-type")
+    """Заголовки, влияющие на ответ: входят в ключ объединения запросов
+    и сохраняются при пересоздании сессии."""
+
+    @contextmanager
+    def routing(self, **values: Any) -> Iterator[None]:
+        """Город, магазин, язык и способ получения для вызовов внутри блока.
+
+        Принимает `city_id`, `store_id`, `language` и `delivery_type`; `None` убирает
+        заголовок из запросов. В отличие от установки свойств клиента, действует только
+        в текущей задаче asyncio: параллельные обходы разных городов и магазинов на одном
+        клиенте не мешают друг другу и не меняют его настройки::
+
+            async def crawl(city_id):
+                with api.routing(city_id=city_id):
+                    return await api.Catalog.products_list("kosmetika")
+
+            await asyncio.gather(crawl(3), crawl(5))
+        """
+        unknown = values.keys() - _ROUTING_FIELDS.keys()
+        if unknown:
+            raise TypeError(f"Unknown routing fields: {sorted(unknown)}")
+        if values.get("city_id") is not None:
+            values["city_id"] = int(values["city_id"])
+            if values["city_id"] < 1:
+                raise ValueError("`city_id` must be greater than 0")
+
+        current = _routing.get()
+        override = current.get(id(self), {}) | {
+            _ROUTING_FIELDS[name]: value for name, value in values.items()
+        }
+        token = _routing.set(current | {id(self): override})
+        try:
+            yield
+        finally:
+            _routing.reset(token)
+
+    def _routing_header(self, header: str) -> Any:
+        """Значение заголовка маршрутизации с учетом `routing`."""
+        override = _routing.get().get(id(self), {})
+        if header in override:
+            return override[header]
+        return self.unstandard_headers.get(header, None)
+
+    def _coalesce_key(
+        self,
+        method: HttpMethod,
+        url: str,
+        json_body: Any | None,
+        routing: dict[str, Any] | None,
+        credentials: bool,
+    ) -> tuple:
+        route_key = (
+            tuple(str(routing.get(h)) for h in self.ROUTING_HEADERS)
+            if routing is not None
+            else None
+        )
+        body = (
+            json.dumps(json_body, sort_keys=True, ensure_ascii=False)
+            if json_body is not None
+            else None
+        )
+        # без планировщика приоритет ни на что не влияет
+        level = current_priority() if self.scheduler is not None else None
+        return (method.value, url, body, credentials, route_key, level)
+
+    def _joinable(self, key: tuple) -> asyncio.Task | None:
+        """Выполняющийся запрос, к которому можно присоединиться.
+
+        Запрос более низкого приоритета не подходит: ожидающий простоял бы в его
+        полосе планировщика."""
+        *base, level = key
+        if level is None:
+            return self._inflight.get(key)
+        for lane in Priority:
+            if lane > level:
+                break
+            task = self._inflight.get((*base, lane))
+            if task is not None:
+                return task
+        return None
+
+    def _routing_snapshot(self, add_unstandard_headers: bool) -> dict[str, Any] | None:
+        """Заголовки маршрутизации на момент вызова (`None` - без нестандартных заголовков)."""
+        if not add_unstandard_headers:
+            return None
+        routing = {
+            h: self.unstandard_headers[h]
+            for h in (*self.ROUTING_HEADERS, "x-client-route")
+            if h in self.unstandard_headers
+        }
+        for header, value in _routing.get().get(id(self), {}).items():
+            if value is None:
+                routing.pop(header, None)
+            else:
+                routing[header] = value
+        return routing
+
+    def _headers(
+        self, routing: dict[str, Any] | None, warm: _WarmContext | None = None
+    ) -> dict[str, Any]:
+        """Заголовки запроса: актуальные (после возможного пересоздания сессии)
+        нестандартные заголовки контекста `warm` поверх которых - маршрутизация
+        на момент вызова."""
+        headers: dict[str, Any] = {"Accept": "application/json, text/plain, */*"}
+        if routing is not None:
+            sniffed = (
+                warm.headers
+                if warm is not None and warm.entry is not None
+                else self.unstandard_headers
+            )
+            # маршрутизация берется только из снимка: заголовок, убранный
+            # к моменту вызова, не должен вернуться из пойманных при прогреве
+            headers |= {
+                k: v
+                for k, v in sniffed.items()
+                if k not in (*self.ROUTING_HEADERS, "x-client-route")
+            }
+            headers |= routing
+        return headers
+
     async def _request(
         self,
         method: HttpMethod,
@@ -233,13 +759,183 @@ class FixPriceAPI(ApiParent):
         """Выполнить HTTP-запрос через внутреннюю сессию.
 
         Единая точка входа для всех HTTP-запросов библиотеки.
+        Одинаковые одновременные запросы объединяются (см. `coalesce_requests`).
         """
         if real_route:
             self.client_route = real_route
 
+        # Город/магазин/язык фиксируются в момент вызова, а не в момент отправки
+        routing = self._routing_snapshot(add_unstandard_headers)
+
+        if not self.coalesce_requests:
+            return await self._send(method, url, json_body, routing, credentials)
+
+        key = self._coalesce_key(method, url, json_body, routing, credentials)
+        task = self._joinable(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._send(method, url, json_body, routing, credentials)
+            )
+            self._inflight[key] = task
+
+            def _forget(t: asyncio.Task, key: tuple = key) -> None:
+                if self._inflight.get(key) is t:
+                    del self._inflight[key]
+                if not t.cancelled():
+                    t.exception()  # помечаем исключение полученным
+
+            task.add_done_callback(_forget)
+
+        # shield: отмена одного из ожидающих не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    async def batch(
+        self, requests: list[BatchRequest], *, chunk_size: int = 64
+    ) -> list[FetchResponse | Exception]:
+        """Выполнить пачку запросов за один вызов в браузер.
+
+        Запросы выполняются внутри страницы параллельно (`Promise.allSettled`) поверх
+        уже открытого HTTP/2 соединения, а результаты возвращаются за одно IPC-обращение.
+        Порядок ответов совпадает с порядком `requests`. Неудавшиеся запросы
+        возвращаются как исключения, а не пробрасываются.
+        """
+        if chunk_size < 1:
+            raise ValueError("`chunk_size` must be greater than 0")
+
+        results: list[FetchResponse | Exception] = []
+        for start in range(0, len(requests), chunk_size):
+            results.extend(
+                await self._batch_chunk(requests[start : start + chunk_size])
+            )
+        return results
+
+    async def _batch_chunk(
+        self, requests: list[BatchRequest]
+    ) -> list[FetchResponse | Exception]:
+        routings = [self._routing_snapshot(r.add_unstandard_headers) for r in requests]
+
+        start_t = time.perf_counter()
+        async with self._lease(), self._route() as warm:
+            items = []
+            declared = []
+            for r, routing in zip(requests, routings):
+                headers = {
+                    k.lower(): v for k, v in self._headers(routing, warm).items()
+                }
+                body = r.json_body
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body, ensure_ascii=False)
+                    headers["content-type"] = "application/json"
+                declared.append(headers)
+                items.append(
+                    dict(
+                        url=r.url,
+                        method=r.method.value,
+                        headers={k: str(v) for k, v in headers.items()},
+                        body=body,
+                        credentials="include" if r.credentials else "omit",
+                    )
+                )
+
+            try:
+                raw_results = await warm.page.evaluate(
+                    _BATCH_FETCH_JS,
+                    dict(
+                        items=items,
+                        ref=self.MAIN_SITE_ORIGIN,
+                        timeoutMs=self.timeout_ms,
+                    ),
+                )
+            except Exception:
+                self._report(warm, error=True)
+                raise
+            duration = time.perf_counter() - start_t
+            # пачка - один замер для пула: ошибка, если ни один запрос не прошел
+            self._report(
+                warm,
+                latency=duration,
+                error=not any(
+                    res.get("ok") and int(res.get("status", 0)) < 500
+                    for res in raw_results
+                ),
+            )
+        end_epoch = time.time()
+
+        results: list[FetchResponse | Exception] = []
+        for r, routing, headers, res in zip(requests, routings, declared, raw_results):
+            if not res.get("ok"):
+                results.append(RuntimeError(f"fetch failed: {res.get('error')}"))
+                continue
+
+            b64 = res.get("bodyB64")
+            raw = base64.b64decode(b64) if isinstance(b64, str) else b""
+            resp_headers = dict(res.get("headers") or {})
+            if raw:
+                resp_headers.pop("content-encoding", None)
+                resp_headers.pop("content-length", None)
+
+            if "html" in resp_headers.get("content-type", ""):
+                # JS-челлендж: обрабатываем как обычный запрос
+                try:
+                    results.append(
+                        await self._send(
+                            r.method, r.url, r.json_body, routing, r.credentials
+                        )
+                    )
+                except Exception as exc:
+                    results.append(exc)
+                continue
+
+            resp = FetchResponse(
+                request=FetchRequest(
+                    page=warm.page,
+                    method=r.method,
+                    url=URL(full_url=r.url),
+                    headers=headers,
+                    body=r.json_body,
+                ),
+                page=warm.page,
+                url=URL(full_url=res.get("finalUrl") or r.url),
+                headers=resp_headers,
+                raw=raw,
+                status_code=int(res.get("status", 0)),
+                status_text=str(res.get("statusText", "")),
+                redirected=bool(res.get("redirected", False)),
+                type=res.get("type"),
+                duration=duration,
+                end_time=end_epoch,
+            )
+            if self.validator is not None:
+                self.validator.observe(r.url, resp)
+            results.append(resp)
+        return results
+
+    async def _send(
+        self,
+        method: HttpMethod,
+        url: str,
+        json_body: Any | None,
+        routing: dict[str, Any] | None,
+        credentials: bool,
+    ) -> FetchResponse:
+        async with self._lease(), self._route() as warm:
+            resp = await self._fetch(warm, method, url, json_body, routing, credentials)
+        if self.validator is not None:
+            self.validator.observe(url, resp)
+        return resp
+
+    async def _fetch(
+        self,
+        warm: _WarmContext,
+        method: HttpMethod,
+        url: str,
+        json_body: Any | None,
+        routing: dict[str, Any] | None,
+        credentials: bool,
+    ) -> FetchResponse:
         # Единая точка входа в чужую библиотеку для удобства
         async def f() -> FetchResponse:
-            return await self.page.fetch(
+            return await warm.page.fetch(
                 url=url,
                 method=method,
                 body=json_body,
@@ -247,17 +943,20 @@ class FixPriceAPI(ApiParent):
                 credentials="include" if credentials else "omit",
                 timeout_ms=self.timeout_ms,
                 referrer=self.MAIN_SITE_ORIGIN,
-                headers={"Accept": "application/json, text/plain, */*"}
-                | (self.unstandard_headers if add_unstandard_headers else {}),
+                headers=self._headers(routing, warm),
             )
 
-        resp = await f()
-        if "html" in resp.headers.get("content-type"):
-            temporal_page = await resp.render(wait_until="networkidle")
-            await temporal_page.wait_for_selector(
-                selector="body > pre", timeout=self.timeout_ms, state="visible"
-            )
-            await temporal_page.close()
+        try:
             resp = await f()
-
+            if "html" in resp.headers.get("content-type"):
+                temporal_page = await resp.render(wait_until="networkidle")
+                await temporal_page.wait_for_selector(
+                    selector="body > pre", timeout=self.timeout_ms, state="visible"
+                )
+                await temporal_page.close()
+                resp = await f()
+        except Exception:
+            self._report(warm, error=True)
+            raise
+        self._report(warm, latency=resp.duration, error=resp.status_code >= 500)
         return resp
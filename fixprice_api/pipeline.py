@@ -0,0 +1,402 @@
+"""Потоковая выгрузка данных: источники, преобразования, приемники"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Callable,
+                    Iterable, Literal, Optional)
+
+from . import abstraction
+
+if TYPE_CHECKING:
+    from .manager import FixPriceAPI
+
+Record = dict[str, Any]
+Transform = Callable[[AsyncIterable[Any]], AsyncIterable[Any]]
+Compression = Literal["gzip", "zstd"] | None
+
+_END = object()
+
+
+# --------------------------------------------------------------------- sources
+
+
+def _json_list(resp: Any) -> list[Any]:
+    """Список из ответа API. Ответ с ошибкой (403/429 - словарь с `message`)
+    не должен попасть в приемники как записи."""
+    if not 200 <= resp.status_code < 300:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+    data = resp.json()
+    if not isinstance(data, list):
+        raise ValueError(f"unexpected body: {type(data).__name__}")
+    return data
+
+
+async def products_source(
+    api: "FixPriceAPI",
+    category_alias: str,
+    subcategory_alias: Optional[str] = None,
+    *,
+    limit: int = 24,
+    sort: abstraction.CatalogSort | str = abstraction.CatalogSort.POPULARITY,
+) -> AsyncIterator[Record]:
+    """Все товары категории постранично. Следующая страница запрашивается только
+    когда предыдущая полностью забрана потребителем."""
+    page = 1
+    while True:
+        resp = await api.Catalog.products_list(
+            category_alias=category_alias,
+            subcategory_alias=subcategory_alias,
+            page=page,
+            limit=limit,
+            sort=sort,
+        )
+        products = _json_list(resp)
+        for product in products:
+            yield product
+        if len(products) < limit:
+            return
+        page += 1
+
+
+async def _bounded_map(
+    items: Iterable[Any],
+    func: Callable[[Any], Any],
+    concurrency: int,
+) -> AsyncIterator[Any]:
+    """`func` над `items` с ограничением параллелизма, в порядке завершения."""
+    if concurrency < 1:
+        raise ValueError("`concurrency` must be greater than 0")
+
+    it = iter(items)
+    pending: set[asyncio.Task] = set()
+    try:
+        for item in it:
+            pending.add(asyncio.ensure_future(func(item)))
+            if len(pending) >= concurrency:
+                break
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield task.result()
+                nxt = next(it, _END)
+                if nxt is not _END:
+                    pending.add(asyncio.ensure_future(func(nxt)))
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def balance_source(
+    api: "FixPriceAPI",
+    product_ids: Iterable[int],
+    *,
+    concurrency: int = 8,
+    in_stock: bool = True,
+) -> AsyncIterator[Record]:
+    """Наличие по магазинам для списка товаров: `{"product_id": ..., "stores": [...]}`."""
+
+    async def one(product_id: int) -> Record:
+        resp = await api.Catalog.Product.balance(product_id, in_stock=in_stock)
+        return {"product_id": product_id, "stores": _json_list(resp)}
+
+    return _bounded_map(product_ids, one, concurrency)
+
+
+def info_source(
+    api: "FixPriceAPI", urls: Iterable[str], *, concurrency: int = 4
+) -> AsyncIterator[Record]:
+    """Карточки товаров (`Product.info`) по списку url."""
+
+    async def one(url: str) -> Record:
+        return (await api.Catalog.Product.info(url=url)).json()
+
+    return _bounded_map(urls, one, concurrency)
+
+
+# ------------------------------------------------------------------ transforms
+
+
+def _flatten_record(record: Record, sep: str, prefix: str = "") -> Record:
+    out: Record = {}
+    for key, value in record.items():
+        name = f"{prefix}{sep}{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            out.update(_flatten_record(value, sep, name))
+        else:
+            out[name] = value
+    return out
+
+
+def flatten(sep: str = ".") -> Transform:
+    """Разворачивает вложенные словари: `{"brand": {"id": 1}}` -> `{"brand.id": 1}`."""
+
+    async def stage(source: AsyncIterable[Record]) -> AsyncIterator[Record]:
+        async for record in source:
+            yield _flatten_record(record, sep)
+
+    return stage
+
+
+def project(fields: Iterable[str]) -> Transform:
+    """Оставляет только указанные поля (отсутствующие заполняются `None`)."""
+    names = list(fields)
+
+    async def stage(source: AsyncIterable[Record]) -> AsyncIterator[Record]:
+        async for record in source:
+            yield {name: record.get(name) for name in names}
+
+    return stage
+
+
+def dedupe(key: str = "id") -> Transform:
+    """Пропускает записи с уже встречавшимся значением `key`."""
+
+    async def stage(source: AsyncIterable[Record]) -> AsyncIterator[Record]:
+        seen: set[Any] = set()
+        async for record in source:
+            value = record.get(key)
+            if value in seen:
+                continue
+            seen.add(value)
+            yield record
+
+    return stage
+
+
+# ----------------------------------------------------------------------- sinks
+
+
+class _RotatingFile:
+    """Бинарный файл с опциональным сжатием и ротацией по размеру."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        compression: Compression,
+        rotate_bytes: Optional[int],
+    ) -> None:
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError("`compression` must be None, 'gzip' or 'zstd'")
+        self.path = Path(path)
+        self.compression = compression
+        self.rotate_bytes = rotate_bytes
+        self.index = 0
+        self.paths: list[Path] = []
+        self._raw: Optional[io.BufferedWriter] = None
+        self._stream: Any = None
+        self._written = 0
+
+    def _next_path(self) -> Path:
+        suffix = {"gzip": ".gz", "zstd": ".zst", None: ""}[self.compression]
+        if self.rotate_bytes is None:
+            return self.path.with_name(self.path.name + suffix)
+        return self.path.with_name(
+            f"{self.path.stem}.{self.index:05d}{self.path.suffix}{suffix}"
+        )
+
+    def open(self) -> None:
+        path = self._next_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._raw = open(path, "wb")
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compression == "zstd":
+            try:
+                import zstandard
+            except ImportError as e:  # pragma: no cover
+                raise ImportError(
+                    "zstd compression requires `zstandard` (pip install fixprice_api[stream])"
+                ) from e
+            self._stream = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._stream = self._raw
+        self.paths.append(path)
+        self.index += 1
+        self._written = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    def should_rotate(self) -> bool:
+        return self.rotate_bytes is not None and self._written >= self.rotate_bytes
+
+    def write(self, data: bytes) -> None:
+        self._stream.write(data)
+        self._written += len(data)
+
+    def close(self) -> None:
+        if self._stream is None:
+            return
+        if self._stream is not self._raw:
+            self._stream.close()
+        if self._raw is not None and not self._raw.closed:
+            self._raw.close()
+        self._stream = self._raw = None
+
+
+class NDJSONSink:
+    """Запись построчного JSON (по одному объекту на строку).
+
+    `compression` - `"gzip"`, `"zstd"` или `None`.
+    `rotate_bytes` - начинать новый файл (`name.00001.ndjson`) после указанного
+    объема записанных данных (до сжатия)."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        compression: Compression = None,
+        rotate_bytes: Optional[int] = None,
+    ) -> None:
+        self._file = _RotatingFile(path, compression, rotate_bytes)
+        self.records = 0
+
+    @property
+    def paths(self) -> list[Path]:
+        """Созданные файлы."""
+        return self._file.paths
+
+    def _encode(self, record: Any) -> bytes:
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _on_open(self) -> None:
+        pass
+
+    def write_batch(self, records: list[Any]) -> None:
+        """Синхронная запись пачки. Вызывается в отдельном потоке из `run_pipeline`."""
+        for record in records:
+            if not self._file.is_open:
+                self._file.open()
+                self._on_open()
+            self._file.write(self._encode(record))
+            self.records += 1
+            if self._file.should_rotate():
+                self._file.close()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class CSVSink(NDJSONSink):
+    """Запись CSV. Заголовок пишется в начало каждого файла (в т.ч. после ротации).
+
+    `fields` - колонки; если не заданы, берутся ключи первой записи.
+    Вложенные значения сериализуются в JSON (см. также `flatten`)."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        fields: Optional[Iterable[str]] = None,
+        *,
+        compression: Compression = None,
+        rotate_bytes: Optional[int] = None,
+    ) -> None:
+        super().__init__(path, compression=compression, rotate_bytes=rotate_bytes)
+        self.fields = list(fields) if fields is not None else None
+        self._buf = io.StringIO()
+        self._writer: Optional[csv.DictWriter] = None
+
+    def _row(self, values: Iterable[Any] | dict[str, Any]) -> bytes:
+        self._buf.seek(0)
+        self._buf.truncate()
+        if isinstance(values, dict):
+            assert self._writer is not None
+            self._writer.writerow(values)
+        else:
+            csv.writer(self._buf).writerow(values)
+        return self._buf.getvalue().encode("utf-8")
+
+    def _encode(self, record: Record) -> bytes:
+        if self.fields is None:
+            self.fields = list(record)
+        if self._writer is None:
+            self._writer = csv.DictWriter(
+                self._buf, fieldnames=self.fields, extrasaction="ignore"
+            )
+        return self._row(
+            {
+                k: (
+                    json.dumps(v, ensure_ascii=False)
+                    if isinstance(v, (dict, list))
+                    else v
+                )
+                for k, v in record.items()
+            }
+        )
+
+    def write_batch(self, records: list[Record]) -> None:
+        if records and self.fields is None:
+            self.fields = list(records[0])
+        super().write_batch(records)
+
+    def _on_open(self) -> None:
+        assert self.fields is not None
+        self._file.write(self._row(self.fields))
+
+
+# -------------------------------------------------------------------- pipeline
+
+
+async def run_pipeline(
+    source: AsyncIterable[Any],
+    *transforms: Transform,
+    sink: NDJSONSink,
+    buffer: int = 256,
+    batch_size: int = 64,
+) -> int:
+    """Прогнать `source` через `transforms` в `sink`. Возвращает число записей.
+
+    Между источником и приемником стоит очередь размером `buffer`: если приемник
+    не успевает, очередь заполняется и источник перестает запрашивать новые
+    страницы, поэтому потребление памяти не зависит от размера каталога.
+    Запись в файл выполняется в отдельном потоке пачками по `batch_size`."""
+    if buffer < 1 or batch_size < 1:
+        raise ValueError("`buffer` and `batch_size` must be greater than 0")
+
+    stream: AsyncIterable[Any] = source
+    for transform in transforms:
+        stream = transform(stream)
+
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=buffer)
+
+    async def produce() -> None:
+        try:
+            async for record in stream:
+                await queue.put(record)
+        except Exception:
+            await queue.put(_END)
+            raise
+        await queue.put(_END)
+
+    async def consume() -> int:
+        written = 0
+        finished = False
+        while not finished:
+            batch = [await queue.get()]
+            while len(batch) < batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is _END:
+                batch.pop()
+                finished = True
+            if batch:
+                await asyncio.to_thread(sink.write_batch, batch)
+                written += len(batch)
+        return written
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        written = await consume()
+        await producer
+    finally:
+        producer.cancel()
+        await asyncio.to_thread(sink.close)
+    return written
@@ -0,0 +1,218 @@
+"""Адаптивный опрос наличия товаров"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Optional
+
+if TYPE_CHECKING:
+    from .manager import FixPriceAPI
+
+Snapshot = dict[int, int]
+"""Наличие по магазинам: `{id магазина: количество}`."""
+
+
+@dataclass
+class WatchedItem:
+    """Отслеживаемая пара (товар, город) и ее статистика изменений."""
+
+    product_id: int
+    city_id: int
+    interval: float
+    """Текущий интервал опроса в секундах."""
+    next_due: float
+    snapshot: Optional[Snapshot] = None
+    polls: int = 0
+    changes: int = 0
+    failures: int = 0
+    """Опросы, не давшие данных (ошибка запроса, не-2xx ответ, неожиданное тело)."""
+    change_rate: float = 0.0
+    """EWMA доли опросов, на которых наличие изменилось."""
+
+
+@dataclass(frozen=True)
+class StockChange:
+    """Событие изменения наличия товара в городе."""
+
+    product_id: int
+    city_id: int
+    before: Snapshot
+    after: Snapshot
+    observed_at: float
+    """Время обнаружения (Unix time)."""
+
+    @property
+    def delta(self) -> dict[int, int]:
+        """Изменение количества по магазинам (только изменившиеся)."""
+        stores = self.before.keys() | self.after.keys()
+        return {
+            s: self.after.get(s, 0) - self.before.get(s, 0)
+            for s in stores
+            if self.after.get(s, 0) != self.before.get(s, 0)
+        }
+
+
+@dataclass
+class StockPoller:
+    """Опрос `Product.balance` с интервалом, подстраивающимся под волатильность.
+
+    Шаг интервала зависит от доли опросов, на которых наличие менялось
+    (`WatchedItem.change_rate`): если наличие не изменилось, интервал товара
+    умножается на `backoff ** (1 - change_rate)` (до `max_interval`), если
+    изменилось - на `tighten ** change_rate` (до `min_interval`). Стабильный товар
+    быстро уходит на редкий опрос, а единичное изменение лишь немного его учащает;
+    часто меняющийся товар, наоборот, учащается сильно и замедляется медленно.
+    Общее число запросов ограничено `budget_per_minute`; при нехватке бюджета
+    первыми опрашиваются самые просроченные товары.
+
+    Пример::
+
+        poller = StockPoller(api, budget_per_minute=120)
+        poller.watch(5024806, city_id=3)
+        async for change in poller.run():
+            print(change.product_id, change.delta)
+    """
+
+    api: "FixPriceAPI"
+    min_interval: float = 60.0
+    max_interval: float = 6 * 3600.0
+    initial_interval: float = 300.0
+    backoff: float = 2.0
+    tighten: float = 0.5
+    budget_per_minute: float = 60.0
+    """Глобальный лимит запросов `balance` в минуту."""
+    clock: Callable[[], float] = time.monotonic
+
+    items: dict[tuple[int, int], WatchedItem] = field(init=False, default_factory=dict)
+    _tokens: float = field(init=False, default=0.0)
+    _refilled_at: Optional[float] = field(init=False, default=None)
+
+    def watch(self, product_id: int, city_id: int) -> WatchedItem:
+        """Начать отслеживать товар в городе (первый опрос - сразу)."""
+        key = (product_id, city_id)
+        if key not in self.items:
+            self.items[key] = WatchedItem(
+                product_id, city_id, self.initial_interval, self.clock()
+            )
+        return self.items[key]
+
+    def unwatch(self, product_id: int, city_id: int) -> None:
+        self.items.pop((product_id, city_id), None)
+
+    def _refill(self, now: float) -> None:
+        if self._refilled_at is None:
+            self._tokens = self.budget_per_minute
+        else:
+            self._tokens = min(
+                self.budget_per_minute,
+                self._tokens + (now - self._refilled_at) * self.budget_per_minute / 60,
+            )
+        self._refilled_at = now
+
+    def _update(self, item: WatchedItem, snapshot: Snapshot) -> Optional[StockChange]:
+        before = item.snapshot
+        item.polls += 1
+        item.snapshot = snapshot
+        if before is None:  # первое наблюдение - только базовая линия
+            item.next_due = self.clock() + item.interval
+            return None
+
+        changed = before != snapshot
+        item.change_rate = 0.8 * item.change_rate + 0.2 * changed
+        if changed:
+            item.changes += 1
+            step = self.tighten**item.change_rate
+            item.interval = max(self.min_interval, item.interval * step)
+        else:
+            step = self.backoff ** (1 - item.change_rate)
+            item.interval = min(self.max_interval, item.interval * step)
+        item.next_due = self.clock() + item.interval
+
+        if not changed:
+            return None
+        return StockChange(
+            item.product_id, item.city_id, before, snapshot, observed_at=time.time()
+        )
+
+    def _parse(self, resp: Any) -> Optional[Snapshot]:
+        if isinstance(resp, BaseException) or not 200 <= resp.status_code < 300:
+            return None
+        try:
+            stores = resp.json()
+            if not isinstance(stores, list):
+                return None
+            return {int(s["id"]): int(s.get("count") or 0) for s in stores}
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _failed(self, item: WatchedItem) -> None:
+        # повтор не раньше чем через `min_interval`, чтобы не долбить сервер ошибками
+        item.failures += 1
+        item.next_due = self.clock() + self.min_interval
+
+    async def poll_once(self) -> list[StockChange]:
+        """Опросить товары, срок которых подошел, в пределах бюджета.
+
+        Товары одного города запрашиваются одним `balance_many` (один заход в
+        браузер) с городом, заданным через `FixPriceAPI.routing`, - настройки клиента
+        не меняются. Ошибки запроса, не-2xx ответы и неожиданное тело считаются
+        неудачным опросом: товар будет опрошен снова через `min_interval`.
+        """
+        now = self.clock()
+        self._refill(now)
+        due = sorted(
+            (i for i in self.items.values() if i.next_due <= now),
+            key=lambda i: i.next_due,
+        )[: int(self._tokens)]
+        self._tokens -= len(due)
+
+        changes: list[StockChange] = []
+        due.sort(key=lambda i: i.city_id)
+        for city_id, group in groupby(due, key=lambda i: i.city_id):
+            items = list(group)
+            try:
+                with self.api.routing(city_id=city_id):
+                    responses = await self.api.Catalog.Product.balance_many(
+                        [i.product_id for i in items]
+                    )
+            except Exception:
+                responses = [None] * len(items)
+
+            for item, resp in zip(items, responses):
+                snapshot = None if resp is None else self._parse(resp)
+                if snapshot is None:
+                    self._failed(item)
+                    continue
+                change = self._update(item, snapshot)
+                if change is not None:
+                    changes.append(change)
+        return changes
+
+    def next_wakeup(self) -> float:
+        """Через сколько секунд появится работа (с учетом бюджета)."""
+        if not self.items:
+            return self.min_interval
+        now = self.clock()
+        wait = max(0.0, min(i.next_due for i in self.items.values()) - now)
+        if self._tokens < 1 and self.budget_per_minute > 0:
+            wait = max(wait, (1 - self._tokens) * 60 / self.budget_per_minute)
+        return wait
+
+    async def run(
+        self, stop: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[StockChange]:
+        """Опрашивать бесконечно (или до `stop`) и отдавать события изменений."""
+        while stop is None or not stop.is_set():
+            for change in await self.poll_once():
+                yield change
+            delay = self.next_wakeup()
+            if stop is None:
+                await asyncio.sleep(delay)
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
@@ -0,0 +1,131 @@
+"""Пул прокси с оценкой здоровья"""
+
+from __future__ import annotations
+
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterable, Optional
+
+from human_requests.abstraction import Proxy
+
+
+@dataclass
+class ProxyEntry:
+    """Прокси из пула и его статистика."""
+
+    proxy: Proxy
+    latency: Optional[float] = None
+    """Сглаженная (EWMA) задержка успешных запросов в секундах."""
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    quarantined_until: float = 0.0
+    """`time.monotonic()` до которого прокси не выдается."""
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantined_until > time.monotonic()
+
+    @property
+    def weight(self) -> float:
+        """Вес при выборе: доля успехов, деленная на задержку."""
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        latency = self.latency if self.latency is not None else 1.0
+        return success_rate / max(latency, 0.01)
+
+
+@dataclass
+class ProxyPool:
+    """Набор прокси с взвешенным выбором и карантином.
+
+    Может быть передан в `FixPriceAPI.proxy` (у каждого прокси свой прогретый
+    контекст браузера, каждый запрос выбирает прокси заново) и/или в
+    `FixPriceAPI.image_proxy` (каждое скачивание изображения выбирает прокси заново).
+    """
+
+    proxies: Iterable[str | dict | Proxy]
+    """Прокси в строковом формате, формате Playwright или `Proxy`."""
+    quarantine_after: int = 3
+    """Сколько ошибок подряд отправляют прокси в карантин."""
+    quarantine_seconds: float = 60.0
+    """Длительность карантина. Удваивается при повторных ошибках после карантина."""
+    max_quarantine_seconds: float = 900.0
+    ewma_alpha: float = 0.3
+    """Вес нового замера задержки в EWMA."""
+
+    entries: list[ProxyEntry] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.entries = [
+            ProxyEntry(p if isinstance(p, Proxy) else Proxy(p)) for p in self.proxies
+        ]
+        if not self.entries:
+            raise ValueError("`proxies` must not be empty")
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def choose(self, exclude: Iterable[ProxyEntry] = ()) -> ProxyEntry:
+        """Выбрать прокси пропорционально весу, пропуская карантин и `exclude`.
+
+        Если здоровых прокси нет, возвращается тот, чей карантин закончится раньше."""
+        excluded = {id(e) for e in exclude}
+        healthy = [
+            e for e in self.entries if not e.quarantined and id(e) not in excluded
+        ]
+        if not healthy:
+            candidates = [e for e in self.entries if id(e) not in excluded]
+            return min(candidates or self.entries, key=lambda e: e.quarantined_until)
+        return random.choices(healthy, weights=[e.weight for e in healthy])[0]
+
+    def report(
+        self, entry: ProxyEntry, *, latency: Optional[float] = None, error: bool = False
+    ) -> None:
+        """Учесть результат запроса через `entry`."""
+        if error:
+            entry.failures += 1
+            entry.consecutive_failures += 1
+            if entry.consecutive_failures >= self.quarantine_after:
+                factor = 2 ** (entry.consecutive_failures - self.quarantine_after)
+                entry.quarantined_until = time.monotonic() + min(
+                    self.quarantine_seconds * factor, self.max_quarantine_seconds
+                )
+            return
+
+        entry.successes += 1
+        entry.consecutive_failures = 0
+        entry.quarantined_until = 0.0
+        if latency is not None:
+            entry.latency = (
+                latency
+                if entry.latency is None
+                else self.ewma_alpha * latency + (1 - self.ewma_alpha) * entry.latency
+            )
+
+    @asynccontextmanager
+    async def use(self, exclude: Iterable[ProxyEntry] = ()) -> AsyncIterator[Proxy]:
+        """Выбрать прокси на время блока и записать его задержку или ошибку."""
+        entry = self.choose(exclude)
+        start = time.perf_counter()
+        try:
+            yield entry.proxy
+        except Exception:
+            self.report(entry, error=True)
+            raise
+        else:
+            self.report(entry, latency=time.perf_counter() - start)
+
+    def stats(self) -> list[dict[str, Any]]:
+        """Снимок состояния пула (для логов и метрик)."""
+        return [
+            {
+                "server": e.proxy.as_str(include_auth=False),
+                "latency": e.latency,
+                "successes": e.successes,
+                "failures": e.failures,
+                "quarantined": e.quarantined,
+            }
+            for e in self.entries
+        ]
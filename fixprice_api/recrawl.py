@@ -0,0 +1,201 @@
+"""Повторный обход каталога только по изменившимся категориям"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Optional
+
+from . import abstraction
+from .crawler import CrawlPage, CrawlUnit, units_from_tree
+
+if TYPE_CHECKING:
+    from .manager import FixPriceAPI
+
+
+def _children(node: dict[str, Any]) -> list[dict[str, Any]]:
+    items = node.get("items") or {}
+    return list(items.values()) if isinstance(items, dict) else list(items)
+
+
+def find_node(tree: dict[str, Any], unit: CrawlUnit) -> Optional[dict[str, Any]]:
+    """Узел `Catalog.tree()`, соответствующий единице обхода."""
+    for node in tree.values():
+        if node.get("alias") != unit.category_alias:
+            continue
+        if unit.subcategory_alias is None:
+            return node
+        for child in _children(node):
+            if child.get("alias") == unit.subcategory_alias:
+                return child
+    return None
+
+
+def fingerprint(
+    node: Optional[dict[str, Any]], first_page: list[dict[str, Any]]
+) -> str:
+    """Отпечаток категории по дешевым признакам.
+
+    Учитываются id и цены товаров первой страницы и узел дерева: количество товаров
+    в нем и в подкатегориях. Картинки, баннеры и прочие поля узла не учитываются.
+    Порядок товаров на странице на отпечаток не влияет."""
+    if node is not None:
+        node_sig: Any = [
+            node.get("id"),
+            node.get("productCount"),
+            sorted((c.get("alias"), c.get("productCount")) for c in _children(node)),
+        ]
+    else:
+        node_sig = None
+    page_sig = sorted(
+        ((p.get("id"), p.get("price"), p.get("specialPrice")) for p in first_page),
+        key=lambda sig: str(sig[0]),
+    )
+    raw = json.dumps([node_sig, page_sig], ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def _unit_key(unit: CrawlUnit) -> str:
+    return f"{unit.city_id or ''}/{unit.category_alias}/{unit.subcategory_alias or ''}"
+
+
+@dataclass
+class RecrawlStats:
+    """Статистика одного цикла повторного обхода."""
+
+    categories: int = 0
+    deep: int = 0
+    """Категорий, пройденных целиком (отпечаток изменился или новая категория)."""
+    swept: int = 0
+    """Из них - по `full_sweep_interval` при неизменном отпечатке."""
+    skipped: int = 0
+    """Категорий, для которых хватило первой страницы."""
+    failed: int = 0
+    requests: int = 0
+    errors: dict[CrawlUnit, str] = field(default_factory=dict)
+    """Ошибки по категориям (`repr` исключения)."""
+
+
+@dataclass
+class Recrawler:
+    """Обход каталога, пропускающий неизменившиеся категории.
+
+    Для каждой категории запрашивается первая страница и вычисляется `fingerprint`.
+    Если он совпадает с сохраненным с прошлого цикла, остальные страницы не
+    запрашиваются. Раз в `full_sweep_interval` каждая категория проходится целиком
+    в любом случае - на случай изменений, которые отпечаток не видит (например,
+    цена товара на дальней странице).
+
+    Отпечатки хранятся в JSON-файле `state_path` между запусками и обновляются
+    только после успешного полного прохода категории.
+
+    Пример::
+
+        recrawler = Recrawler(api, "recrawl-state.json")
+        tree = (await api.Catalog.tree()).json()
+        async for page in recrawler.run(tree, city_ids=[3]):
+            sink.write(page.products)
+        print(recrawler.stats)
+    """
+
+    api: "FixPriceAPI"
+    state_path: Optional[str | Path] = None
+    """Файл с отпечатками. `None` - хранить только в памяти."""
+    full_sweep_interval: float = 24 * 3600.0
+    """Как часто проходить категорию целиком независимо от отпечатка (секунды)."""
+    limit: int = 24
+    """Размер страницы `products_list`."""
+    sort: abstraction.CatalogSort | str = abstraction.CatalogSort.ALPHABET
+    """Сортировка страниц. Нужна стабильная: от нее зависит состав первой страницы."""
+
+    state: dict[str, dict[str, Any]] = field(init=False, default_factory=dict)
+    """`{ключ категории: {"fingerprint": ..., "full_at": Unix time}}`"""
+    stats: RecrawlStats = field(init=False, default_factory=RecrawlStats)
+    """Статистика текущего (последнего) цикла."""
+
+    def __post_init__(self) -> None:
+        if self.state_path is not None and os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def save(self) -> None:
+        """Сохранить отпечатки (атомарно, через временный файл)."""
+        if self.state_path is None:
+            return
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.state_path)
+
+    async def _page(self, unit: CrawlUnit, page: int) -> list[Any]:
+        self.stats.requests += 1
+        with self.api.routing(**unit.routing):
+            resp = await self.api.Catalog.products_list(
+                category_alias=unit.category_alias,
+                subcategory_alias=unit.subcategory_alias,
+                page=page,
+                limit=self.limit,
+                sort=self.sort,
+            )
+        if not 200 <= resp.status_code < 300:
+            raise RuntimeError(f"HTTP {resp.status_code}")
+        return resp.json()
+
+    async def run(
+        self,
+        tree: dict[str, Any],
+        city_ids: Iterable[Optional[int]] = (None,),
+        *,
+        split_subcategories: bool = False,
+    ) -> AsyncIterator[CrawlPage]:
+        """Один цикл: отдает страницы изменившихся категорий.
+
+        Для неизменившихся не отдается ничего (см. `stats.skipped`). Ошибка
+        категории не прерывает цикл: она попадает в `stats.errors`, а отпечаток
+        категории не обновляется."""
+        self.stats = RecrawlStats()
+        units = units_from_tree(tree, city_ids, split_subcategories=split_subcategories)
+        try:
+            for unit in units:
+                self.stats.categories += 1
+                try:
+                    async for page in self._crawl_unit(tree, unit):
+                        yield page
+                except Exception as exc:
+                    self.stats.failed += 1
+                    self.stats.errors[unit] = repr(exc)
+        finally:
+            self.save()
+
+    async def _crawl_unit(
+        self, tree: dict[str, Any], unit: CrawlUnit
+    ) -> AsyncIterator[CrawlPage]:
+        first = await self._page(unit, 1)
+        key = _unit_key(unit)
+        current = fingerprint(find_node(tree, unit), first)
+        known = self.state.get(key)
+        now = time.time()
+
+        sweep_due = known is None or now - known["full_at"] >= self.full_sweep_interval
+        if known is not None and known["fingerprint"] == current and not sweep_due:
+            self.stats.skipped += 1
+            return
+
+        self.stats.deep += 1
+        if known is not None and known["fingerprint"] == current:
+            self.stats.swept += 1
+
+        products, page = first, 1
+        while True:
+            if products:
+                yield CrawlPage(unit, page, products, 0)
+            if len(products) < self.limit:
+                break
+            page += 1
+            products = await self._page(unit, page)
+
+        self.state[key] = {"fingerprint": current, "full_at": now}
@@ -0,0 +1,174 @@
+"""Политика пересоздания браузера/контекста"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Literal, Optional
+
+
+def child_pids(pid: Optional[int] = None) -> set[int]:
+    """PID прямых потомков `pid` (по умолчанию - текущего процесса).
+
+    Пустое множество, если список процессов получить нельзя."""
+    pid = os.getpid() if pid is None else pid
+    try:
+        import psutil
+    except ImportError:
+        parents = _proc_parents()
+        return {c for c, p in (parents or {}).items() if p == pid}
+
+    try:
+        return {child.pid for child in psutil.Process(pid).children()}
+    except psutil.Error:
+        return set()
+
+
+def process_tree_rss_bytes(pids: Iterable[int]) -> Optional[int]:
+    """Суммарный RSS процессов `pids` и всех их потомков.
+
+    Использует `psutil`, если установлен, иначе `/proc` (Linux). Возвращает `None`,
+    если измерить нельзя. Завершившиеся процессы не учитываются."""
+    roots = set(pids)
+    try:
+        import psutil
+    except ImportError:
+        return _proc_tree_rss(roots)
+
+    total = 0
+    for pid in roots:
+        try:
+            root = psutil.Process(pid)
+            tree = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            continue
+        for proc in tree:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                continue
+    return total
+
+
+def children_rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Суммарный RSS всех дочерних процессов `pid` (по умолчанию - текущего).
+
+    Учитываются все потомки - не только браузер, но и, например, пулы процессов
+    `ImageProcessor` и `ProcessCrawler`. Для замера одного браузера используйте
+    `process_tree_rss_bytes` с его PID."""
+    pid = os.getpid() if pid is None else pid
+    try:
+        import psutil
+    except ImportError:
+        parents = _proc_parents()
+        if parents is None:
+            return None
+        return _proc_tree_rss({c for c, p in parents.items() if p == pid}, parents)
+
+    try:
+        children = psutil.Process(pid).children()
+    except psutil.Error:
+        return None
+    return process_tree_rss_bytes(child.pid for child in children)
+
+
+def _proc_parents() -> Optional[dict[int, int]]:
+    """`{pid: ppid}` всех процессов из `/proc` или `None`, если `/proc` нет."""
+    if not os.path.isdir("/proc"):
+        return None
+
+    parents: dict[int, int] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # comm может содержать пробелы, поэтому режем по последней ')'
+        fields = stat[stat.rfind(b")") + 2 :].split()
+        parents[int(name)] = int(fields[1])
+    return parents
+
+
+def _proc_tree_rss(
+    roots: set[int], parents: Optional[dict[int, int]] = None
+) -> Optional[int]:
+    parents = _proc_parents() if parents is None else parents
+    if parents is None:
+        return None
+
+    tree = [pid for pid in roots if pid in parents]
+    frontier = list(tree)
+    while frontier:
+        current = frontier.pop()
+        for child, parent in parents.items():
+            if parent == current:
+                tree.append(child)
+                frontier.append(child)
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    for pid in tree:
+        try:
+            with open(f"/proc/{pid}/statm", "rb") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+@dataclass
+class RecyclePolicy:
+    """Когда пересоздавать браузер или контекст долгоживущего `FixPriceAPI`.
+
+    Пересоздание выполняется между запросами: новые запросы ждут, уже начатые
+    завершаются, после чего сессия прогревается заново."""
+
+    max_requests: Optional[int] = None
+    """Максимум запросов на один прогрев."""
+    max_age_seconds: Optional[float] = None
+    """Максимальное время жизни прогретой сессии."""
+    max_rss_bytes: Optional[int] = None
+    """Максимальный RSS процессов браузера (см. `process_tree_rss_bytes`).
+    `FixPriceAPI` замеряет только запущенный им самим браузер, поэтому с
+    `browser=...` (в том числе `SharedBrowser`) эта граница не поддерживается."""
+    rss_check_interval: float = 30.0
+    """Как часто замерять RSS (замер не бесплатный)."""
+    scope: Literal["context", "browser"] = "context"
+    """Что пересоздавать: только контекст (быстрее) или весь браузер
+    (освобождает всю память процесса браузера)."""
+
+    _last_rss_check: Optional[float] = field(default=None, init=False, repr=False)
+
+    def reason(
+        self, requests: int, warmed_at: float, pids: Optional[Iterable[int]] = None
+    ) -> Optional[str]:
+        """Причина пересоздания или `None`, если оно не нужно.
+
+        `pids` - корневые процессы браузера для проверки `max_rss_bytes`; без них
+        замеряются все дочерние процессы (`children_rss_bytes`)."""
+        if self.max_requests is not None and requests >= self.max_requests:
+            return "max_requests"
+        if (
+            self.max_age_seconds is not None
+            and time.monotonic() - warmed_at >= self.max_age_seconds
+        ):
+            return "max_age"
+        if self.max_rss_bytes is not None:
+            now = time.monotonic()
+            if (
+                self._last_rss_check is None
+                or now - self._last_rss_check >= self.rss_check_interval
+            ):
+                self._last_rss_check = now
+                rss = (
+                    children_rss_bytes()
+                    if pids is None
+                    else process_tree_rss_bytes(pids)
+                )
+                if rss is not None and rss >= self.max_rss_bytes:
+                    return "max_rss"
+        return None
@@ -0,0 +1,175 @@
+"""Приоритетные полосы для запросов через браузер"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import AsyncIterator, Iterator, Optional
+
+
+class Priority(IntEnum):
+    """Класс приоритета запроса. Меньше значение - выше приоритет."""
+
+    INTERACTIVE = 0
+    """Запросы, которых ждет пользователь (например `Product.balance`, `Product.info`)."""
+    NORMAL = 1
+    BACKGROUND = 2
+    """Фоновые обходы каталога."""
+
+
+_current: ContextVar[Priority] = ContextVar(
+    "fixprice_api_priority", default=Priority.NORMAL
+)
+
+
+def current_priority() -> Priority:
+    """Приоритет, действующий в текущем контексте."""
+    return _current.get()
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[None]:
+    """Выполнить все вызовы API внутри блока с приоритетом `level`.
+
+    Пример::
+
+        with priority(Priority.INTERACTIVE):
+            await api.Catalog.Product.balance(product_id)
+    """
+    token = _current.set(level)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с экспоненциальными корзинами (1 мс ... ~2 мин)."""
+
+    BOUNDS: tuple[float, ...] = tuple(0.001 * 1.25**i for i in range(53))
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница корзины, в которую попадает квантиль `q` (0..1)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+class RequestScheduler:
+    """Планировщик операций браузера с приоритетными полосами.
+
+    Одновременно выполняется не более `max_concurrency` операций. Ожидающие
+    запускаются в порядке приоритета, а `reserved` слотов оставляются только для
+    более приоритетных полос: например при `max_concurrency=8` и
+    `reserved={Priority.INTERACTIVE: 2}` фоновые и обычные запросы занимают не больше 6
+    слотов, и интерактивный запрос не ждет окончания обхода.
+
+    Для каждой полосы ведется `LatencyHistogram` (ожидание в очереди + выполнение).
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        reserved: Optional[dict[Priority, int]] = None,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("`max_concurrency` must be greater than 0")
+        self.max_concurrency = max_concurrency
+        self.reserved = (
+            {Priority.INTERACTIVE: max(1, max_concurrency // 4)}
+            if reserved is None
+            else dict(reserved)
+        )
+        if sum(self.reserved.values()) >= max_concurrency:
+            raise ValueError("`reserved` must leave at least one shared slot")
+
+        self.running = 0
+        self._waiters: dict[Priority, deque[asyncio.Future]] = {
+            p: deque() for p in Priority
+        }
+        self.histograms: dict[Priority, LatencyHistogram] = {
+            p: LatencyHistogram() for p in Priority
+        }
+
+    def _limit(self, level: Priority) -> int:
+        """Сколько слотов доступно полосе `level`: все, кроме зарезервированных
+        за более приоритетными полосами."""
+        return self.max_concurrency - sum(
+            n for p, n in self.reserved.items() if p < level
+        )
+
+    def _dispatch(self) -> None:
+        for level in Priority:
+            waiters = self._waiters[level]
+            while waiters and self.running < self._limit(level):
+                fut = waiters.popleft()
+                if fut.done():  # ожидающий отменен
+                    continue
+                self.running += 1
+                fut.set_result(None)
+
+    async def _acquire(self, level: Priority) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[level].append(fut)
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # слот уже выдан - возвращаем
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, level: Optional[Priority] = None) -> AsyncIterator[None]:
+        """Занять слот на время блока (по умолчанию с `current_priority()`)."""
+        level = current_priority() if level is None else level
+        start = time.perf_counter()
+        await self._acquire(level)
+        try:
+            yield
+        finally:
+            self._release()
+            self.histograms[level].observe(time.perf_counter() - start)
+
+    def stats(self) -> dict[str, dict[str, Optional[float]]]:
+        """Задержки по полосам и текущая длина очередей."""
+        return {
+            p.name.lower(): self.histograms[p].snapshot()
+            | {"queued": float(len(self._waiters[p]))}
+            for p in Priority
+        }
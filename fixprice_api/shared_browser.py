@@ -0,0 +1,129 @@
+"""Общий браузер для нескольких клиентов"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    from human_requests import HumanBrowser
+    from human_requests.abstraction import Proxy
+
+
+@dataclass
+class LaunchedBrowser:
+    """Запущенный Camoufox вместе с драйвером Playwright, который его запустил.
+
+    `browser.close()` закрывает только браузер - драйвер остается жить, поэтому
+    закрывать нужно через `close()`."""
+
+    browser: "HumanBrowser"
+    manager: Any
+    """`AsyncCamoufox`, через который запущен браузер."""
+
+    @property
+    def pids(self) -> set[int]:
+        """Процесс драйвера Playwright - корень дерева процессов браузера.
+
+        Пусто, если Playwright не дает узнать процесс."""
+        transport = getattr(
+            getattr(self.manager, "_connection", None), "_transport", None
+        )
+        pid = getattr(getattr(transport, "_proc", None), "pid", None)
+        return set() if pid is None else {pid}
+
+    async def close(self) -> None:
+        """Закрыть браузер и остановить драйвер Playwright."""
+        await self.manager.__aexit__(None, None, None)
+
+
+async def launch_camoufox(
+    headless: bool, proxy: "Proxy", browser_opts: dict[str, Any]
+) -> LaunchedBrowser:
+    """Запустить Camoufox с настройками, которые использует `FixPriceAPI`."""
+    # Импорт здесь, чтобы `import fixprice_api` не тянул браузер
+    from camoufox import AsyncCamoufox, DefaultAddons
+    from human_requests import HumanBrowser
+
+    manager = AsyncCamoufox(
+        headless=headless,
+        proxy=proxy.as_dict(),
+        humanize=True,
+        **browser_opts,
+        block_images=True,
+        i_know_what_im_doing=True,
+        exclude_addons=[DefaultAddons.UBO],
+    )
+    br = await manager.start()
+
+    return LaunchedBrowser(HumanBrowser.replace(br), manager)
+
+
+@dataclass
+class SharedBrowser:
+    """Один процесс Camoufox на несколько `FixPriceAPI`.
+
+    Браузер запускается при первом `acquire` и закрывается, когда последний
+    клиент вызывает `release` (это делает `FixPriceAPI.close`). Каждый клиент
+    работает в своем контексте: cookies, заголовки и прокси не пересекаются,
+    а дополнительный клиент стоит одного контекста, а не целого браузера.
+
+    Пример::
+
+        shared = SharedBrowser(headless=True)
+        async with FixPriceAPI(browser=shared) as moscow, FixPriceAPI(browser=shared) as spb:
+            moscow.city_id, spb.city_id = 3, 2
+            ...
+
+    Чтобы браузер не перезапускался между сменяющими друг друга клиентами,
+    держите собственную ссылку: `async with shared: ...`.
+    """
+
+    headless: bool = True
+    proxy: str | dict | Proxy | None = None
+    """Прокси браузера по умолчанию. Прокси клиентов задаются на уровне контекста."""
+    browser_opts: dict[str, Any] = field(default_factory=dict)
+    """Дополнительные опции для браузера (см. `FixPriceAPI.browser_opts`)."""
+
+    refs: int = field(init=False, default=0)
+    """Количество клиентов (и `async with`), использующих браузер."""
+    _launched: Optional[LaunchedBrowser] = field(init=False, repr=False, default=None)
+    _lock: asyncio.Lock = field(init=False, repr=False, default_factory=asyncio.Lock)
+
+    @property
+    def browser(self) -> Optional["HumanBrowser"]:
+        """Запущенный браузер или `None`."""
+        return self._launched.browser if self._launched is not None else None
+
+    async def acquire(self) -> "HumanBrowser":
+        """Получить браузер (запустив при необходимости) и увеличить счетчик ссылок."""
+        async with self._lock:
+            if self._launched is None:
+                from human_requests.abstraction import Proxy
+
+                proxy = (
+                    self.proxy if isinstance(self.proxy, Proxy) else Proxy(self.proxy)
+                )
+                self._launched = await launch_camoufox(
+                    self.headless, proxy, self.browser_opts
+                )
+            self.refs += 1
+            return self._launched.browser
+
+    async def release(self) -> None:
+        """Уменьшить счетчик ссылок; закрыть браузер, если он больше не нужен."""
+        async with self._lock:
+            if self.refs <= 0:
+                raise RuntimeError("SharedBrowser.release() without acquire()")
+            self.refs -= 1
+            if self.refs == 0 and self._launched is not None:
+                launched, self._launched = self._launched, None
+                await launched.close()
+
+    async def __aenter__(self) -> "SharedBrowser":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.release()
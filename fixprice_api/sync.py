@@ -0,0 +1,193 @@
+"""Синхронный потокобезопасный фасад над `FixPriceAPI`"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import threading
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Coroutine,
+                    Optional, TypeVar)
+
+from human_requests import ApiChild
+
+from .manager import FixPriceAPI
+
+if TYPE_CHECKING:
+    from .endpoints.advertising import ClassAdvertising
+    from .endpoints.catalog import ClassCatalog
+    from .endpoints.general import ClassGeneral
+    from .endpoints.geolocation import ClassGeolocation
+
+T = TypeVar("T")
+
+
+class _BlockingProxy:
+    """Обертка над `ApiChild`: корутинные методы становятся блокирующими,
+    вложенные сервисы (`Catalog.Product`, `Geolocation.Shop`) оборачиваются так же."""
+
+    __slots__ = ("_target", "_owner")
+
+    def __init__(self, target: Any, owner: "FixPriceAPISync") -> None:
+        self._target = target
+        self._owner = owner
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(self._target, name)
+        if isinstance(value, ApiChild):
+            return _BlockingProxy(value, self._owner)
+        if inspect.iscoroutinefunction(value):
+            return self._owner._blocking(value)
+        return value
+
+    def __dir__(self) -> list[str]:
+        return dir(self._target)
+
+    def __repr__(self) -> str:
+        return f"<blocking {self._target!r}>"
+
+
+class FixPriceAPISync:
+    """Блокирующий клиент для синхронного кода (WSGI, воркеры на потоках).
+
+    Владеет одним прогретым `FixPriceAPI`, который живет в отдельном потоке со своим
+    event loop. Вызовы из любых потоков передаются в этот loop через
+    `asyncio.run_coroutine_threadsafe`, поэтому один браузер обслуживает весь процесс.
+    Одинаковые одновременные запросы из разных потоков объединяются так же, как в
+    асинхронном клиенте (`coalesce_requests`).
+
+    `Catalog`, `Geolocation`, `Advertising` и `General` повторяют асинхронные API, но
+    методы возвращают результат, а не корутину. Аргументы конструктора передаются
+    в `FixPriceAPI`; `timeout` - сколько секунд ждать результата вызова.
+
+    `city_id`, `store_id` и т.п. общие для клиента: их установка меняет город для
+    всех потоков. Если потоки работают с разными городами, передайте в `run`
+    корутину с `FixPriceAPI.routing` - он действует только на ее запросы::
+
+        api = FixPriceAPISync()
+        tree = api.Catalog.tree().json()
+
+        async def moscow(a):
+            with a.routing(city_id=3):
+                return await a.Catalog.products_list("kosmetika")
+
+        resp = api.run(moscow)
+        api.close()
+    """
+
+    Catalog: "ClassCatalog"
+    Geolocation: "ClassGeolocation"
+    Advertising: "ClassAdvertising"
+    General: "ClassGeneral"
+
+    def __init__(self, *, timeout: Optional[float] = None, **kwargs: Any) -> None:
+        object.__setattr__(self, "timeout", timeout)
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(
+            target=self._serve, args=(loop,), name="fixprice-api-loop", daemon=True
+        )
+        object.__setattr__(self, "_loop", loop)
+        object.__setattr__(self, "_thread", thread)
+        object.__setattr__(self, "_closed", False)
+        thread.start()
+
+        try:
+            api = self._submit(self._open(kwargs))
+        except BaseException:
+            self._stop()
+            raise
+        object.__setattr__(self, "api", api)
+
+    @staticmethod
+    def _serve(loop: asyncio.AbstractEventLoop) -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    @staticmethod
+    async def _open(kwargs: dict[str, Any]) -> FixPriceAPI:
+        # создаем в потоке loop-а: примитивы asyncio клиента привязываются к нему
+        api = FixPriceAPI(**kwargs)
+        await api.__aenter__()
+        return api
+
+    def _submit(self, coro: Coroutine[Any, Any, T]) -> T:
+        error = None
+        if self._closed:
+            error = RuntimeError("FixPriceAPISync is closed")
+        elif threading.current_thread() is self._thread:
+            error = RuntimeError(
+                "Blocking call from the client loop thread would deadlock"
+            )
+        if error is not None:
+            coro.close()
+            raise error
+
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _blocking(
+        self, method: Callable[..., Coroutine[Any, Any, T]]
+    ) -> Callable[..., T]:
+        @functools.wraps(method)
+        def call(*args: Any, **kwargs: Any) -> T:
+            return self._submit(method(*args, **kwargs))
+
+        return call
+
+    def run(self, fn: Callable[[FixPriceAPI], Awaitable[T]]) -> T:
+        """Выполнить `fn(api)` в потоке клиента и дождаться результата.
+
+        `fn` вызывается внутри event loop отдельной задачей, поэтому
+        `api.routing(...)` внутри нее не затрагивает вызовы из других потоков."""
+
+        async def call() -> T:
+            return await fn(self.api)
+
+        return self._submit(call())
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "api":  # клиент еще не создан
+            raise AttributeError(name)
+        value = getattr(self.api, name)
+        if isinstance(value, ApiChild):
+            return _BlockingProxy(value, self)
+        if inspect.iscoroutinefunction(value):
+            return self._blocking(value)
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name == "timeout":
+            object.__setattr__(self, name, value)
+            return
+
+        # настройки клиента меняем в его потоке, чтобы не гоняться с запросами
+        async def assign() -> None:
+            setattr(self.api, name, value)
+
+        self._submit(assign())
+
+    def __enter__(self) -> "FixPriceAPISync":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Закрыть клиент и остановить поток. Повторный вызов ничего не делает."""
+        if self._closed:
+            return
+        try:
+            self._submit(self.api.close())
+        finally:
+            self._stop()
+
+    def _stop(self) -> None:
+        object.__setattr__(self, "_closed", True)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,402 @@
+"""Проверка ответов API на соответствие снапшот-схемам"""
+
+from __future__ import annotations
+
+import json
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Mapping, Optional
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from human_requests.abstraction import FetchResponse
+
+Validator = Callable[[Any], Optional[str]]
+"""Скомпилированная схема: `None`, если значение подходит, иначе описание ошибки."""
+
+_TYPES: dict[str, tuple[type, ...]] = {
+    "null": (type(None),),
+    "boolean": (bool,),
+    "integer": (int,),
+    "number": (int, float),
+    "string": (str,),
+    "array": (list,),
+    "object": (dict,),
+}
+
+_FORMATS: dict[str, re.Pattern] = {
+    "uri": re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:"),
+    "uuid": re.compile(
+        r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+    ),
+    "date-time": re.compile(r"^\d{4}-\d{2}-\d{2}[Tt ]\d{2}:\d{2}:\d{2}"),
+}
+
+DEFAULT_ROUTES: tuple[tuple[str, str], ...] = (
+    (r"/v1/home/brand$", "ClassAdvertising.home_brands_list"),
+    (r"/v1/category$", "ClassCatalog.tree"),
+    (r"/v1/product/in/", "ClassCatalog.products_list"),
+    (r"/v1/location/country$", "ClassGeolocation.countries_list"),
+    (r"/v1/location/region$", "ClassGeolocation.regions_list"),
+    (r"/v1/location/city$", "ClassGeolocation.cities_list"),
+    (r"/v1/location/city/\d+$", "ClassGeolocation.city_info"),
+    (r"/v1/store/balance/\d+$", "ProductService.balance"),
+    (r"/v1/store$", "ShopService.search"),
+)
+"""Путь запроса (регулярное выражение) -> имя схемы в `SCHEMAS_DIR`."""
+
+SCHEMAS_DIR = Path(__file__).parent / "schemas"
+"""Схемы, поставляемые с пакетом: копии `tests/__snapshots__/*.schema.json`
+для путей из `DEFAULT_ROUTES` (обновляются вместе со снапшотами)."""
+
+
+def compile_schema(schema: Mapping[str, Any], *, enums: bool = True) -> Validator:
+    """Скомпилировать JSON-схему в функцию проверки.
+
+    Поддерживается подмножество draft 2020-12, которое генерируется для снапшотов:
+    `type`, `properties`, `required`, `patternProperties`, `items`, `minItems`,
+    `minProperties`, `anyOf`, `enum`, `format` (`uri`, `uuid`, `date-time`) и
+    локальные `$ref` на `#/$defs/...`. Аннотации (`title`, `j2sEnumRejected` и т.п.)
+    игнорируются. Разбор схемы выполняется один раз, а проверка - это вызовы
+    замыканий без обращений к словарю схемы.
+
+    `enums=False` - не проверять `enum`: в снапшот-схемах это значения из одного
+    ответа (часы работы, логины и т.п.), а не допустимое множество.
+
+    Ошибка возвращается в виде `"$.items[3].price: expected number, got str"`."""
+    refs: dict[str, Validator] = {}
+    validate = _compile(schema, schema, refs, enums)
+
+    def root(value: Any) -> Optional[str]:
+        error = validate(value)
+        return None if error is None else "$" + error
+
+    return root
+
+
+def _compile(
+    node: Mapping[str, Any],
+    root: Mapping[str, Any],
+    refs: dict[str, Validator],
+    enums: bool,
+) -> Validator:
+    if "$ref" in node:
+        return _compile_ref(node["$ref"], root, refs, enums)
+
+    checks: list[Validator] = []
+    object_checks: list[Validator] = []
+    array_checks: list[Validator] = []
+
+    if "type" in node:
+        checks.append(_type_check(node["type"]))
+    if enums and "enum" in node:
+        checks.append(_enum_check(node["enum"]))
+    if "format" in node and node["format"] in _FORMATS:
+        checks.append(_format_check(node["format"]))
+    if "anyOf" in node:
+        checks.append(
+            _any_of_check([_compile(n, root, refs, enums) for n in node["anyOf"]])
+        )
+
+    if "required" in node:
+        object_checks.append(_required_check(node["required"]))
+    if "minProperties" in node:
+        object_checks.append(_min_check(node["minProperties"], "properties"))
+    if "properties" in node:
+        object_checks.append(
+            _properties_check(
+                {
+                    k: _compile(n, root, refs, enums)
+                    for k, n in node["properties"].items()
+                }
+            )
+        )
+    if "patternProperties" in node:
+        object_checks.append(
+            _pattern_properties_check(
+                [
+                    (re.compile(p), _compile(n, root, refs, enums))
+                    for p, n in node["patternProperties"].items()
+                ]
+            )
+        )
+
+    if "minItems" in node:
+        array_checks.append(_min_check(node["minItems"], "items"))
+    if isinstance(node.get("items"), Mapping):
+        array_checks.append(_items_check(_compile(node["items"], root, refs, enums)))
+
+    if object_checks:
+        checks.append(_when(dict, object_checks))
+    if array_checks:
+        checks.append(_when(list, array_checks))
+    return _all(checks)
+
+
+def _compile_ref(
+    ref: str, root: Mapping[str, Any], refs: dict[str, Validator], enums: bool
+) -> Validator:
+    if ref in refs:
+        return refs[ref]
+    if not ref.startswith("#/"):
+        raise ValueError(f"Only local `$ref` are supported, got {ref!r}")
+
+    # заглушка на время компиляции - для рекурсивных схем
+    target: list[Validator] = []
+    refs[ref] = lambda value: target[0](value)
+
+    node: Any = root
+    for part in ref[2:].split("/"):
+        node = node[part.replace("~1", "/").replace("~0", "~")]
+    target.append(_compile(node, root, refs, enums))
+    refs[ref] = target[0]
+    return target[0]
+
+
+def _all(checks: list[Validator]) -> Validator:
+    if not checks:
+        return lambda value: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check(value: Any) -> Optional[str]:
+        for c in checks:
+            error = c(value)
+            if error is not None:
+                return error
+        return None
+
+    return check
+
+
+def _when(kind: type, checks: list[Validator]) -> Validator:
+    inner = _all(checks)
+    return lambda value: inner(value) if type(value) is kind else None
+
+
+def _type_check(types: str | list[str]) -> Validator:
+    names = [types] if isinstance(types, str) else list(types)
+    allowed = frozenset(t for name in names for t in _TYPES[name])
+    integral_float = "integer" in names and "number" not in names
+    expected = "|".join(names)
+
+    def check(value: Any) -> Optional[str]:
+        kind = type(value)
+        if kind in allowed:
+            return None
+        if integral_float and kind is float and value.is_integer():
+            return None
+        return f": expected {expected}, got {kind.__name__}"
+
+    return check
+
+
+def _enum_check(values: list[Any]) -> Validator:
+    # bool - подкласс int, поэтому сравниваем вместе с типом
+    allowed = [(type(v), v) for v in values]
+
+    def check(value: Any) -> Optional[str]:
+        if (type(value), value) in allowed:
+            return None
+        return f": {value!r} is not one of {values!r}"
+
+    return check
+
+
+def _format_check(name: str) -> Validator:
+    match = _FORMATS[name].match
+
+    def check(value: Any) -> Optional[str]:
+        if type(value) is not str or match(value):
+            return None
+        return f": {value!r} is not a valid {name}"
+
+    return check
+
+
+def _any_of_check(options: list[Validator]) -> Validator:
+    def check(value: Any) -> Optional[str]:
+        errors = []
+        for option in options:
+            error = option(value)
+            if error is None:
+                return None
+            errors.append(error)
+        return min(errors, key=len)  # самая "близкая" ветка
+
+    return check
+
+
+def _required_check(names: list[str]) -> Validator:
+    def check(value: dict) -> Optional[str]:
+        for name in names:
+            if name not in value:
+                return f": missing required property {name!r}"
+        return None
+
+    return check
+
+
+def _min_check(minimum: int, what: str) -> Validator:
+    def check(value: dict | list) -> Optional[str]:
+        if len(value) >= minimum:
+            return None
+        return f": expected at least {minimum} {what}, got {len(value)}"
+
+    return check
+
+
+def _properties_check(properties: dict[str, Validator]) -> Validator:
+    items = list(properties.items())
+
+    def check(value: dict) -> Optional[str]:
+        for name, validate in items:
+            if name in value:
+                error = validate(value[name])
+                if error is not None:
+                    return f".{name}{error}"
+        return None
+
+    return check
+
+
+def _pattern_properties_check(
+    patterns: list[tuple[re.Pattern, Validator]],
+) -> Validator:
+    def check(value: dict) -> Optional[str]:
+        for name, item in value.items():
+            for pattern, validate in patterns:
+                if pattern.search(name):
+                    error = validate(item)
+                    if error is not None:
+                        return f".{name}{error}"
+        return None
+
+    return check
+
+
+def _items_check(validate: Validator) -> Validator:
+    def check(value: list) -> Optional[str]:
+        for i, item in enumerate(value):
+            error = validate(item)
+            if error is not None:
+                return f"[{i}]{error}"
+        return None
+
+    return check
+
+
+@dataclass
+class DriftStats:
+    """Счетчики проверок одной схемы."""
+
+    checked: int = 0
+    failed: int = 0
+    last_error: Optional[str] = None
+    last_url: Optional[str] = None
+
+
+class ResponseValidator:
+    """Выборочная проверка ответов `FixPriceAPI` на дрейф API.
+
+    Схемы компилируются один раз при создании (см. `compile_schema`). Каждый ответ
+    сопоставляется со схемой по пути URL (`routes`), и с вероятностью `sample_rate`
+    его JSON проверяется. Несовпадения не прерывают запрос: они учитываются в
+    `stats` и передаются в `on_drift(name, url, error)`, если он задан.
+
+    `enum` по умолчанию не проверяется (`enums=False`): снапшот-схемы выводятся из
+    одного ответа, и их `enum` - это увиденные значения, а не допустимые.
+
+    Пример::
+
+        validator = ResponseValidator.from_directory(sample_rate=0.05)
+        api = FixPriceAPI(validator=validator)
+        ...
+        validator.drift()  # {"ClassCatalog.products_list": 3}
+    """
+
+    def __init__(
+        self,
+        schemas: Mapping[str, Mapping[str, Any]],
+        *,
+        routes: Iterable[tuple[str, str]] = DEFAULT_ROUTES,
+        sample_rate: float = 1.0,
+        on_drift: Optional[Callable[[str, str, str], None]] = None,
+        enums: bool = False,
+    ) -> None:
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("`sample_rate` must be in range 0-1")
+
+        self.validators: dict[str, Validator] = {
+            name: compile_schema(schema, enums=enums)
+            for name, schema in schemas.items()
+        }
+        self.routes = [
+            (re.compile(pattern), name)
+            for pattern, name in routes
+            if name in self.validators
+        ]
+        self.sample_rate = sample_rate
+        self.on_drift = on_drift
+        self.stats: dict[str, DriftStats] = {
+            name: DriftStats() for name in self.validators
+        }
+        self.skipped = 0
+        """Ответы, пропущенные из-за `sample_rate`."""
+
+    @classmethod
+    def from_directory(
+        cls, path: str | Path = SCHEMAS_DIR, **kwargs: Any
+    ) -> "ResponseValidator":
+        """Загрузить все `*.schema.json` из каталога (имя схемы - имя файла без суффикса).
+
+        По умолчанию - схемы из пакета (`SCHEMAS_DIR`)."""
+        schemas = {}
+        for file in sorted(Path(path).glob("*.schema.json")):
+            with file.open(encoding="utf-8") as f:
+                schemas[file.name.removesuffix(".schema.json")] = json.load(f)
+        return cls(schemas, **kwargs)
+
+    def route(self, url: str) -> Optional[str]:
+        """Имя схемы для URL или `None`, если ответ не проверяется."""
+        path = urlsplit(url).path
+        for pattern, name in self.routes:
+            if pattern.search(path):
+                return name
+        return None
+
+    def validate(self, name: str, data: Any) -> Optional[str]:
+        """Проверить данные схемой `name` (без выборки и счетчиков)."""
+        return self.validators[name](data)
+
+    def observe(self, url: str, response: "FetchResponse") -> Optional[str]:
+        """Проверить ответ (с учетом `sample_rate`) и обновить счетчики.
+
+        Возвращает описание ошибки или `None`."""
+        name = self.route(url)
+        if name is None or not 200 <= response.status_code < 300:
+            return None
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.skipped += 1
+            return None
+
+        try:
+            error = self.validators[name](json.loads(response.raw))
+        except ValueError as exc:
+            error = f"$: invalid JSON ({exc})"
+
+        stats = self.stats[name]
+        stats.checked += 1
+        if error is not None:
+            stats.failed += 1
+            stats.last_error = error
+            stats.last_url = url
+            if self.on_drift is not None:
+                self.on_drift(name, url, error)
+        return error
+
+    def drift(self) -> dict[str, int]:
+        """Количество несовпадений по схемам (только ненулевые)."""
+        return {name: s.failed for name, s in self.stats.items() if s.failed}
@@ -0,0 +1,628 @@
+"""Распределенная очередь обхода каталога с арендой задач"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (TYPE_CHECKING, Any, AsyncIterator, Callable, Iterable,
+                    Optional)
+
+from .crawler import CrawlPage, CrawlUnit, units_from_tree
+
+if TYPE_CHECKING:
+    from .manager import FixPriceAPI
+
+
+@dataclass(frozen=True)
+class WorkItem:
+    """Задача очереди: страница `products_list` единицы обхода."""
+
+    unit: CrawlUnit
+    page: int = 1
+
+    @property
+    def key(self) -> str:
+        """Стабильный идентификатор задачи (повторный `put` с тем же ключом игнорируется)."""
+        u = self.unit
+        return f"{u.city_id or ''}/{u.category_alias}/{u.subcategory_alias or ''}/{self.page}"
+
+    def dumps(self) -> str:
+        return json.dumps({**asdict(self.unit), "page": self.page})
+
+    @classmethod
+    def loads(cls, data: str | bytes) -> "WorkItem":
+        fields = json.loads(data)
+        page = fields.pop("page")
+        return cls(CrawlUnit(**fields), page)
+
+
+@dataclass(frozen=True)
+class Lease:
+    """Выданная воркеру задача. Пока аренда не истекла, задачу не получит никто другой."""
+
+    item: WorkItem
+    token: str
+    """Идентификатор аренды: подтверждение по устаревшей аренде не принимается."""
+    attempt: int
+    """Номер попытки (с 1)."""
+    expires_at: float
+    """Окончание аренды (Unix time)."""
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    pending: int
+    leased: int
+    done: int
+    failed: int
+
+    @property
+    def finished(self) -> bool:
+        """Не осталось ни ожидающих, ни выданных задач."""
+        return self.pending == 0 and self.leased == 0
+
+
+class QueueBackend(ABC):
+    """Хранилище задач обхода.
+
+    Задача выдается воркеру в аренду на `lease_seconds`. Воркер подтверждает ее
+    (`ack`), возвращает с ошибкой (`nack`) или продлевает (`extend`). Если аренда
+    истекла (воркер упал), задача снова становится доступной. После `max_attempts`
+    неудачных попыток задача помечается как проваленная."""
+
+    max_attempts: int
+
+    @abstractmethod
+    async def put(self, items: Iterable[WorkItem]) -> int:
+        """Добавить задачи. Уже известные (по `WorkItem.key`) пропускаются.
+        Возвращает количество добавленных."""
+
+    @abstractmethod
+    async def lease(self, worker: str, lease_seconds: float) -> Optional[Lease]:
+        """Взять следующую задачу или `None`, если доступных нет."""
+
+    @abstractmethod
+    async def ack(self, lease: Lease) -> bool:
+        """Подтвердить выполнение. `False`, если аренда уже потеряна."""
+
+    @abstractmethod
+    async def nack(self, lease: Lease, error: str) -> bool:
+        """Вернуть задачу после ошибки (или провалить, если попытки кончились)."""
+
+    @abstractmethod
+    async def extend(self, lease: Lease, lease_seconds: float) -> bool:
+        """Продлить аренду. `False`, если она уже потеряна."""
+
+    @abstractmethod
+    async def stats(self) -> QueueStats: ...
+
+    @abstractmethod
+    async def errors(self) -> dict[str, str]:
+        """Последние ошибки проваленных задач: `{key: error}`."""
+
+
+class MemoryQueue(QueueBackend):
+    """Очередь в памяти процесса (несколько воркеров в одном event loop)."""
+
+    def __init__(
+        self, max_attempts: int = 3, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._items: dict[str, WorkItem] = {}
+        self._pending: deque[str] = deque()
+        self._leased: dict[str, tuple[str, float]] = {}
+        self._attempts: dict[str, int] = {}
+        self._done: set[str] = set()
+        self._failed: dict[str, str] = {}
+
+    def _reclaim(self) -> None:
+        now = self.clock()
+        for key, (_token, expires) in list(self._leased.items()):
+            if expires <= now:
+                del self._leased[key]
+                self._retry(key, "lease expired")
+
+    def _retry(self, key: str, error: str) -> None:
+        if self._attempts.get(key, 0) >= self.max_attempts:
+            self._failed[key] = error
+        else:
+            self._pending.append(key)
+
+    def _owns(self, lease: Lease) -> bool:
+        current = self._leased.get(lease.item.key)
+        return current is not None and current[0] == lease.token
+
+    async def put(self, items: Iterable[WorkItem]) -> int:
+        added = 0
+        for item in items:
+            if item.key not in self._items:
+                self._items[item.key] = item
+                self._pending.append(item.key)
+                added += 1
+        return added
+
+    async def lease(self, worker: str, lease_seconds: float) -> Optional[Lease]:
+        self._reclaim()
+        if not self._pending:
+            return None
+        key = self._pending.popleft()
+        token = uuid.uuid4().hex
+        expires = self.clock() + lease_seconds
+        self._leased[key] = (token, expires)
+        self._attempts[key] = self._attempts.get(key, 0) + 1
+        return Lease(self._items[key], token, self._attempts[key], expires)
+
+    async def ack(self, lease: Lease) -> bool:
+        if not self._owns(lease):
+            return False
+        del self._leased[lease.item.key]
+        self._done.add(lease.item.key)
+        return True
+
+    async def nack(self, lease: Lease, error: str) -> bool:
+        if not self._owns(lease):
+            return False
+        del self._leased[lease.item.key]
+        self._retry(lease.item.key, error)
+        return True
+
+    async def extend(self, lease: Lease, lease_seconds: float) -> bool:
+        if not self._owns(lease):
+            return False
+        self._leased[lease.item.key] = (lease.token, self.clock() + lease_seconds)
+        return True
+
+    async def stats(self) -> QueueStats:
+        self._reclaim()
+        return QueueStats(
+            len(self._pending), len(self._leased), len(self._done), len(self._failed)
+        )
+
+    async def errors(self) -> dict[str, str]:
+        return dict(self._failed)
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work (
+    key        TEXT PRIMARY KEY,
+    payload    TEXT NOT NULL,
+    state      TEXT NOT NULL DEFAULT 'pending',
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    token      TEXT,
+    expires_at REAL,
+    worker     TEXT,
+    error      TEXT,
+    seq        INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS work_pending ON work (state, seq);
+CREATE INDEX IF NOT EXISTS work_leased ON work (state, expires_at);
+"""
+
+
+class SQLiteQueue(QueueBackend):
+    """Очередь в файле SQLite: несколько процессов-воркеров на одном хосте.
+
+    Выдача задачи выполняется в транзакции `BEGIN IMMEDIATE`, поэтому одну задачу
+    не получат два процесса. Обращения к базе выполняются в потоке
+    (`asyncio.to_thread`): ожидание блокировки, которую держит другой процесс,
+    не останавливает event loop и браузер."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._db = sqlite3.connect(
+            str(path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        """Соединение одно на очередь - обращения из потоков по очереди"""
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SQLITE_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _transaction(self) -> "_Immediate":
+        return _Immediate(self._db)
+
+    async def _call(self, fn: Callable[..., Any], *args: Any) -> Any:
+        def locked() -> Any:
+            with self._lock:
+                return fn(*args)
+
+        return await asyncio.to_thread(locked)
+
+    def _reclaim(self, now: float) -> None:
+        # внутри транзакции
+        self._db.execute(
+            "UPDATE work SET state = 'failed', token = NULL, error = 'lease expired' "
+            "WHERE state = 'leased' AND expires_at <= ? AND attempts >= ?",
+            (now, self.max_attempts),
+        )
+        self._db.execute(
+            "UPDATE work SET state = 'pending', token = NULL "
+            "WHERE state = 'leased' AND expires_at <= ?",
+            (now,),
+        )
+
+    async def put(self, items: Iterable[WorkItem]) -> int:
+        return await self._call(self._put, list(items))
+
+    def _put(self, items: list[WorkItem]) -> int:
+        with self._transaction():
+            (seq,) = self._db.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM work"
+            ).fetchone()
+            before = self._db.total_changes
+            for item in items:
+                seq += 1
+                self._db.execute(
+                    "INSERT OR IGNORE INTO work (key, payload, seq) VALUES (?, ?, ?)",
+                    (item.key, item.dumps(), seq),
+                )
+            return self._db.total_changes - before
+
+    async def lease(self, worker: str, lease_seconds: float) -> Optional[Lease]:
+        return await self._call(self._lease, worker, lease_seconds)
+
+    def _lease(self, worker: str, lease_seconds: float) -> Optional[Lease]:
+        now = self.clock()
+        with self._transaction():
+            self._reclaim(now)
+            row = self._db.execute(
+                "SELECT key, payload, attempts FROM work WHERE state = 'pending' "
+                "ORDER BY seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            key, payload, attempts = row
+            token = uuid.uuid4().hex
+            expires = now + lease_seconds
+            self._db.execute(
+                "UPDATE work SET state = 'leased', attempts = ?, token = ?, "
+                "expires_at = ?, worker = ? WHERE key = ?",
+                (attempts + 1, token, expires, worker, key),
+            )
+        return Lease(WorkItem.loads(payload), token, attempts + 1, expires)
+
+    def _finish(self, lease: Lease, sql: str, *params: Any) -> bool:
+        with self._transaction():
+            cur = self._db.execute(
+                sql + " WHERE key = ? AND token = ? AND state = 'leased'",
+                (*params, lease.item.key, lease.token),
+            )
+            return cur.rowcount == 1
+
+    async def ack(self, lease: Lease) -> bool:
+        return await self._call(
+            self._finish, lease, "UPDATE work SET state = 'done', token = NULL"
+        )
+
+    async def nack(self, lease: Lease, error: str) -> bool:
+        state = "failed" if lease.attempt >= self.max_attempts else "pending"
+        return await self._call(
+            self._finish,
+            lease,
+            "UPDATE work SET state = ?, token = NULL, error = ?",
+            state,
+            error,
+        )
+
+    async def extend(self, lease: Lease, lease_seconds: float) -> bool:
+        return await self._call(
+            self._finish,
+            lease,
+            "UPDATE work SET expires_at = ?",
+            self.clock() + lease_seconds,
+        )
+
+    async def stats(self) -> QueueStats:
+        return await self._call(self._stats)
+
+    def _stats(self) -> QueueStats:
+        with self._transaction():
+            self._reclaim(self.clock())
+            counts = dict(
+                self._db.execute("SELECT state, COUNT(*) FROM work GROUP BY state")
+            )
+        return QueueStats(
+            counts.get("pending", 0),
+            counts.get("leased", 0),
+            counts.get("done", 0),
+            counts.get("failed", 0),
+        )
+
+    async def errors(self) -> dict[str, str]:
+        return await self._call(self._errors)
+
+    def _errors(self) -> dict[str, str]:
+        return dict(
+            self._db.execute("SELECT key, error FROM work WHERE state = 'failed'")
+        )
+
+
+class _Immediate:
+    """`BEGIN IMMEDIATE` ... `COMMIT`/`ROLLBACK` (блокировка на запись сразу)."""
+
+    def __init__(self, db: sqlite3.Connection) -> None:
+        self._db = db
+
+    def __enter__(self) -> None:
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        self._db.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisQueue(QueueBackend):
+    """Очередь в Redis (или совместимом сервере) для воркеров на разных хостах.
+
+    Используются только базовые команды (списки, множества, хеши, `LMOVE`,
+    `ZADD XX`), без Lua-скриптов. Аренда хранится в отсортированном множестве с
+    членом `key|token`, поэтому `ack`/`nack` по устаревшей аренде ничего не меняют.
+    Задача атомарно перекладывается из очереди в список `processing` (`LMOVE`) и
+    убирается оттуда после записи аренды. Если воркер упал между этими шагами,
+    задача без аренды остается в `processing` и через `orphan_seconds` возвращается
+    в очередь, поэтому задачи не теряются.
+
+    `client` - экземпляр `redis.asyncio.Redis` или объект с тем же интерфейсом.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "fixprice:crawl",
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.time,
+        orphan_seconds: float = 60.0,
+    ) -> None:
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.orphan_seconds = orphan_seconds
+        """Сколько задача может пробыть в `processing` без аренды."""
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs: Any) -> "RedisQueue":
+        """Создать очередь с клиентом `redis.asyncio` (pip install fixprice_api[redis])."""
+        if importlib.util.find_spec("redis") is None:
+            raise ImportError(
+                "RedisQueue.from_url requires redis (pip install fixprice_api[redis])"
+            )
+        import redis.asyncio
+
+        return cls(redis.asyncio.Redis.from_url(url), **kwargs)
+
+    def _k(self, name: str) -> str:
+        return f"{self.prefix}:{name}"
+
+    async def _retry(self, key: str, error: str) -> None:
+        attempts = int(_text(await self.client.hget(self._k("attempts"), key)) or 0)
+        if attempts >= self.max_attempts:
+            await self.client.sadd(self._k("failed"), key)
+            await self.client.hset(self._k("errors"), key, error)
+        else:
+            await self.client.lpush(self._k("pending"), key)
+
+    async def _reclaim(self) -> None:
+        now = self.clock()
+        expired = await self.client.zrangebyscore(self._k("leased"), "-inf", now)
+        for member in expired:
+            # вернуть задачу может только тот, кто удалил аренду
+            if await self.client.zrem(self._k("leased"), member):
+                key = _text(member).rpartition("|")[0]
+                await self.client.lrem(self._k("processing"), 0, key)
+                await self._retry(key, "lease expired")
+        await self._reclaim_orphans(now)
+
+    async def _reclaim_orphans(self, now: float) -> None:
+        processing = [
+            _text(k) for k in await self.client.lrange(self._k("processing"), 0, -1)
+        ]
+        # отметки задач, уже ушедших из `processing`, устарели: задача может
+        # вернуться туда позже, и старая отметка вернула бы ее в очередь сразу
+        for key in await self.client.hgetall(self._k("orphans")):
+            if _text(key) not in processing:
+                await self.client.hdel(self._k("orphans"), key)
+        if not processing:
+            return
+        leased = {
+            _text(m).rpartition("|")[0]
+            for m in await self.client.zrange(self._k("leased"), 0, -1)
+        }
+        for key in processing:
+            if key in leased:
+                continue
+            await self.client.hsetnx(self._k("orphans"), key, now)
+            seen = float(_text(await self.client.hget(self._k("orphans"), key)))
+            # вернуть задачу может только тот, кто убрал ее из `processing`
+            if now - seen >= self.orphan_seconds and await self.client.lrem(
+                self._k("processing"), 1, key
+            ):
+                await self.client.hdel(self._k("orphans"), key)
+                await self.client.lpush(self._k("pending"), key)
+
+    async def put(self, items: Iterable[WorkItem]) -> int:
+        added = 0
+        for item in items:
+            if await self.client.hsetnx(self._k("items"), item.key, item.dumps()):
+                await self.client.lpush(self._k("pending"), item.key)
+                added += 1
+        return added
+
+    async def lease(self, worker: str, lease_seconds: float) -> Optional[Lease]:
+        await self._reclaim()
+        key = await self.client.lmove(
+            self._k("pending"), self._k("processing"), "RIGHT", "LEFT"
+        )
+        if key is None:
+            return None
+        key = _text(key)
+        token = uuid.uuid4().hex
+        expires = self.clock() + lease_seconds
+        await self.client.zadd(self._k("leased"), {f"{key}|{token}": expires})
+        await self.client.lrem(self._k("processing"), 1, key)
+        # `_reclaim_orphans` мог отметить задачу между LMOVE и ZADD
+        await self.client.hdel(self._k("orphans"), key)
+        attempt = int(await self.client.hincrby(self._k("attempts"), key, 1))
+        payload = await self.client.hget(self._k("items"), key)
+        return Lease(WorkItem.loads(payload), token, attempt, expires)
+
+    async def _release(self, lease: Lease) -> bool:
+        member = f"{lease.item.key}|{lease.token}"
+        return bool(await self.client.zrem(self._k("leased"), member))
+
+    async def ack(self, lease: Lease) -> bool:
+        if not await self._release(lease):
+            return False
+        await self.client.sadd(self._k("done"), lease.item.key)
+        return True
+
+    async def nack(self, lease: Lease, error: str) -> bool:
+        if not await self._release(lease):
+            return False
+        await self._retry(lease.item.key, error)
+        return True
+
+    async def extend(self, lease: Lease, lease_seconds: float) -> bool:
+        member = f"{lease.item.key}|{lease.token}"
+        if await self.client.zscore(self._k("leased"), member) is None:
+            return False
+        await self.client.zadd(
+            self._k("leased"), {member: self.clock() + lease_seconds}, xx=True
+        )
+        return True
+
+    async def stats(self) -> QueueStats:
+        await self._reclaim()
+        # задачи в `processing` без аренды вернутся в очередь - считаем ожидающими
+        return QueueStats(
+            int(await self.client.llen(self._k("pending")))
+            + int(await self.client.llen(self._k("processing"))),
+            int(await self.client.zcard(self._k("leased"))),
+            int(await self.client.scard(self._k("done"))),
+            int(await self.client.scard(self._k("failed"))),
+        )
+
+    async def errors(self) -> dict[str, str]:
+        raw = await self.client.hgetall(self._k("errors"))
+        return {_text(k): _text(v) for k, v in raw.items()}
+
+
+@dataclass
+class CrawlCoordinator:
+    """Заполняет очередь единицами обхода из `Catalog.tree` и `Geolocation.cities_list`.
+
+    Запускается на одном узле (повторный запуск безопасен - задачи с теми же
+    ключами не дублируются), а `QueueWorker` - на любом количестве узлов."""
+
+    queue: QueueBackend
+
+    async def seed(
+        self,
+        api: "FixPriceAPI",
+        *,
+        city_ids: Optional[Iterable[int]] = None,
+        country_id: int = 2,
+        split_subcategories: bool = False,
+    ) -> int:
+        """Добавить первые страницы всех категорий во всех городах.
+
+        `city_ids` - явный список городов, иначе все города страны `country_id`.
+        Возвращает количество добавленных задач."""
+        tree = (await api.Catalog.tree()).json()
+        if city_ids is None:
+            cities = (await api.Geolocation.cities_list(country_id=country_id)).json()
+            city_ids = [city["id"] for city in cities]
+        units = units_from_tree(tree, city_ids, split_subcategories=split_subcategories)
+        return await self.queue.put(WorkItem(unit) for unit in units)
+
+
+@dataclass
+class QueueWorker:
+    """Воркер обхода: берет страницы из очереди и запрашивает их через `FixPriceAPI`.
+
+    Если страница заполнена целиком, в очередь добавляется следующая, так что
+    страницы одной категории тоже могут обрабатываться разными узлами.
+    Подтверждение отправляется после того, как потребитель обработал страницу
+    (доставка "хотя бы один раз").
+
+    Пример::
+
+        queue = RedisQueue.from_url("redis://crawl-host:6379")
+        async with FixPriceAPI() as api:
+            async for page in QueueWorker(api, queue).run():
+                sink.write(page.products)
+    """
+
+    api: "FixPriceAPI"
+    queue: QueueBackend
+    name: str = field(default_factory=lambda: f"{socket.gethostname()}:{os.getpid()}")
+    """Имя воркера (сохраняется в аренде для диагностики)."""
+    worker_id: int = 0
+    """Попадает в `CrawlPage.worker_id`."""
+    lease_seconds: float = 120.0
+    limit: int = 24
+    """Размер страницы `products_list`."""
+    poll_interval: float = 5.0
+    """Пауза, если свободных задач нет, но чужие аренды еще не завершены."""
+
+    async def run(
+        self, stop: Optional[asyncio.Event] = None
+    ) -> AsyncIterator[CrawlPage]:
+        """Обрабатывать задачи, пока очередь не опустеет (или до `stop`)."""
+        while stop is None or not stop.is_set():
+            lease = await self.queue.lease(self.name, self.lease_seconds)
+            if lease is None:
+                if (await self.queue.stats()).finished:
+                    return
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            item = lease.item
+            try:
+                with self.api.routing(**item.unit.routing):
+                    resp = await self.api.Catalog.products_list(
+                        category_alias=item.unit.category_alias,
+                        subcategory_alias=item.unit.subcategory_alias,
+                        page=item.page,
+                        limit=self.limit,
+                    )
+                # 403/429 и т.п. - не данные: задача возвращается в очередь
+                if not 200 <= resp.status_code < 300:
+                    raise RuntimeError(f"HTTP {resp.status_code}")
+                products = resp.json()
+                if not isinstance(products, list):
+                    raise ValueError(f"unexpected body: {type(products).__name__}")
+                if len(products) >= self.limit:
+                    await self.queue.put([WorkItem(item.unit, item.page + 1)])
+            except Exception as exc:
+                await self.queue.nack(lease, repr(exc))
+                continue
+
+            if products:
+                yield CrawlPage(item.unit, item.page, products, self.worker_id)
+            await self.queue.ack(lease)
@@ -1,6 +1,16 @@
+import asyncio
+import base64
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+
 import pytest
+from human_requests.abstraction import URL, FetchRequest, FetchResponse
 
 from fixprice_api import FixPriceAPI
+from fixprice_api.manager import _WarmContext
 
 
 @pytest.fixture(scope="session")
@@ -50,3 +60,115 @@ async def products_list_json(api: FixPriceAPI, first_category_alias):
     resp = await api.Catalog.products_list(category_alias=first_category_alias)
     data = resp.json()
     return data
+
+
+@dataclass
+class OfflineRequest:
+    """Запрос, дошедший до `OfflinePage`."""
+
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+
+    @property
+    def city_id(self) -> int | None:
+        city = self.headers.get("x-city")
+        return None if city is None else int(city)
+
+
+@dataclass
+class OfflinePage:
+    """Страница без браузера: отвечает на `products_list` и `balance` из словарей.
+
+    Число вместо тела - код ошибки (тело - `{"message": ...}`). Одиночные запросы
+    приходят в `fetch`, пачки (`FixPriceAPI.batch`) - в `evaluate`."""
+
+    catalog: dict[tuple[str, int], Any] = field(default_factory=dict)
+    """Страницы `products_list`: `{(категория, номер страницы): тело}`"""
+    stock: dict[tuple[int, int], Any] = field(default_factory=dict)
+    """Ответы `balance`: `{(id товара, город): тело}`"""
+    warm_headers: dict[str, Any] = field(
+        default_factory=lambda: {"x-key": "key", "x-language": "ru"}
+    )
+    """Заголовки, которые клиент «поймает» при прогреве."""
+    calls: list[OfflineRequest] = field(default_factory=list)
+
+    def _reply(self, url: str, headers: dict[str, Any]) -> tuple[int, Any]:
+        parts = urlsplit(url)
+        request = OfflineRequest(
+            parts.path,
+            dict(parse_qsl(parts.query)),
+            {k.lower(): str(v) for k, v in headers.items()},
+        )
+        self.calls.append(request)
+
+        segments = parts.path.split("/")
+        if "in" in segments:  # /v1/product/in/<категория>[/<подкатегория>]
+            key: Any = (segments[segments.index("in") + 1], int(request.query["page"]))
+            body = self.catalog.get(key, [])
+        else:  # /v1/store/balance/<id товара>
+            body = self.stock.get((int(segments[-1]), request.city_id), [])
+        if isinstance(body, int):
+            return body, {"message": f"HTTP {body}"}
+        return 200, body
+
+    async def fetch(self, *, url, method, headers=None, **_kwargs) -> FetchResponse:
+        status, body = self._reply(url, headers or {})
+        await asyncio.sleep(0)
+        return FetchResponse(
+            request=FetchRequest(
+                page=self, method=method, url=URL(full_url=url), headers={}, body=None
+            ),
+            page=self,
+            url=URL(full_url=url),
+            headers={"content-type": "application/json"},
+            raw=json.dumps(body).encode(),
+            status_code=status,
+            status_text="",
+            redirected=False,
+            type="cors",
+            duration=0.01,
+            end_time=time.time(),
+        )
+
+    async def evaluate(self, _script: str, arg: dict[str, Any]) -> list[dict]:
+        results = []
+        for item in arg["items"]:
+            status, body = self._reply(item["url"], item["headers"])
+            raw = base64.b64encode(json.dumps(body).encode()).decode()
+            results.append(
+                {
+                    "ok": True,
+                    "status": status,
+                    "headers": {"content-type": "application/json"},
+                    "bodyB64": raw,
+                }
+            )
+        await asyncio.sleep(0)
+        return results
+
+
+class _OfflineContext:
+    async def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def offline_page(monkeypatch) -> OfflinePage:
+    """Прогрев `FixPriceAPI` без браузера: все контексты отвечают этой страницей.
+
+    Клиент создается с `browser=object()`, чтобы не запускать Camoufox."""
+    page = OfflinePage()
+
+    async def open_context(self, entry):
+        return _WarmContext(_OfflineContext(), page, dict(page.warm_headers))
+
+    monkeypatch.setattr(FixPriceAPI, "_open_context", open_context)
+    return page
+
+
+@pytest.fixture
+async def offline_api(offline_page):
+    """Настоящий `FixPriceAPI` поверх `offline_page`."""
+    async with FixPriceAPI(browser=object(), proxy=None) as client:
+        yield client
@@ -0,0 +1,84 @@
+import queue
+
+from fixprice_api import FixPriceAPI, crawler
+from fixprice_api.crawler import CrawlUnit, units_from_tree
+
+TREE = {
+    "1": {
+        "alias": "a",
+        "productCount": 3,
+        "items": {"10": {"alias": "a1"}, "11": {"alias": "a2"}},
+    },
+    "2": {"alias": "b", "productCount": 1, "items": []},
+    "3": {"alias": "empty", "productCount": 0, "items": []},
+}
+
+
+def test_units_from_tree():
+    assert units_from_tree(TREE) == [CrawlUnit("a"), CrawlUnit("b")]
+    assert units_from_tree(TREE, [3, 5]) == [
+        CrawlUnit("a", None, 3),
+        CrawlUnit("a", None, 5),
+        CrawlUnit("b", None, 3),
+        CrawlUnit("b", None, 5),
+    ]
+    assert units_from_tree(TREE, [3], split_subcategories=True) == [
+        CrawlUnit("a", "a1", 3),
+        CrawlUnit("a", "a2", 3),
+        CrawlUnit("b", None, 3),  # без подкатегорий - целиком
+    ]
+    assert CrawlUnit("a").routing == {}
+    assert CrawlUnit("a", None, 3).routing == {"city_id": 3}
+
+
+def _drain(results):
+    messages = []
+    while not results.empty():
+        messages.append(results.get())
+    return messages
+
+
+def _run_worker(units):
+    tasks, results = queue.Queue(), queue.Queue()
+    for unit in [*units, None]:
+        tasks.put(unit)
+    # внешний браузер: прогрев не запускает Camoufox (см. `offline_page`)
+    crawler._worker_main(0, {"browser": object()}, tasks, results, 2, None)
+    return _drain(results)
+
+
+def test_worker_routes_each_unit_and_checks_status(offline_page):
+    offline_page.catalog = {
+        ("a", 1): [1, 2],
+        ("a", 2): [3],
+        ("b", 1): 429,
+        ("c", 1): [4],
+    }
+    offline_page.warm_headers["x-city"] = 9
+    units = [CrawlUnit("a", None, 3), CrawlUnit("b", None, 5), CrawlUnit("c")]
+
+    messages = _run_worker(units)
+
+    # единица без города идет в городе клиента, а не предыдущей единицы
+    calls = [
+        (r.city_id, r.path.rsplit("/", 1)[-1], r.query["page"])
+        for r in offline_page.calls
+    ]
+    assert calls == [(3, "a", "1"), (3, "a", "2"), (5, "b", "1"), (9, "c", "1")]
+    assert ("error", units[1], "RuntimeError('HTTP 429')", 0) in messages
+    pages = [m[1:4] for m in messages if m[0] == "page"]
+    assert pages == [(units[0], 1, [1, 2]), (units[0], 2, [3]), (units[2], 1, [4])]
+
+
+def test_worker_warmup_failure_is_reported(monkeypatch):
+    async def fail(self, entry):
+        raise RuntimeError("browser failed to start")
+
+    monkeypatch.setattr(FixPriceAPI, "_open_context", fail)
+
+    messages = _run_worker([CrawlUnit("a")])
+
+    assert messages == [
+        ("fatal", "RuntimeError('browser failed to start')", 0),
+        ("exit", 0),
+    ]
@@ -0,0 +1,62 @@
+from fixprice_api.history import PriceHistory
+
+
+def _product(product_id, price, special=None):
+    return {"id": product_id, "price": price, "specialPrice": special}
+
+
+def test_unchanged_prices_are_run_length_encoded():
+    with PriceHistory() as history:
+        assert history.record([_product(1, "10.00"), _product(2, "5.00")], 3, 100) == 2
+        assert history.record([_product(1, "10.00"), _product(2, "5.00")], 3, 200) == 0
+        assert history.record([_product(1, "12.00"), _product(2, "5.00")], 3, 300) == 1
+
+        points = history.history(1, 3)
+        assert [(p.price, p.first_seen, p.last_seen) for p in points] == [
+            (10.0, 100, 200),
+            (12.0, 300, 300),
+        ]
+        assert history.history(2, 3)[0].last_seen == 300
+
+
+def test_cities_are_independent_and_latest_snapshot():
+    with PriceHistory() as history:
+        history.record([_product(1, "10.00")], 3, 100)
+        history.record([_product(1, "11.00")], 5, 100)
+        history.record([_product(1, "10.00", "8.00")], 3, 200)
+
+        latest = history.latest(3)
+        assert latest[1].special_price == 8.0
+        assert history.latest(5)[1].price == 11.0
+        assert history.latest(3, product_ids=[2]) == {}
+        assert len(history.history(1, 3, since=150)) == 1
+
+
+def test_late_observations_are_slotted_in():
+    with PriceHistory() as history:
+        history.record([_product(1, "10.00")], 3, 100)
+        history.record([_product(1, "10.00")], 3, 200)
+        history.record([_product(1, "12.00")], 3, 400)
+        history.record([_product(1, "12.00")], 3, 500)
+
+        # раньше последнего наблюдения - последняя цена не меняется
+        assert history.record([_product(1, "11.00")], 3, 300) == 1
+        assert history.record([_product(1, "10.00")], 3, 250) == 0  # продлевает
+        assert history.record([_product(1, "12.00")], 3, 350) == 0  # сдвигает начало
+        assert history.record([_product(1, "9.00")], 3, 50) == 1  # до всей истории
+        # противоречит известному интервалу - отбрасывается
+        assert history.record([_product(1, "15.00")], 3, 150) == 0
+        assert history.record([_product(1, "15.00")], 3, 450) == 0
+        assert history.conflicts == 2
+
+        points = history.history(1, 3)
+        assert [(p.price, p.first_seen, p.last_seen) for p in points] == [
+            (9.0, 50, 50),
+            (10.0, 100, 250),
+            (11.0, 300, 300),
+            (12.0, 350, 500),
+        ]
+        assert history.latest(3)[1].price == 12.0
+
+        assert history.record([_product(1, "13.00")], 3, 600) == 1
+        assert history.latest(3)[1].price == 13.0
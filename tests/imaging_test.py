@@ -0,0 +1,44 @@
+from io import BytesIO
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw
+
+from fixprice_api.imaging import ImageProcessor, hamming, hashes_array
+
+
+def _png(size, color="red"):
+    img = Image.new("RGB", (200, 200), "white")
+    ImageDraw.Draw(img).rectangle((20, 40, 120, 180), fill=color)
+    img = img.resize(size)
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class _General:
+    def __init__(self, images):
+        self.images = images
+
+    async def download_image(self, url):
+        if url not in self.images:
+            raise RuntimeError("404")
+        return BytesIO(self.images[url])
+
+
+async def test_process_hashes_and_thumbnails():
+    images = {
+        "a.png": _png((200, 200)),
+        "a-small.png": _png((64, 64)),
+        "broken.png": b"not an image",
+    }
+    api = SimpleNamespace(General=_General(images))
+
+    async with ImageProcessor(api, workers=2, thumbnail_size=(32, 32)) as proc:
+        results = {r.url: r async for r in proc.process([*images, "missing.png"])}
+
+    assert results["missing.png"].error is not None
+    assert results["broken.png"].error is not None
+    assert results["a.png"].format == "PNG"
+    assert max(Image.open(BytesIO(results["a.png"].thumbnail)).size) == 32
+    assert hamming(results["a.png"].hash, results["a-small.png"].hash) <= 4
+    assert len(hashes_array(results.values())) == 2
@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+
+IMPORT_BUDGET_S = 0.5
+"""Бюджет времени на `import fixprice_api` в чистом интерпретаторе."""
+
+HEAVY_MODULES = ("camoufox", "playwright", "human_requests", "aiohttp", "aiohttp_retry")
+
+
+def _run(code: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout)
+
+
+def test_import_is_lightweight():
+    result = _run(
+        "import json, sys, time\n"
+        "t = time.perf_counter()\n"
+        "import fixprice_api\n"
+        "from fixprice_api import CatalogSort\n"
+        "elapsed = time.perf_counter() - t\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+
+    assert result["heavy"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_S
+
+
+def test_client_import_defers_browser():
+    result = _run(
+        "import json, sys\n"
+        "from fixprice_api import FixPriceAPI\n"
+        "print(json.dumps([m for m in ('camoufox', 'aiohttp_retry') if m in sys.modules]))\n"
+    )
+
+    assert result == []
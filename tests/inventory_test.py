@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from fixprice_api.inventory import (AvailabilityMatrix, Store,
+                                    StoreInventoryCrawler)
+from fixprice_api.manager import FixPriceAPI
+
+TREE = {"1": {"alias": "a", "items": []}, "2": {"alias": "b", "items": []}}
+STOCK = {
+    "p1": {"a": [(1, 5), (2, 0), (3, 1)], "b": [(10, 2)]},
+    "p2": {"a": [(1, 1)], "b": []},
+}
+
+
+class _StockPage:
+    """Страница, отвечающая на `products_list` по заголовку `x-pfm`."""
+
+    def __init__(self):
+        self.calls: list[dict] = []
+
+    async def fetch(self, *, url, headers, **_kwargs):
+        category = urlsplit(url).path.rsplit("/", 1)[-1]
+        self.calls.append((category, headers))
+        await asyncio.sleep(0)
+        query = parse_qs(urlsplit(url).query)
+        page, limit = int(query["page"][0]), int(query["limit"][0])
+        rows = STOCK.get(headers.get("x-pfm"), {}).get(category, [])
+        data = [
+            {"id": pid, "inStock": count}
+            for pid, count in rows[(page - 1) * limit : page * limit]
+        ]
+        return SimpleNamespace(
+            status_code=200,
+            headers={"content-type": "application/json"},
+            json=lambda: data,
+            duration=0.01,
+        )
+
+
+def _api() -> FixPriceAPI:
+    api = FixPriceAPI(proxy=None)
+    api.ctx, api.page = None, _StockPage()
+    api.unstandard_headers = {"x-key": "key", "x-city": 3, "x-language": "ru"}
+    return api
+
+
+def test_store_from_search():
+    stores = Store.from_search(
+        [
+            {"id": 1, "pfm": "p1", "cityId": 3, "isActive": True},
+            {"id": 2, "pfm": "p2", "cityId": 3, "temporarilyClosed": True},
+        ]
+    )
+    assert stores == [Store(1, "p1", 3)]
+
+
+@pytest.mark.anyio
+async def test_store_inventory_crawl(tmp_path):
+    api = _api()
+    crawler = StoreInventoryCrawler(api, TREE, limit=2, concurrency=2)
+    matrix = await crawler.run([Store(100, "p1", 5), Store(200, "p2")])
+
+    assert matrix.products_in(100) == [1, 3, 10]
+    assert matrix.products_in(200) == [1]
+    assert matrix.stores_with(1) == [100, 200]
+    assert not matrix.has(200, 10) and not matrix.has(100, 2)
+    assert matrix.counts() == {100: 3, 200: 1}
+    assert crawler.errors == {}
+
+    matrix.save(tmp_path / "inventory.bin")
+    loaded = AvailabilityMatrix.load(tmp_path / "inventory.bin")
+    assert loaded.stores == matrix.stores and loaded.products_in(100) == [1, 3, 10]
+
+
+@pytest.mark.anyio
+async def test_store_headers_do_not_leak():
+    api = _api()
+    crawler = StoreInventoryCrawler(api, TREE, limit=2, concurrency=2)
+
+    async def other_caller():
+        # обычные вызовы того же клиента во время обхода
+        for _ in range(5):
+            await api.Catalog.products_list("other", limit=2)
+
+    await asyncio.gather(
+        crawler.run([Store(100, "p1", 5), Store(200, "p2")]), other_caller()
+    )
+
+    sent = [h for category, h in api.page.calls if category != "other"]
+    other = [h for category, h in api.page.calls if category == "other"]
+    by_store = {pfm: [h for h in sent if h.get("x-pfm") == pfm] for pfm in ("p1", "p2")}
+    assert len(by_store["p1"]) + len(by_store["p2"]) == len(sent) == crawler.requests
+    assert all(h["x-city"] == 5 for h in by_store["p1"])
+    # магазин без города обходится в городе клиента
+    assert all(h["x-city"] == 3 for h in by_store["p2"])
+    assert all(h["x-delivery-type"] == "store" for h in sent)
+    assert all(h["x-language"] == "ru" and h["x-key"] == "key" for h in sent)
+
+    assert all(h["x-city"] == 3 and "x-pfm" not in h for h in other)
+    assert len(other) == 5 and all("x-delivery-type" not in h for h in other)
+    # настройки клиента не меняются
+    assert api.unstandard_headers["x-city"] == 3
+    assert api.store_id is None and api.delivery_type is None
+
+
+@pytest.mark.anyio
+async def test_store_error_body_is_reported():
+    api = _api()
+
+    async def products_list(**_kwargs):
+        return SimpleNamespace(status_code=200, json=lambda: {"message": "captcha"})
+
+    api.Catalog.products_list = products_list
+    crawler = StoreInventoryCrawler(api, TREE, limit=2)
+    matrix = await crawler.run([Store(100, "p1", 5)])
+
+    assert matrix.stores == []
+    assert crawler.errors[100].startswith("ValueError")
+    assert "unexpected body" in crawler.errors[100]
@@ -0,0 +1,445 @@
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from human_requests.abstraction import (URL, FetchRequest, FetchResponse,
+                                        HttpMethod)
+
+from fixprice_api import manager
+from fixprice_api.abstraction import BatchRequest
+from fixprice_api.manager import FixPriceAPI, _WarmContext
+from fixprice_api.proxy_pool import ProxyPool
+from fixprice_api.recycling import RecyclePolicy
+from fixprice_api.scheduler import Priority, RequestScheduler, priority
+from fixprice_api.shared_browser import LaunchedBrowser, SharedBrowser
+
+URL_A = "https://api.fix-price.com/buyer/v1/category"
+
+
+class _FakePage:
+    """Страница, которая отвечает `status` и `body` и записывает запросы."""
+
+    def __init__(self, status: int = 200, body: object = ()) -> None:
+        self.status = status
+        self.body = body
+        self.calls: list[dict] = []
+        self.gate: asyncio.Event | None = None
+        """Если задан - ответ задерживается, пока событие не установлено."""
+        self.error: Exception | None = None
+
+    async def fetch(self, *, url, method, body=None, headers=None, **_kwargs):
+        self.calls.append(
+            {"url": url, "method": method, "headers": headers, "body": body}
+        )
+        await asyncio.sleep(0)
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return _response(self, url, self.status, self.body, method, headers)
+
+
+class _FakeContext:
+    def __init__(self, status: int = 200) -> None:
+        self.page = _FakePage(status)
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def _response(page, url, status, body, method=HttpMethod.GET, headers=None):
+    return FetchResponse(
+        request=FetchRequest(
+            page=page,
+            method=method,
+            url=URL(full_url=url),
+            headers=headers or {},
+            body=None,
+        ),
+        page=page,
+        url=URL(full_url=url),
+        headers={"content-type": "application/json"},
+        raw=json.dumps(list(body) if isinstance(body, tuple) else body).encode(),
+        status_code=status,
+        status_text="",
+        redirected=False,
+        type="cors",
+        duration=0.01,
+        end_time=time.time(),
+    )
+
+
+def _api(**kwargs) -> FixPriceAPI:
+    """Клиент без браузера: вместо прогрева - поддельные контекст и страница."""
+    api = FixPriceAPI(proxy=None, **kwargs)
+    api.ctx = _FakeContext()
+    api.page = api.ctx.page
+    api.unstandard_headers = {"x-key": "key", "x-city": 3, "x-language": "ru"}
+    return api
+
+
+def _pool_api(pool: ProxyPool, statuses: dict[str, int]) -> FixPriceAPI:
+    api = FixPriceAPI(proxy=pool, coalesce_requests=False)
+
+    async def open_context(entry):
+        ctx = _FakeContext(statuses[entry.proxy.as_str()])
+        return _WarmContext(ctx, ctx.page, {"x-key": entry.proxy.as_str()}, entry=entry)
+
+    api._open_context = open_context
+    return api
+
+
+async def test_quarantine_moves_traffic_off_bad_proxy():
+    pool = ProxyPool(["http://bad:1", "http://good:2"], quarantine_after=2)
+    bad, good = pool.entries
+    choose = pool.choose
+    # пока прокси не в карантине, выбирается именно он
+    pool.choose = lambda exclude=(): (
+        bad
+        if not bad.quarantined and all(e is not bad for e in exclude)
+        else choose(exclude)
+    )
+    api = _pool_api(pool, {"http://bad:1": 500, "http://good:2": 200})
+
+    await api._warmup_context()
+    api.city_id = 5
+    bad_ctx = api.ctx
+    statuses = [
+        (await api._request(HttpMethod.GET, URL_A)).status_code for _ in range(5)
+    ]
+
+    assert statuses == [500, 500, 200, 200, 200]
+    assert bad.quarantined and bad.failures == 2 and good.successes == 3
+    assert bad_ctx.closed
+    assert api.ctx is not bad_ctx and not api.ctx.closed
+    # у каждого контекста свои пойманные заголовки, маршрутизация - общая
+    sent = api.ctx.page.calls[0]["headers"]
+    assert sent["x-key"] == "http://good:2"
+    assert sent["x-city"] == bad_ctx.page.calls[0]["headers"]["x-city"] == 5
+
+
+async def test_pool_spreads_requests_over_warmed_contexts():
+    pool = ProxyPool(["http://a:1", "http://b:2", "http://c:3"])
+    api = _pool_api(pool, {e.proxy.as_str(): 200 for e in pool.entries})
+    await api._warmup_context()
+
+    await asyncio.gather(*(api._request(HttpMethod.GET, URL_A) for _ in range(60)))
+
+    assert len(api._contexts) == 3
+    assert sum(e.successes for e in pool.entries) == 60
+    assert all(len(w.page.calls) > 0 for w in api._contexts.values())
+
+
+async def test_batch_reports_proxy_health():
+    pool = ProxyPool(["http://a:1"], quarantine_after=10)
+    entry = pool.entries[0]
+    api = _pool_api(pool, {"http://a:1": 200})
+    await api._warmup_context()
+    page = api.page
+    batch = [BatchRequest(HttpMethod.GET, URL_A)]
+
+    async def broken(*_args):
+        raise RuntimeError("target closed")
+
+    page.evaluate = broken
+    with pytest.raises(RuntimeError):
+        await api.batch(batch)
+    assert entry.failures == 1
+
+    async def all_failed(*_args):
+        return [{"ok": False, "error": "TypeError: NetworkError"}]
+
+    page.evaluate = all_failed
+    assert isinstance((await api.batch(batch))[0], RuntimeError)
+    assert entry.failures == 2
+
+    async def ok(*_args):
+        return [{"ok": True, "status": 200, "headers": {}, "bodyB64": "W10="}]
+
+    page.evaluate = ok
+    assert (await api.batch(batch))[0].json() == []
+    assert entry.successes == 1 and entry.consecutive_failures == 0
+
+
+async def _in_flight(page: _FakePage, calls: int) -> None:
+    for _ in range(100):
+        if len(page.calls) >= calls:
+            return
+        await asyncio.sleep(0)
+    raise AssertionError(f"expected {calls} requests, got {len(page.calls)}")
+
+
+async def test_concurrent_duplicates_share_one_fetch():
+    api = _api()
+    api.page.gate = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(api._request(HttpMethod.GET, URL_A)) for _ in range(5)
+    ]
+    await _in_flight(api.page, 1)
+    await asyncio.sleep(0)
+
+    api.page.gate.set()
+    responses = await asyncio.gather(*tasks)
+    assert len(api.page.calls) == 1
+    assert all(r is responses[0] for r in responses)
+    assert api._inflight == {}
+
+    await api._request(
+        HttpMethod.GET, URL_A
+    )  # завершившийся запрос не переиспользуется
+    assert len(api.page.calls) == 2
+
+
+async def test_requests_with_other_city_are_not_merged():
+    api = _api()
+    api.page.gate = asyncio.Event()
+
+    async def in_city(city_id):
+        with api.routing(city_id=city_id):
+            return await api._request(HttpMethod.GET, URL_A)
+
+    tasks = [asyncio.ensure_future(in_city(c)) for c in (3, 5, 3)]
+    await _in_flight(api.page, 2)
+    api.page.gate.set()
+    first, other, same = await asyncio.gather(*tasks)
+
+    assert first is same and first is not other
+    assert sorted(c["headers"]["x-city"] for c in api.page.calls) == [3, 5]
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_request():
+    api = _api()
+    api.page.gate = asyncio.Event()
+    tasks = [
+        asyncio.ensure_future(api._request(HttpMethod.GET, URL_A)) for _ in range(3)
+    ]
+    await _in_flight(api.page, 1)
+
+    tasks[0].cancel()
+    await asyncio.sleep(0)
+    api.page.gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert isinstance(results[0], asyncio.CancelledError)
+    assert results[1] is results[2] and results[1].status_code == 200
+    assert len(api.page.calls) == 1
+
+
+async def test_exception_reaches_every_waiter():
+    api = _api()
+    api.page.gate = asyncio.Event()
+    api.page.error = RuntimeError("target closed")
+    tasks = [
+        asyncio.ensure_future(api._request(HttpMethod.GET, URL_A)) for _ in range(3)
+    ]
+    await _in_flight(api.page, 1)
+
+    api.page.gate.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(api.page.calls) == 1 and api._inflight == {}
+
+
+async def test_batch_decodes_bodies_and_falls_back_on_challenge():
+    api = _api()
+    api.page.body = [{"id": 7}]
+    sent = []
+
+    async def evaluate(_script, arg):
+        sent.extend(arg["items"])
+        body = base64.b64encode(b'[{"id": 1}]').decode()
+        return [
+            {
+                "ok": True,
+                "status": 200,
+                "headers": {
+                    "content-type": "application/json",
+                    "content-encoding": "br",
+                    "content-length": "9",
+                },
+                "bodyB64": body,
+            },
+            {"ok": False, "error": "TypeError: Failed to fetch"},
+            {"ok": True, "status": 200, "headers": {"content-type": "text/html"}},
+        ]
+
+    api.page.evaluate = evaluate
+    with api.routing(city_id=5):
+        ok, failed, challenge = await api.batch(
+            [
+                BatchRequest(HttpMethod.POST, URL_A, json_body={"a": 1}),
+                BatchRequest(HttpMethod.GET, URL_A),
+                BatchRequest(HttpMethod.GET, URL_A + "/2"),
+            ]
+        )
+
+    # тело уже распаковано браузером - заголовки сжатия убираются
+    assert ok.json() == [{"id": 1}] and ok.status_code == 200
+    assert "content-encoding" not in ok.headers and "content-length" not in ok.headers
+    assert isinstance(failed, RuntimeError) and "Failed to fetch" in str(failed)
+    # HTML-челлендж повторяется обычным запросом с той же маршрутизацией
+    assert challenge.json() == [{"id": 7}]
+    (retry,) = api.page.calls
+    assert retry["url"] == URL_A + "/2" and retry["headers"]["x-city"] == 5
+
+    assert sent[0]["body"] == '{"a": 1}'
+    assert sent[0]["headers"]["content-type"] == "application/json"
+    assert sent[0]["headers"]["x-city"] == "5" and sent[0]["headers"]["x-key"] == "key"
+
+
+async def test_recycle_waits_for_in_flight_calls_and_keeps_routing():
+    api = _api(recycle=RecyclePolicy(max_requests=2), coalesce_requests=False)
+    old_ctx = api.ctx
+    old_ctx.page.gate = asyncio.Event()
+    new_ctx = _FakeContext()
+
+    async def open_context(_entry):
+        return _WarmContext(new_ctx, new_ctx.page, {"x-key": "new", "x-city": 3})
+
+    api._open_context = open_context
+    api.city_id = 5
+
+    in_flight = [
+        asyncio.ensure_future(api._request(HttpMethod.GET, f"{URL_A}/{i}"))
+        for i in range(2)
+    ]
+    await _in_flight(old_ctx.page, 2)
+    waiting = asyncio.ensure_future(api._request(HttpMethod.GET, f"{URL_A}/3"))
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+    # пересоздание ждет начатые запросы, новый запрос ждет пересоздания
+    assert not waiting.done() and not old_ctx.closed
+    assert len(old_ctx.page.calls) == 2 and new_ctx.page.calls == []
+
+    old_ctx.page.gate.set()
+    assert all(r.status_code == 200 for r in await asyncio.gather(*in_flight))
+    await waiting
+
+    assert old_ctx.closed and api.recycles == 1
+    (sent,) = new_ctx.page.calls
+    assert sent["headers"]["x-key"] == "new" and sent["headers"]["x-city"] == 5
+    assert api.city_id == 5
+
+
+async def test_rss_limit_requires_own_browser():
+    api = FixPriceAPI(
+        browser=SharedBrowser(), recycle=RecyclePolicy(max_rss_bytes=1 << 30)
+    )
+    with pytest.raises(ValueError):
+        await api._warmup()
+    assert api.browser.refs == 0
+
+
+async def test_interactive_call_does_not_wait_in_background_lane():
+    scheduler = RequestScheduler(max_concurrency=2, reserved={Priority.INTERACTIVE: 1})
+    api = _api(scheduler=scheduler)
+    api.page.gate = asyncio.Event()
+    url = f"{URL_A}/2"
+
+    def call(level, target):
+        with priority(level):
+            return asyncio.ensure_future(api._request(HttpMethod.GET, target))
+
+    crawl = call(Priority.BACKGROUND, f"{URL_A}/1")
+    await _in_flight(api.page, 1)
+    queued = call(Priority.BACKGROUND, url)  # фоновая полоса занята
+    await asyncio.sleep(0)
+    assert len(api.page.calls) == 1
+
+    # не присоединяется к ждущему фоновому запросу - идет в своей полосе
+    ui = call(Priority.INTERACTIVE, url)
+    await _in_flight(api.page, 2)
+    # фоновый вызов присоединяется к уже идущему интерактивному
+    joined = call(Priority.BACKGROUND, url)
+    await asyncio.sleep(0)
+    assert [c["url"] for c in api.page.calls] == [f"{URL_A}/1", url]
+
+    api.page.gate.set()
+    await asyncio.gather(crawl, queued, ui, joined)
+    assert joined.result() is ui.result() and queued.result() is not ui.result()
+    assert len(api.page.calls) == 3
+
+
+async def test_browser_recycle_stops_playwright_driver(monkeypatch):
+    drivers = []
+
+    class _Driver:
+        def __init__(self, pid):
+            self.pid = pid
+            self.stopped = False
+            self._connection = SimpleNamespace(
+                _transport=SimpleNamespace(_proc=SimpleNamespace(pid=pid))
+            )
+
+        async def __aexit__(self, *_exc):
+            self.stopped = True
+
+    async def launch(_headless, _proxy, _opts):
+        drivers.append(_Driver(100 + len(drivers)))
+        return LaunchedBrowser(object(), drivers[-1])
+
+    async def open_context(_entry):
+        ctx = _FakeContext()
+        return _WarmContext(ctx, ctx.page, {"x-key": "key"})
+
+    monkeypatch.setattr(manager, "launch_camoufox", launch)
+    api = FixPriceAPI(
+        proxy=None, recycle=RecyclePolicy(max_requests=1, scope="browser")
+    )
+    api._open_context = open_context
+
+    await api._warmup()
+    assert api._browser_pids == {100}
+    await api._request(HttpMethod.GET, URL_A)
+    await api._request(HttpMethod.GET, URL_A)  # пересоздание браузера
+
+    assert api.recycles == 1 and drivers[0].stopped and not drivers[1].stopped
+    assert api._browser_pids == {101}
+    await api.close()
+    assert drivers[1].stopped
+
+
+async def test_products_list_sends_filters():
+    api = _api()
+    await api.Catalog.products_list(
+        "kosmetika",
+        "uhod",
+        brands=[20510],
+        is_new=True,
+        is_hit=True,
+        is_special_price=True,
+        is_divided_price=True,
+    )
+
+    (call,) = api.page.calls
+    assert call["method"] == HttpMethod.POST
+    assert call["body"] == {
+        "category": "kosmetika/uhod",
+        "brand": [20510],
+        "price": [],
+        "isDividedPrice": True,
+        "isNew": True,
+        "isHit": True,
+        "isSpecialPrice": True,
+    }
+
+
+async def test_brands_are_collected_from_listing():
+    api = _api()
+    api.page.body = [
+        {"id": 1, "brand": {"id": 7, "title": "A"}},
+        {"id": 2, "brand": {"id": 7, "title": "A"}},
+        {"id": 3, "brand": {"id": 8, "title": "B"}},
+        {"id": 4, "brand": None},
+    ]
+
+    assert await api.Catalog.brands("kosmetika", limit=5) == {
+        7: {"title": "A", "count": 2},
+        8: {"title": "B", "count": 1},
+    }
+    assert len(api.page.calls) == 1  # неполная страница - последняя
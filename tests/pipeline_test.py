@@ -0,0 +1,71 @@
+import csv
+import gzip
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from fixprice_api.pipeline import (CSVSink, NDJSONSink, balance_source, dedupe,
+                                   flatten, products_source, project,
+                                   run_pipeline)
+
+
+async def _records(n):
+    for i in range(n):
+        yield {"id": i % 50, "title": f"item {i}", "brand": {"id": i, "title": "b"}}
+
+
+async def test_ndjson_gzip_rotation(tmp_path):
+    sink = NDJSONSink(tmp_path / "out.ndjson", compression="gzip", rotate_bytes=512)
+    written = await run_pipeline(
+        _records(200), dedupe("id"), sink=sink, buffer=8, batch_size=4
+    )
+
+    assert written == 50
+    assert len(sink.paths) > 1
+    lines = []
+    for path in sink.paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            lines.extend(json.loads(line) for line in f)
+    assert [r["id"] for r in lines] == list(range(50))
+
+
+async def test_csv_flatten_project(tmp_path):
+    sink = CSVSink(tmp_path / "out.csv", rotate_bytes=256)
+    written = await run_pipeline(
+        _records(20), flatten(), project(["id", "brand.id"]), sink=sink
+    )
+
+    assert written == 20
+    rows = []
+    for path in sink.paths:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            assert reader.fieldnames == ["id", "brand.id"]
+            rows.extend(reader)
+    assert [int(r["brand.id"]) for r in rows] == list(range(20))
+
+
+def _response(body, status=200):
+    return SimpleNamespace(status_code=status, json=lambda: body)
+
+
+async def test_sources_reject_error_responses():
+    error = _response({"message": "Too Many Requests"}, status=429)
+
+    async def products_list(**_kwargs):
+        return error
+
+    async def balance(product_id, in_stock):
+        return _response({"message": "unexpected"})  # 200, но не список
+
+    api = SimpleNamespace(
+        Catalog=SimpleNamespace(
+            products_list=products_list, Product=SimpleNamespace(balance=balance)
+        )
+    )
+
+    with pytest.raises(RuntimeError, match="HTTP 429"):
+        [r async for r in products_source(api, "a")]
+    with pytest.raises(ValueError):
+        [r async for r in balance_source(api, [1])]
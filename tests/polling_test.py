@@ -0,0 +1,120 @@
+import pytest
+
+from fixprice_api.polling import StockPoller
+
+
+def _stores(counts):
+    """Тело ответа `balance`: `{id магазина: количество}`."""
+    return [{"id": store, "count": count} for store, count in counts.items()]
+
+
+@pytest.mark.anyio
+async def test_interval_adapts_to_volatility(offline_api, offline_page):
+    now = [0.0]
+    poller = StockPoller(
+        offline_api,
+        min_interval=10,
+        max_interval=1000,
+        initial_interval=100,
+        budget_per_minute=100,
+        clock=lambda: now[0],
+    )
+    item = poller.watch(1, city_id=3)
+    offline_page.stock[(1, 3)] = _stores({10: 5})
+
+    assert await poller.poll_once() == []  # первое наблюдение - без события
+    assert item.interval == 100  # базовая линия, интервал не меняется
+
+    now[0] = 100
+    assert await poller.poll_once() == []
+    assert item.interval == 200  # стабильно - реже
+
+    now[0] = 300
+    offline_page.stock[(1, 3)] = _stores({10: 2, 11: 1})
+    (change,) = await poller.poll_once()
+    assert change.delta == {10: -3, 11: 1}
+    # изменилось - чаще, но единичное изменение учащает опрос слабо
+    assert item.interval == pytest.approx(200 * 0.5**0.2)
+    assert item.changes == 1 and item.polls == 3
+    assert offline_api.city_id is None  # город клиента не меняется
+
+
+@pytest.mark.anyio
+async def test_interval_follows_change_rate(offline_api, offline_page):
+    now = [0.0]
+    poller = StockPoller(
+        offline_api,
+        min_interval=1,
+        max_interval=10**6,
+        initial_interval=100,
+        budget_per_minute=100,
+        clock=lambda: now[0],
+    )
+    volatile, stable = poller.watch(1, city_id=3), poller.watch(2, city_id=3)
+    offline_page.stock[(2, 3)] = _stores({10: 1})
+
+    steps = []
+    for count in range(6):
+        offline_page.stock[(1, 3)] = _stores({10: count})
+        before = volatile.interval
+        await poller.poll_once()
+        steps.append(volatile.interval / before)
+        now[0] += 10**6
+    # чем чаще товар меняется, тем сильнее учащается опрос
+    assert steps[1] > steps[2] > steps[-1] > 0.5
+    assert volatile.change_rate > 0.6 and stable.change_rate == 0
+    assert stable.interval == 100 * 2**5
+
+    # после тихого опроса волатильный товар замедляется меньше, чем в `backoff` раз
+    before = volatile.interval
+    await poller.poll_once()
+    assert 1 < volatile.interval / before < 2
+
+
+@pytest.mark.anyio
+async def test_budget_and_city_grouping(offline_api, offline_page):
+    now = [0.0]
+    batches = []
+    evaluate = offline_page.evaluate
+
+    async def counted(script, arg):
+        batches.append(len(arg["items"]))
+        return await evaluate(script, arg)
+
+    offline_page.evaluate = counted
+    poller = StockPoller(offline_api, budget_per_minute=3, clock=lambda: now[0])
+    for pid in range(4):
+        poller.watch(pid, city_id=3 if pid % 2 else 5)
+
+    await poller.poll_once()
+    assert len(offline_page.calls) == 3
+    assert sorted(batches) == [1, 2]  # одна пачка на город
+    assert {r.city_id for r in offline_page.calls} == {3, 5}
+    assert poller.next_wakeup() == pytest.approx(20)  # токен - раз в 20 с
+
+    now[0] = 20
+    await poller.poll_once()
+    last = offline_page.calls[-1]
+    assert (last.city_id, last.path.rsplit("/", 1)[-1]) == (3, "3")
+
+
+@pytest.mark.anyio
+async def test_error_responses_are_failed_polls(offline_api, offline_page):
+    now = [0.0]
+    poller = StockPoller(offline_api, min_interval=30, clock=lambda: now[0])
+    limited = poller.watch(1, city_id=3)
+    broken = poller.watch(2, city_id=5)
+    offline_page.stock[(1, 3)] = 429
+    offline_page.stock[(2, 5)] = {"message": "unexpected"}  # 200, но не список
+
+    assert await poller.poll_once() == []
+    assert limited.failures == broken.failures == 1
+    assert limited.snapshot is None and limited.next_due == 30
+
+    async def down(*_args):
+        raise RuntimeError("browser closed")
+
+    offline_page.evaluate = down
+    now[0] = 30
+    assert await poller.poll_once() == []
+    assert limited.failures == broken.failures == 2
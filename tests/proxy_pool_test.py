@@ -0,0 +1,44 @@
+import pytest
+
+from fixprice_api.proxy_pool import ProxyPool
+
+
+def test_quarantine_after_consecutive_errors():
+    pool = ProxyPool(["http://a:1", "http://b:2"], quarantine_after=2)
+    bad, good = pool.entries
+
+    pool.report(bad, error=True)
+    assert not bad.quarantined
+    pool.report(bad, error=True)
+    assert bad.quarantined
+
+    for _ in range(20):
+        assert pool.choose() is good
+
+    pool.report(bad, latency=0.1)
+    assert not bad.quarantined
+
+
+def test_all_quarantined_returns_soonest():
+    pool = ProxyPool(["http://a:1", "http://b:2"], quarantine_after=1)
+    first, second = pool.entries
+    pool.report(first, error=True)
+    pool.report(second, error=True)
+    pool.report(second, error=True)  # более долгий карантин
+
+    assert pool.choose() is first
+
+
+async def test_use_records_latency_and_errors():
+    pool = ProxyPool(["http://a:1"])
+    entry = pool.entries[0]
+
+    async with pool.use() as px:
+        assert px is entry.proxy
+    assert entry.successes == 1
+    assert entry.latency is not None
+
+    with pytest.raises(RuntimeError):
+        async with pool.use():
+            raise RuntimeError("boom")
+    assert entry.failures == 1
@@ -0,0 +1,93 @@
+import pytest
+
+from fixprice_api.crawler import CrawlUnit
+from fixprice_api.recrawl import Recrawler, fingerprint
+
+TREE = {
+    "1": {"id": 1, "alias": "a", "productCount": 3, "items": []},
+    "2": {"id": 2, "alias": "b", "productCount": 1, "items": []},
+}
+
+
+def _serve(page, pages):
+    page.catalog = {
+        (category, number): body
+        for category, bodies in pages.items()
+        for number, body in enumerate(bodies, 1)
+    }
+
+
+def _calls(page):
+    calls = [(r.path.rsplit("/", 1)[-1], int(r.query["page"])) for r in page.calls]
+    page.calls.clear()
+    return calls
+
+
+def _product(pid, price):
+    return {"id": pid, "price": price, "specialPrice": None}
+
+
+@pytest.mark.anyio
+async def test_recrawl_skips_unchanged_categories(tmp_path, offline_api, offline_page):
+    pages = {
+        "a": [[_product(1, "10.00"), _product(2, "20.00")], [_product(3, "30.00")]],
+        "b": [[_product(4, "40.00")]],
+    }
+    _serve(offline_page, pages)
+    state = tmp_path / "state.json"
+
+    first = [p async for p in Recrawler(offline_api, state, limit=2).run(TREE)]
+    assert [(p.unit.category_alias, p.page) for p in first] == [
+        ("a", 1),
+        ("a", 2),
+        ("b", 1),
+    ]
+
+    # новый процесс, тот же файл: ничего не изменилось - только первые страницы
+    _calls(offline_page)
+    recrawler = Recrawler(offline_api, state, limit=2)
+    assert [p async for p in recrawler.run(TREE)] == []
+    assert _calls(offline_page) == [("a", 1), ("b", 1)]
+    assert (recrawler.stats.skipped, recrawler.stats.deep) == (2, 0)
+
+    # цена на первой странице изменилась - категория проходится целиком
+    pages["a"][0][1] = _product(2, "25.00")
+    again = [p async for p in recrawler.run(TREE)]
+    assert [p.page for p in again] == [1, 2]
+    assert _calls(offline_page) == [("a", 1), ("a", 2), ("b", 1)]
+
+
+@pytest.mark.anyio
+async def test_full_sweep_and_tree_change(offline_api, offline_page):
+    pages = {"a": [[_product(1, "10.00")]], "b": [[_product(4, "40.00")]]}
+    _serve(offline_page, pages)
+    recrawler = Recrawler(offline_api, limit=2)
+    [p async for p in recrawler.run(TREE)]
+
+    tree = {**TREE, "2": {**TREE["2"], "productCount": 2}}
+    [p async for p in recrawler.run(tree)]
+    assert (recrawler.stats.deep, recrawler.stats.skipped) == (1, 1)
+
+    recrawler.full_sweep_interval = 0
+    [p async for p in recrawler.run(tree)]
+    assert (recrawler.stats.deep, recrawler.stats.swept) == (2, 2)
+
+
+def test_fingerprint_ignores_product_order():
+    page = [_product(1, "10.00"), _product(2, "20.00")]
+    assert fingerprint(None, page) == fingerprint(None, page[::-1])
+    assert fingerprint(None, page) != fingerprint(None, [_product(1, "11.00")])
+
+
+@pytest.mark.anyio
+async def test_errors_are_recorded_per_category(offline_api, offline_page):
+    _serve(offline_page, {"a": [429], "b": [[_product(4, "40.00")]]})
+    recrawler = Recrawler(offline_api, limit=2)
+
+    assert [p.unit.category_alias async for p in recrawler.run(TREE, [3])] == ["b"]
+    assert recrawler.stats.failed == 1
+    assert recrawler.stats.errors == {
+        CrawlUnit("a", None, 3): "RuntimeError('HTTP 429')"
+    }
+    assert "3/a/" not in recrawler.state  # отпечаток не сохраняется
+    assert offline_api.city_id is None  # город клиента не меняется
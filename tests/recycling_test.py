@@ -0,0 +1,55 @@
+import subprocess
+import sys
+import time
+
+from fixprice_api.recycling import (RecyclePolicy, child_pids,
+                                    children_rss_bytes, process_tree_rss_bytes)
+
+
+def test_reason_by_requests_and_age():
+    policy = RecyclePolicy(max_requests=10, max_age_seconds=60)
+
+    assert policy.reason(requests=9, warmed_at=time.monotonic()) is None
+    assert policy.reason(requests=10, warmed_at=time.monotonic()) == "max_requests"
+    assert policy.reason(requests=0, warmed_at=time.monotonic() - 61) == "max_age"
+
+
+def test_reason_by_rss_respects_check_interval():
+    policy = RecyclePolicy(max_rss_bytes=1, rss_check_interval=3600)
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        assert policy.reason(requests=0, warmed_at=time.monotonic()) == "max_rss"
+        # следующий замер - не раньше чем через rss_check_interval
+        assert policy.reason(requests=0, warmed_at=time.monotonic()) is None
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_children_rss_counts_subprocess():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        rss = children_rss_bytes()
+        assert rss is not None and rss > 0
+    finally:
+        child.kill()
+        child.wait()
+
+
+def test_rss_of_given_process_tree_only():
+    browser = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    other = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+    try:
+        assert {browser.pid, other.pid} <= child_pids()
+        rss = process_tree_rss_bytes([browser.pid])
+        assert 0 < rss < children_rss_bytes()
+
+        # граница выше памяти браузера, но ниже памяти всех потомков
+        policy = RecyclePolicy(max_rss_bytes=rss + rss // 2, rss_check_interval=0)
+        assert policy.reason(0, time.monotonic(), pids=[browser.pid]) is None
+        assert policy.reason(0, time.monotonic()) == "max_rss"
+        assert process_tree_rss_bytes([]) == 0
+    finally:
+        for child in (browser, other):
+            child.kill()
+            child.wait()
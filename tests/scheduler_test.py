@@ -0,0 +1,62 @@
+import asyncio
+
+from fixprice_api.scheduler import (LatencyHistogram, Priority,
+                                    RequestScheduler, priority)
+
+
+async def test_interactive_uses_reserved_slot():
+    scheduler = RequestScheduler(max_concurrency=3, reserved={Priority.INTERACTIVE: 1})
+    release = asyncio.Event()
+    order = []
+
+    async def job(name):
+        async with scheduler.slot():
+            order.append(name)
+            await release.wait()
+
+    with priority(Priority.BACKGROUND):
+        background = [asyncio.create_task(job(f"bg{i}")) for i in range(5)]
+    await asyncio.sleep(0)
+    assert scheduler.running == 2  # один слот зарезервирован
+
+    with priority(Priority.INTERACTIVE):
+        interactive = asyncio.create_task(job("ui"))
+    await asyncio.sleep(0)
+    assert order[-1] == "ui"
+
+    release.set()
+    await asyncio.gather(*background, interactive)
+    assert scheduler.histograms[Priority.BACKGROUND].count == 5
+    assert scheduler.histograms[Priority.INTERACTIVE].count == 1
+
+
+async def test_higher_priority_waiter_runs_first():
+    scheduler = RequestScheduler(max_concurrency=2, reserved={})
+    gate = asyncio.Event()
+    order = []
+
+    async def job(name, level):
+        async with scheduler.slot(level):
+            order.append(name)
+            await gate.wait()
+
+    blockers = [asyncio.create_task(job(f"b{i}", Priority.NORMAL)) for i in range(2)]
+    await asyncio.sleep(0)
+    late = [
+        asyncio.create_task(job("bg", Priority.BACKGROUND)),
+        asyncio.create_task(job("ui", Priority.INTERACTIVE)),
+    ]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*blockers, *late)
+    assert order[2:] == ["ui", "bg"]
+
+
+def test_histogram_quantiles():
+    hist = LatencyHistogram()
+    for _ in range(99):
+        hist.observe(0.01)
+    hist.observe(5.0)
+
+    assert hist.quantile(0.5) < 0.02
+    assert hist.quantile(1.0) >= 5.0
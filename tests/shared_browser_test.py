@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+from fixprice_api import shared_browser
+from fixprice_api.shared_browser import LaunchedBrowser, SharedBrowser
+
+
+class _Browser:
+    closed = 0
+
+    async def close(self):
+        self.closed += 1
+
+
+class _Camoufox:
+    """Замена `AsyncCamoufox`: `__aexit__` закрывает браузер и драйвер."""
+
+    def __init__(self, browser, pid=None):
+        self.browser = browser
+        self.stopped = False
+        proc = SimpleNamespace(pid=pid) if pid is not None else None
+        self._connection = SimpleNamespace(_transport=SimpleNamespace(_proc=proc))
+
+    async def __aexit__(self, *_exc):
+        await self.browser.close()
+        self.stopped = True
+
+
+@pytest.mark.anyio
+async def test_shared_browser_refcount(monkeypatch):
+    launched = []
+
+    async def launch(headless, proxy, browser_opts):
+        launched.append(browser_opts)
+        browser = _Browser()
+        return LaunchedBrowser(browser, _Camoufox(browser))
+
+    monkeypatch.setattr(shared_browser, "launch_camoufox", launch)
+    shared = SharedBrowser(browser_opts={"locale": "ru-RU"})
+
+    first = await shared.acquire()
+    second = await shared.acquire()
+    assert first is second and shared.refs == 2
+    assert launched == [{"locale": "ru-RU"}]
+
+    await shared.release()
+    assert first.closed == 0 and shared.browser is first
+
+    await shared.release()
+    assert first.closed == 1 and shared.browser is None
+    with pytest.raises(RuntimeError):
+        await shared.release()
+
+    async with shared:  # следующий клиент запускает новый браузер
+        assert shared.browser is not first
+    assert len(launched) == 2
+
+
+def test_launched_browser_pids():
+    assert LaunchedBrowser(_Browser(), _Camoufox(None, pid=42)).pids == {42}
+    assert LaunchedBrowser(_Browser(), object()).pids == set()
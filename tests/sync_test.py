@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fixprice_api import FixPriceAPISync
+
+
+def test_sync_facade_shared_between_threads():
+    with FixPriceAPISync() as api:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(
+                pool.map(lambda _: api.Geolocation.countries_list(), range(8))
+            )
+        assert all(r.status_code == 200 for r in responses)
+
+        tree = api.Catalog.tree().json()
+        alias = tree[list(tree.keys())[0]]["alias"]
+        product = api.Catalog.products_list(category_alias=alias).json()[0]
+
+        api.city_id = 3
+        assert api.city_id == 3
+        assert api.Catalog.Product.balance(product["id"]).status_code == 200
+
+
+def test_sync_routing_per_thread(offline_page):
+    offline_page.warm_headers["x-city"] = 1
+    offline_page.catalog = {(f"c{city}", 1): [city] for city in (1, 3, 5, 7, 9)}
+
+    def crawl(api, city_id):
+        async def call(a):
+            with a.routing(city_id=city_id):
+                return await a.Catalog.products_list(f"c{city_id}")
+
+        return api.run(call).json()[0]
+
+    # внешний браузер: прогрев не запускает Camoufox (см. `offline_page`)
+    with FixPriceAPISync(browser=object(), proxy=None) as api:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            cities = list(pool.map(lambda c: crawl(api, c), [3, 5, 7, 9] * 3))
+
+        assert cities == [3, 5, 7, 9] * 3
+        # город клиента не тронут, запросы без routing идут в нем
+        assert api.city_id == 1
+        assert api.Catalog.products_list("c1").json() == [1]
+
+    sent = {(r.path.rsplit("/", 1)[-1], r.city_id) for r in offline_page.calls}
+    assert sent == {(f"c{city}", city) for city in (1, 3, 5, 7, 9)}
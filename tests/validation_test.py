@@ -0,0 +1,115 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from fixprice_api.validation import (DEFAULT_ROUTES, SCHEMAS_DIR,
+                                     ResponseValidator, compile_schema)
+
+SNAPSHOTS = Path(__file__).parent / "__snapshots__"
+
+
+@pytest.mark.parametrize(
+    "schema_file", sorted(SNAPSHOTS.glob("*.schema.json")), ids=lambda p: p.name
+)
+def test_snapshots_match_own_schema(schema_file):
+    data_file = schema_file.with_name(schema_file.name.replace(".schema", ""))
+    if not data_file.exists():
+        pytest.skip("no snapshot data")
+
+    validate = compile_schema(json.loads(schema_file.read_text(encoding="utf-8")))
+    assert validate(json.loads(data_file.read_text(encoding="utf-8"))) is None
+
+
+def test_error_paths_and_keywords():
+    validate = compile_schema(
+        {
+            "type": "object",
+            "required": ["items"],
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "minItems": 1,
+                    "items": {"$ref": "#/$defs/P"},
+                }
+            },
+            "$defs": {
+                "P": {
+                    "type": "object",
+                    "required": ["id"],
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "kind": {"enum": ["a", "b"]},
+                        "url": {"anyOf": [{"type": "null"}, {"format": "uri"}]},
+                    },
+                    "patternProperties": {"^[0-9]+$": {"type": "number"}},
+                }
+            },
+        }
+    )
+
+    assert validate({"items": [{"id": 1, "kind": "a", "url": None, "7": 1.5}]}) is None
+    assert validate({}) == "$: missing required property 'items'"
+    assert validate({"items": []}) == "$.items: expected at least 1 items, got 0"
+    assert validate({"items": [{"id": 1}, {"id": "2"}]}) == (
+        "$.items[1].id: expected integer, got str"
+    )
+    assert validate({"items": [{"id": True}]}) is not None  # bool - не integer
+    assert validate({"items": [{"id": 1, "kind": "c"}]}) is not None
+    assert validate({"items": [{"id": 1, "url": "not a uri"}]}) is not None
+    assert validate({"items": [{"id": 1, "7": "x"}]}) == (
+        "$.items[0].7: expected number, got str"
+    )
+
+
+def test_observe_routes_samples_and_counts():
+    drifts = []
+    validator = ResponseValidator(
+        {"ProductService.balance": {"type": "array", "items": {"type": "object"}}},
+        on_drift=lambda *args: drifts.append(args),
+    )
+    url = "https://api.fix-price.com/buyer/v1/store/balance/42?canPickup=all"
+
+    def response(body, status=200):
+        return SimpleNamespace(status_code=status, raw=json.dumps(body).encode())
+
+    assert validator.observe(url, response([{}])) is None
+    assert validator.observe(url, response([1])) is not None
+    assert validator.observe(url, response([1], status=500)) is None  # не 2xx
+    assert (
+        validator.observe("https://api.fix-price.com/buyer/v1/category", response(1))
+        is None
+    )
+
+    assert validator.stats["ProductService.balance"].checked == 2
+    assert validator.drift() == {"ProductService.balance": 1}
+    assert drifts == [("ProductService.balance", url, "$[0]: expected object, got int")]
+
+    validator.sample_rate = 0.0
+    validator.observe(url, response([1]))
+    assert validator.skipped == 1
+    assert validator.drift() == {"ProductService.balance": 1}
+
+
+def test_packaged_schemas_match_snapshots():
+    validator = ResponseValidator.from_directory()
+    assert set(validator.validators) == {name for _, name in DEFAULT_ROUTES}
+    for file in SCHEMAS_DIR.glob("*.schema.json"):
+        # после обновления снапшотов схемы пакета копируются заново
+        assert file.read_bytes() == (SNAPSHOTS / file.name).read_bytes(), file.name
+
+
+def test_sampled_enums_are_not_enforced():
+    validator = ResponseValidator.from_directory()
+    store = json.loads((SNAPSHOTS / "ProductService.balance.json").read_text("utf-8"))[
+        0
+    ]
+    # часы работы в снапшоте - из одного ответа, днем строка другая
+    store = {**store, "workTime": "Открыто до 23:00", "scheduleSunday": "10:00-18:00"}
+    url = "https://api.fix-price.com/buyer/v1/store/balance/42"
+    response = SimpleNamespace(status_code=200, raw=json.dumps([store]).encode())
+
+    assert validator.observe(url, response) is None
+    strict = ResponseValidator.from_directory(enums=True)
+    assert strict.observe(url, response) is not None
@@ -0,0 +1,264 @@
+import asyncio
+
+import pytest
+
+from fixprice_api.crawler import CrawlUnit
+from fixprice_api.work_queue import (MemoryQueue, QueueWorker, RedisQueue,
+                                     SQLiteQueue, WorkItem)
+
+
+class _FakeRedis:
+    """Минимальная замена Redis: только команды, которые использует RedisQueue."""
+
+    def __init__(self):
+        self.data = {}
+
+    def _get(self, name, factory):
+        return self.data.setdefault(name, factory())
+
+    async def hsetnx(self, name, key, value):
+        h = self._get(name, dict)
+        if key in h:
+            return 0
+        h[key] = value
+        return 1
+
+    async def hset(self, name, key, value):
+        self._get(name, dict)[key] = value
+
+    async def hget(self, name, key):
+        return self._get(name, dict).get(key)
+
+    async def hgetall(self, name):
+        return dict(self._get(name, dict))
+
+    async def hincrby(self, name, key, amount):
+        h = self._get(name, dict)
+        h[key] = int(h.get(key, 0)) + amount
+        return h[key]
+
+    async def lpush(self, name, value):
+        self._get(name, list).insert(0, value)
+
+    async def rpop(self, name):
+        lst = self._get(name, list)
+        return lst.pop() if lst else None
+
+    async def lmove(self, source, destination, src, dest):
+        assert (src, dest) == ("RIGHT", "LEFT")
+        value = await self.rpop(source)
+        if value is not None:
+            await self.lpush(destination, value)
+        return value
+
+    async def lrem(self, name, count, value):
+        lst = self._get(name, list)
+        removed = 0
+        while value in lst and (count == 0 or removed < count):
+            lst.remove(value)
+            removed += 1
+        return removed
+
+    async def lrange(self, name, start, end):
+        return list(self._get(name, list))
+
+    async def llen(self, name):
+        return len(self._get(name, list))
+
+    async def hdel(self, name, key):
+        return 1 if self._get(name, dict).pop(key, None) is not None else 0
+
+    async def sadd(self, name, value):
+        self._get(name, set).add(value)
+
+    async def scard(self, name):
+        return len(self._get(name, set))
+
+    async def zadd(self, name, mapping, xx=False):
+        z = self._get(name, dict)
+        for member, score in mapping.items():
+            if not xx or member in z:
+                z[member] = score
+
+    async def zrem(self, name, member):
+        return 1 if self._get(name, dict).pop(member, None) is not None else 0
+
+    async def zscore(self, name, member):
+        return self._get(name, dict).get(member)
+
+    async def zcard(self, name):
+        return len(self._get(name, dict))
+
+    async def zrange(self, name, start, end):
+        return list(self._get(name, dict))
+
+    async def zrangebyscore(self, name, low, high):
+        return [m for m, s in self._get(name, dict).items() if s <= high]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_queue(request, tmp_path):
+    now = [1000.0]
+
+    def make(**kwargs):
+        clock = lambda: now[0]  # noqa: E731
+        if request.param == "memory":
+            return MemoryQueue(clock=clock, **kwargs)
+        if request.param == "sqlite":
+            return SQLiteQueue(tmp_path / "queue.sqlite", clock=clock, **kwargs)
+        return RedisQueue(_FakeRedis(), clock=clock, **kwargs)
+
+    make.now = now
+    return make
+
+
+@pytest.mark.anyio
+async def test_lease_ack_dedupe(make_queue):
+    queue = make_queue()
+    items = [WorkItem(CrawlUnit("a", None, 3)), WorkItem(CrawlUnit("b", "c", 3))]
+    assert await queue.put(items) == 2
+    assert await queue.put(items) == 0  # повторное заполнение не дублирует
+
+    first = await queue.lease("w1", 60)
+    second = await queue.lease("w2", 60)
+    assert {first.item, second.item} == set(items)
+    assert await queue.lease("w3", 60) is None
+
+    assert await queue.ack(first)
+    assert not await queue.ack(first)
+    stats = await queue.stats()
+    assert (stats.pending, stats.leased, stats.done) == (0, 1, 1)
+
+
+@pytest.mark.anyio
+async def test_expired_lease_is_retried_then_failed(make_queue):
+    queue = make_queue(max_attempts=2)
+    await queue.put([WorkItem(CrawlUnit("a"))])
+
+    lost = await queue.lease("w1", 10)
+    make_queue.now[0] += 11  # воркер "упал"
+    retry = await queue.lease("w2", 10)
+    assert retry.item == lost.item and retry.attempt == 2
+    assert not await queue.ack(lost)  # устаревшая аренда не принимается
+    assert await queue.extend(retry, 10)
+
+    assert await queue.nack(retry, "boom")
+    stats = await queue.stats()
+    assert (stats.pending, stats.leased, stats.failed) == (0, 0, 1)
+    assert stats.finished
+    assert await queue.errors() == {lost.item.key: "boom"}
+
+
+@pytest.mark.anyio
+async def test_redis_lease_survives_crash_after_pop():
+    now = [1000.0]
+    redis = _FakeRedis()
+    queue = RedisQueue(redis, clock=lambda: now[0], orphan_seconds=30)
+    await queue.put([WorkItem(CrawlUnit("a"))])
+    # воркер забрал задачу и упал до записи аренды
+    key = await redis.lmove(
+        "fixprice:crawl:pending", "fixprice:crawl:processing", "RIGHT", "LEFT"
+    )
+    assert (await queue.stats()).pending == 1  # задача не потеряна
+
+    assert await queue.lease("w2", 60) is None  # еще может быть чужая аренда
+    now[0] += 31
+    lease = await queue.lease("w2", 60)
+    assert lease.item.key == key and lease.attempt == 1
+    assert await redis.llen("fixprice:crawl:processing") == 0
+
+    now[0] += 31  # у арендованной задачи нет "сироты" в processing
+    assert await queue.lease("w3", 60) is None
+    assert await queue.ack(lease)
+
+
+class _PausingRedis(_FakeRedis):
+    """Останавливает следующую запись аренды, пока `gate` не установлен."""
+
+    gate = None
+
+    async def zadd(self, name, mapping, xx=False):
+        if self.gate is not None and not xx:
+            gate, self.gate = self.gate, None
+            await gate.wait()
+        await super().zadd(name, mapping, xx)
+
+
+async def _lease_paused(queue, redis, worker):
+    """Начать аренду и остановить ее между LMOVE и ZADD."""
+    redis.gate = asyncio.Event()
+    gate = redis.gate
+    task = asyncio.ensure_future(queue.lease(worker, 60))
+    while redis.gate is not None:
+        await asyncio.sleep(0)
+    return task, gate
+
+
+@pytest.mark.anyio
+async def test_redis_orphan_mark_does_not_outlive_lease():
+    now = [1000.0]
+    redis = _PausingRedis()
+    queue = RedisQueue(redis, clock=lambda: now[0], orphan_seconds=30)
+    await queue.put([WorkItem(CrawlUnit("a"))])
+
+    # C заходит в окно LMOVE -> ZADD воркера B и отмечает задачу
+    b, gate = await _lease_paused(queue, redis, "B")
+    assert await queue.lease("C", 60) is None
+    gate.set()
+    lease_b = await b
+    assert await queue.nack(lease_b, "boom")
+
+    # гораздо позже то же окно у D: старая отметка не должна вернуть задачу
+    now[0] += 100
+    d, gate = await _lease_paused(queue, redis, "D")
+    assert await queue.lease("E", 60) is None
+    gate.set()
+    lease_d = await d
+
+    assert lease_d.attempt == 2
+    assert len(redis.data["fixprice:crawl:leased"]) == 1
+    assert redis.data["fixprice:crawl:pending"] == []
+    assert await queue.ack(lease_d)
+    await queue.stats()
+    assert redis.data["fixprice:crawl:orphans"] == {}
+
+
+@pytest.mark.anyio
+async def test_worker_pages_through_queue(offline_api, offline_page):
+    offline_page.catalog = {("a", 1): [1, 2], ("a", 2): [3]}
+    offline_api.city_id = 9
+    queue = MemoryQueue()
+    await queue.put(
+        [
+            WorkItem(CrawlUnit("a", None, 3)),
+            WorkItem(CrawlUnit("b", None, 5)),
+            WorkItem(CrawlUnit("c")),  # без города - город клиента
+        ]
+    )
+
+    result = [
+        (p.unit.category_alias, p.page, p.products)
+        async for p in QueueWorker(offline_api, queue, limit=2).run()
+    ]
+    assert result == [("a", 1, [1, 2]), ("a", 2, [3])]
+    calls = [(r.city_id, r.path, r.query["page"]) for r in offline_page.calls]
+    assert sorted(calls) == [
+        (3, "/buyer/v1/product/in/a", "1"),
+        (3, "/buyer/v1/product/in/a", "2"),
+        (5, "/buyer/v1/product/in/b", "1"),
+        (9, "/buyer/v1/product/in/c", "1"),
+    ]
+    assert (await queue.stats()).done == 4
+    assert offline_api.city_id == 9  # город клиента не меняется
+
+
+@pytest.mark.anyio
+async def test_worker_nacks_error_responses(offline_api, offline_page):
+    offline_page.catalog = {("a", 1): 429}
+    queue = MemoryQueue(max_attempts=2)
+    await queue.put([WorkItem(CrawlUnit("a", None, 3))])
+
+    assert [p async for p in QueueWorker(offline_api, queue).run()] == []
+    stats = await queue.stats()
+    assert (stats.done, stats.failed) == (0, 1)
+    assert (await queue.errors()) == {"3/a//1": "RuntimeError('HTTP 429')"}